@@ -0,0 +1,295 @@
+"""
+Load generators for benchmarking the API.
+
+A scenario is a callable taking a ``random.Random`` and returning the next
+request as ``(method, path, body)``, ``body`` being a dict sent as JSON or
+None. Two drivers run scenarios with concurrent clients:
+
+- ``run_http`` against a running server. Each client holds one keep-alive
+  connection, reopened whenever the server closes it (gunicorn's sync
+  workers close it after every response). Queries per request are read from
+  the ``Server-Timing`` header when the server measures every request
+  (``PERFORMANCE_SAMPLE_RATE=1``, ``PERFORMANCE_SERVER_TIMING=True``).
+- ``run_in_process`` through Django's test client in threads, against the
+  configured database. Queries are counted by core.performance.
+
+Only the standard library is used so both run wherever ``manage.py`` does.
+"""
+
+import asyncio
+import json
+import random
+import re
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+
+from core import performance
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+@dataclass
+class LoadResult:
+    name: str
+    concurrency: int
+    duration: float = 0.0
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        return self.requests / self.duration if self.duration else 0.0
+
+    def percentile(self, percent):
+        if not self.latencies:
+            return 0.0
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        return statistics.quantiles(self.latencies, n=100)[percent - 1]
+
+    def record(self, status, latency, queries=None):
+        self.statuses[status] += 1
+        if status < 400:
+            self.latencies.append(latency)
+            if queries is not None:
+                self.queries.append(queries)
+        else:
+            self.errors += 1
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "statuses": {str(code): count for code, count in self.statuses.items()},
+            "duration": round(self.duration, 3),
+            "throughput": round(self.throughput, 1),
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "queries_per_request": (
+                round(statistics.fmean(self.queries), 2) if self.queries else None
+            ),
+        }
+
+
+class _Budget:
+    """Stop after ``requests`` requests or ``duration`` seconds, whichever first."""
+
+    def __init__(self, requests=None, duration=None):
+        self.remaining = requests
+        self.deadline = time.perf_counter() + duration if duration else None
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return False
+        if self.remaining is None:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+async def _read_headers(reader):
+    """Read a status line and its headers, return ``(status, headers)``."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by the server")
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(status_line.split()[1]), headers
+
+
+async def _read_response(reader, method="GET"):
+    """
+    Read one response, return ``(status, headers, keep_alive)``. Interim 1xx
+    responses are skipped. Responses to HEAD, 204 and 304 have no body
+    whatever their headers say, chunked bodies end with their trailers and
+    bodies of unknown length with the connection.
+    """
+    status, headers = await _read_headers(reader)
+    while 100 <= status < 200 and status != 101:
+        status, headers = await _read_headers(reader)
+    keep_alive = headers.get("connection", "").lower() != "close"
+    if status == 101:
+        # the connection no longer speaks HTTP/1.1
+        return status, headers, False
+    if method == "HEAD" or status in (204, 304):
+        return status, headers, keep_alive
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        return status, headers, False
+    return status, headers, keep_alive
+
+
+def _encode_request(netloc, method, path, body):
+    payload = json.dumps(body).encode() if body is not None else b""
+    lines = [
+        f"{method} {path} HTTP/1.1",
+        f"Host: {netloc}",
+        "Accept: application/json",
+    ]
+    if body is not None:
+        lines += ["Content-Type: application/json", f"Content-Length: {len(payload)}"]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + payload
+
+
+async def _exchange(connection, method, request):
+    """Send ``request``, return its ``(status, headers, keep_alive, latency)``."""
+    reader, writer = connection
+    started = time.perf_counter()
+    writer.write(request)
+    await writer.drain()
+    status, headers, keep_alive = await _read_response(reader, method)
+    return status, headers, keep_alive, time.perf_counter() - started
+
+
+async def _http_client(base_url, scenario, rng, budget, result):
+    parts = urlsplit(base_url)
+    connection = None
+
+    async def connect():
+        return await asyncio.open_connection(parts.hostname, parts.port or 80)
+
+    while budget.take():
+        method, path, body = scenario(rng)
+        request = _encode_request(parts.netloc, method, parts.path + path, body)
+        try:
+            reused = connection is not None
+            connection = connection or await connect()
+            try:
+                status, headers, keep_alive, latency = await _exchange(
+                    connection, method, request
+                )
+            except (OSError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # the server closed the idle connection, e.g. a worker being
+                # recycled: retry once on a new one, as HTTP clients do
+                connection[1].close()
+                connection = await connect()
+                status, headers, keep_alive, latency = await _exchange(
+                    connection, method, request
+                )
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            result.errors += 1
+            keep_alive = False
+        else:
+            match = SERVER_TIMING_QUERIES.search(headers.get("server-timing", ""))
+            result.record(status, latency, int(match.group(1)) if match else None)
+        if not keep_alive and connection is not None:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def _run_http(name, base_url, scenario, concurrency, budget, seed):
+    result = LoadResult(name=name, concurrency=concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _http_client(base_url, scenario, random.Random(seed + i), budget, result)
+            for i in range(concurrency)
+        )
+    )
+    result.duration = time.perf_counter() - started
+    return result
+
+
+def run_http(
+    name, base_url, scenario, concurrency=16, requests=None, duration=None, seed=0
+):
+    """Run ``scenario`` against the server at ``base_url``."""
+    budget = _Budget(requests, duration)
+    return asyncio.run(
+        _run_http(name, base_url.rstrip("/"), scenario, concurrency, budget, seed)
+    )
+
+
+def _default_host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if not host.startswith((".", "*"))]
+    return hosts[0] if hosts else "localhost"
+
+
+def run_in_process(
+    name, scenario, concurrency=16, requests=None, duration=None, seed=0
+):
+    """Run ``scenario`` through the Django test client, in threads."""
+    from django.test import Client
+
+    budget = _Budget(requests, duration)
+    result = LoadResult(name=name, concurrency=concurrency)
+    lock = threading.Lock()
+
+    def client(index):
+        rng = random.Random(seed + index)
+        http = Client(HTTP_HOST=_default_host())
+        try:
+            while budget.take():
+                method, path, body = scenario(rng)
+                metrics = performance.RequestMetrics()
+                token = performance.activate(metrics)
+                for connection in connections.all(initialized_only=True):
+                    performance.install_query_recorder(connection)
+                started = time.perf_counter()
+                try:
+                    response = http.generic(
+                        method,
+                        path,
+                        json.dumps(body) if body is not None else "",
+                        content_type="application/json",
+                    )
+                finally:
+                    performance.deactivate(token)
+                latency = time.perf_counter() - started
+                with lock:
+                    result.record(response.status_code, latency, len(metrics.queries))
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    result.duration = time.perf_counter() - started
+    return result
+
+
+def run_load(url, concurrency=50, duration=10.0):
+    """Hit a single ``url`` with GETs for ``duration`` seconds."""
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    return run_http(
+        url,
+        f"{parts.scheme}://{parts.netloc}",
+        lambda rng: ("GET", path, None),
+        concurrency=concurrency,
+        duration=duration,
+    )
@@ -0,0 +1,147 @@
+"""
+Gunicorn configuration, ``gunicorn -c python:core.gunicorn_conf``.
+
+``SERVER_WORKER_CLASS`` picks how the workers serve requests:
+
+- ``gthread`` (default): ``SERVER_THREADS`` requests at once per worker, and
+  keep-alive connections, so a worker waiting on the database or a client
+  keeps serving the others.
+- ``sync``: one request at a time per worker, connections closed after every
+  response.
+- ``asgi``: uvicorn workers serving ``core.asgi``, which run the async catalog
+  reads natively. ``SERVER_INTERFACE=asgi`` selects it too.
+
+Unless ``SERVER_WORKERS`` is set, the workers follow the CPUs the container
+may use (its cgroup quota, else its CPU affinity): 2 x CPUs + 1 sync workers,
+which mostly wait, else one per CPU and at least 2, so one keeps serving while
+the other restarts. ``SERVER_WORKER_MEMORY_MB`` caps them to what the memory
+limit holds.
+
+The app is loaded once before forking (``SERVER_PRELOAD``): the workers share
+its memory copy-on-write, start faster, and a broken app fails at startup
+instead of in every worker. Workers restart after ``SERVER_MAX_REQUESTS``
+requests, give or take ``SERVER_MAX_REQUESTS_JITTER`` so they don't restart
+all at once, which bounds the growth of leaky or fragmented workers.
+"""
+
+import math
+import os
+from pathlib import Path
+
+import environ
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+environ.Env.read_env(os.path.join(BASE_DIR, ".env"))
+env = environ.Env()
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "asgi": "uvicorn_worker.UvicornWorker",
+}
+
+
+def available_cpus():
+    """The CPUs this process may use, its cgroup quota included."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+def available_memory_mb():
+    """The memory this process may use, its cgroup limit included."""
+    memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        if limit != "max":
+            memory = min(memory, int(limit))
+    except (OSError, ValueError):
+        pass
+    return memory // 2**20
+
+
+def size_workers(worker_class, cpus, memory_mb, worker_memory_mb):
+    if worker_class == "sync":
+        count = 2 * cpus + 1
+    else:
+        count = max(cpus, 2)
+    return max(1, min(count, memory_mb // worker_memory_mb))
+
+
+server_worker_class = env.str(
+    "SERVER_WORKER_CLASS",
+    "asgi" if env.str("SERVER_INTERFACE", "wsgi") == "asgi" else "gthread",
+)
+if server_worker_class not in WORKER_CLASSES:
+    raise ValueError(
+        f"SERVER_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, "
+        f"not {server_worker_class!r}"
+    )
+
+wsgi_app = (
+    "core.asgi:application"
+    if server_worker_class == "asgi"
+    else "core.wsgi:application"
+)
+bind = env.list("SERVER_BIND", default=["0.0.0.0:8000"])
+worker_class = WORKER_CLASSES[server_worker_class]
+workers = env.int("SERVER_WORKERS", 0) or size_workers(
+    server_worker_class,
+    available_cpus(),
+    available_memory_mb(),
+    env.int("SERVER_WORKER_MEMORY_MB", 200),
+)
+# keep DATABASE_POOL_MAX_SIZE at least this high, or threads wait on the pool
+threads = env.int("SERVER_THREADS", 4) if server_worker_class == "gthread" else 1
+preload_app = env.bool("SERVER_PRELOAD", True)
+max_requests = env.int("SERVER_MAX_REQUESTS", 10000)
+max_requests_jitter = env.int("SERVER_MAX_REQUESTS_JITTER", max_requests // 10)
+# a worker silent for this long is killed and replaced
+timeout = env.int("SERVER_TIMEOUT", 30)
+graceful_timeout = env.int("SERVER_GRACEFUL_TIMEOUT", 30)
+# above the idle timeout of the proxy in front, so the proxy closes first
+keepalive = env.int("SERVER_KEEPALIVE", 75)
+# the worker heartbeat file, in memory rather than on the container's overlay
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def when_ready(server):
+    if preload_app:
+        # import the URLconf, views and serializers once here, rather than in
+        # the first request of every worker
+        from django.urls import get_resolver
+
+        get_resolver().check()
+    server.log.info(
+        "Serving %s with %d %s worker(s) x %d thread(s), preload %s",
+        wsgi_app,
+        workers,
+        server_worker_class,
+        threads,
+        "on" if preload_app else "off",
+    )
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # loading the app may have connected; a connection, or a pool and its
+        # threads, can't be shared with the workers
+        from core import pool
+
+        pool.close_all()
+
+
+def post_worker_init(worker):
+    from core import pool
+
+    # open the pools now rather than on the first request
+    pool.open_all()
@@ -0,0 +1,143 @@
+import json
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from core import performance, replicas
+
+logger = logging.getLogger("core.performance")
+
+
+class PerformanceMiddleware:
+    """
+    Measure a sample of the requests: SQL query count and time, serializer
+    time and total time.
+
+    Sampled requests get a ``Server-Timing`` header (when
+    ``PERFORMANCE_SERVER_TIMING`` is on) and a JSON log line on the
+    ``core.performance`` logger. Requests over ``PERFORMANCE_QUERY_BUDGET``
+    queries or ``PERFORMANCE_LATENCY_BUDGET_MS`` are logged as warnings with
+    their slowest and repeated statements.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_sampled(request):
+            return self.get_response(request)
+        # connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            performance.install_query_recorder(connection)
+        metrics = performance.RequestMetrics()
+        token = performance.activate(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            performance.deactivate(token)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not self.is_sampled(request):
+            return await self.get_response(request)
+        metrics = performance.RequestMetrics()
+        token = performance.activate(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            performance.deactivate(token)
+        return self.report(request, response, metrics)
+
+    def is_sampled(self, request):
+        rate = settings.PERFORMANCE_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def report(self, request, response, metrics):
+        metrics.finish()
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response["Server-Timing"] = self.server_timing(metrics)
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(metrics.total * 1000, 2),
+            "db_ms": round(metrics.db_time * 1000, 2),
+            "queries": len(metrics.queries),
+            **{
+                f"{name}_ms": round(duration * 1000, 2)
+                for name, duration in metrics.spans.items()
+            },
+        }
+        over_budget = (
+            len(metrics.queries) > settings.PERFORMANCE_QUERY_BUDGET
+            or metrics.total * 1000 > settings.PERFORMANCE_LATENCY_BUDGET_MS
+        )
+        if over_budget:
+            record["slowest_queries"] = metrics.slowest_queries()
+            record["repeated_queries"] = metrics.repeated_queries()
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+        return response
+
+    def server_timing(self, metrics):
+        entries = [
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{len(metrics.queries)} queries"'
+        ]
+        entries += [
+            f"{name};dur={duration * 1000:.2f}"
+            for name, duration in metrics.spans.items()
+        ]
+        entries.append(f"total;dur={metrics.total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Track how each request uses the databases, see core.replicas, and send the
+    next reads of the clients that wrote to the primary.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = replicas.activate()
+        try:
+            response = self.get_response(request)
+            routing = replicas.current()
+        finally:
+            replicas.deactivate(token)
+        return self.pin_writers(request, response, routing)
+
+    async def __acall__(self, request):
+        token = replicas.activate()
+        try:
+            response = await self.get_response(request)
+            routing = replicas.current()
+        finally:
+            replicas.deactivate(token)
+        return self.pin_writers(request, response, routing)
+
+    def pin_writers(self, request, response, routing):
+        if routing.wrote and replicas.replica_aliases():
+            replicas.pin(request, response)
+        return response
@@ -0,0 +1,101 @@
+"""
+Per-request performance measurements, see core.middleware.
+
+The metrics of the current request live in a context variable, so they follow
+the request into ``sync_to_async`` threads and async views. Code outside a
+sampled request pays a single context variable lookup.
+"""
+
+import contextvars
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.db.backends.signals import connection_created
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    total: float = 0.0
+    db_time: float = 0.0
+    queries: list = field(default_factory=list)
+    spans: Counter = field(default_factory=Counter)
+    _open_spans: set = field(default_factory=set)
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.db_time += duration
+            self.queries.append((sql, duration))
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def slowest_queries(self, limit=5):
+        ranked = sorted(self.queries, key=lambda query: query[1], reverse=True)
+        return [
+            {"sql": sql, "ms": round(duration * 1000, 2)}
+            for sql, duration in ranked[:limit]
+        ]
+
+    def repeated_queries(self, limit=5):
+        """The statements run more than once, the usual N+1 suspects."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [
+            {"sql": sql, "count": count}
+            for sql, count in counts.most_common(limit)
+            if count > 1
+        ]
+
+
+def current():
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """
+    Add the time spent in the block to the ``name`` span of the current
+    request. Nested blocks of the same span are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or name in metrics._open_spans:
+        yield
+        return
+    metrics._open_spans.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] += time.perf_counter() - started
+        metrics._open_spans.discard(name)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_recorder)
@@ -0,0 +1,94 @@
+"""
+Database connection pools.
+
+With ``DATABASE_POOL`` (PostgreSQL, on by default) every process keeps a
+psycopg pool per database alias, replicas included, instead of opening a
+connection per request: Django takes a connection from the pool when a
+request first queries and hands it back when the request finishes.
+
+A pool holds from ``DATABASE_POOL_MIN_SIZE`` to ``DATABASE_POOL_MAX_SIZE``
+connections, shared by the threads of the process, so a server opens at most
+workers x max size of them; keep that under the ``max_connections`` of
+PostgreSQL. ``stats`` reports how
+long requests wait for a connection and how much of the pool is in use, the
+two numbers to size it from: waits mean the pool is too small, a low peak
+utilization that it holds connections for nothing.
+"""
+
+import os
+
+from django.db import connections
+
+# psycopg_pool counters kept as is, the others are derived from them
+COUNTERS = (
+    "pool_min",
+    "pool_max",
+    "pool_size",
+    "pool_available",
+    "requests_waiting",
+    "requests_num",
+    "requests_queued",
+    "requests_wait_ms",
+    "requests_errors",
+    "usage_ms",
+    "connections_num",
+    "connections_ms",
+    "connections_errors",
+    "connections_lost",
+    "returns_bad",
+)
+
+
+def pools():
+    """The pools of this process by alias, for the pooled aliases."""
+    found = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            found[alias] = pool
+    return found
+
+
+def open_all():
+    """Open the pools, which fill up to their minimum size in the background."""
+    for pool in pools().values():
+        pool.open(wait=False)
+
+
+def close_all():
+    """Close the connections and pools of this process, e.g. before forking."""
+    connections.close_all()
+    for alias in connections:
+        close_pool = getattr(connections[alias], "close_pool", None)
+        if close_pool is not None:
+            close_pool()
+
+
+def stats():
+    """Wait time and utilization of this process's pools, since it started."""
+    return {
+        "pid": os.getpid(),
+        "pools": {alias: pool_stats(pool) for alias, pool in pools().items()},
+    }
+
+
+def pool_stats(pool):
+    raw = pool.get_stats()
+    data = {name: raw.get(name, 0) for name in COUNTERS}
+    in_use = data["pool_size"] - data["pool_available"]
+    data["in_use"] = in_use
+    data["utilization"] = (
+        round(in_use / data["pool_max"], 4) if data["pool_max"] else 0.0
+    )
+    requests = data["requests_num"]
+    queued = data["requests_queued"]
+    # over all the requests, and over those which found no free connection
+    data["wait_ms_avg"] = (
+        round(data["requests_wait_ms"] / requests, 2) if requests else 0.0
+    )
+    data["queued_wait_ms_avg"] = (
+        round(data["requests_wait_ms"] / queued, 2) if queued else 0.0
+    )
+    data["queued_ratio"] = round(queued / requests, 4) if requests else 0.0
+    data["usage_ms_avg"] = round(data["usage_ms"] / requests, 2) if requests else 0.0
+    return data
@@ -0,0 +1,70 @@
+"""
+JSON rendering with orjson when it is installed.
+
+The output is the one of DRF's ``JSONRenderer``: compact, UTF-8, with
+``\\u2028``/``\\u2029`` escaped. Types orjson does not know, datetimes
+included, go through DRF's encoder. What orjson renders differently is left
+to ``JSONRenderer``:
+
+- indented output (browsable API, ``indent=`` media type parameter);
+- ints over 64 bits;
+- floats under 1e-4, which orjson writes in positional notation or without
+  the padded exponent (``1.5e-7`` for ``1.5e-07``);
+- infinite and NaN floats, which orjson writes as null where ``JSONRenderer``
+  refuses them (or writes ``Infinity`` and ``NaN`` when not ``strict``).
+"""
+
+import math
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+# maybe a tiny float: 0.00001 or 1.5e-7, stdlib writes 1e-05 and 1.5e-07
+TINY_FLOAT = re.compile(rb"0\.0000|[0-9]e-")
+
+
+def has_non_finite_float(data):
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(map(has_non_finite_float, data.values()))
+    if isinstance(data, (list, tuple)):
+        return any(map(has_non_finite_float, data))
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        ret = self.fast_render(data, accepted_media_type, renderer_context or {})
+        if ret is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret
+
+    def fast_render(self, data, accepted_media_type, renderer_context):
+        """The rendered ``data``, or None when ``JSONRenderer`` must render it."""
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return None
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return None
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            return None
+        if TINY_FLOAT.search(ret):
+            return None
+        if b"null" in ret and has_non_finite_float(data):
+            return None
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
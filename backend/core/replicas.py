@@ -0,0 +1,187 @@
+"""
+Read replicas.
+
+``DATABASE_REPLICAS`` adds ``replica1``, ``replica2``... aliases next to the
+primary ``default``. ``PrimaryReplicaRouter`` sends every write, and every
+read by default, to the primary. Views opt in with ``ReplicaReadMixin``:
+their safe (GET, HEAD, OPTIONS) requests read from one healthy replica, the
+same for the whole request.
+
+A replica is healthy when it answers and replays the primary's changes less
+than ``DATABASE_REPLICA_MAX_LAG`` seconds late. Each process checks its
+replicas at most every ``DATABASE_REPLICA_CHECK_INTERVAL`` seconds and falls
+back to the primary when none is healthy.
+
+Read-your-writes: once a request wrote, its client reads from the primary for
+``DATABASE_REPLICA_STICKY_SECONDS``. ``ReplicaRoutingMiddleware`` pins the
+client with a cookie, and the user with an entry in the default cache for the
+clients that don't keep cookies.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = "pin_primary"
+
+# 0 on a primary or a replica done replaying what it received, else how late
+# the last replayed transaction is
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_current = contextvars.ContextVar("database_routing", default=None)
+_health = {}
+_health_lock = threading.Lock()
+
+
+@dataclass
+class Routing:
+    """How the current request uses the databases."""
+
+    replica_reads: bool = False
+    # the replica read from, "" for none available
+    alias: str = None
+    wrote: bool = False
+
+
+def activate():
+    return _current.set(Routing())
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def read_alias():
+    """The replica the current request reads from, None for the primary."""
+    routing = _current.get()
+    if routing is None or not routing.replica_reads:
+        return None
+    return routing.alias or None
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+def healthy_replicas():
+    now = time.monotonic()
+    healthy = []
+    for alias in replica_aliases():
+        ok, checked_at = _health.get(alias, (False, None))
+        if _is_due(checked_at, now):
+            with _health_lock:
+                # another thread may have checked it while this one waited
+                ok, checked_at = _health.get(alias, (False, None))
+                if _is_due(checked_at, now):
+                    ok = check(alias)
+                    _health[alias] = (ok, time.monotonic())
+        if ok:
+            healthy.append(alias)
+    return healthy
+
+
+def _is_due(checked_at, now):
+    interval = settings.DATABASE_REPLICA_CHECK_INTERVAL
+    return checked_at is None or now - checked_at >= interval
+
+
+def check(alias):
+    """Whether the replica answers and lags less than the allowed lag."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(POSTGRES_LAG_SQL)
+                lag = cursor.fetchone()[0]
+            else:
+                cursor.execute("SELECT 1")
+                lag = 0
+    except DatabaseError:
+        logger.warning("Replica %s is unreachable, reading from the primary", alias)
+        return False
+    if lag is None or lag > settings.DATABASE_REPLICA_MAX_LAG:
+        logger.warning("Replica %s lags %ss, reading from the primary", alias, lag)
+        return False
+    return True
+
+
+def pin_key(user_id):
+    return f"replicas:pinned:{user_id}"
+
+
+def is_pinned(request):
+    """Whether the client of ``request`` wrote recently."""
+    if PIN_COOKIE in request.COOKIES:
+        return True
+    user = getattr(request, "user", None)
+    return bool(
+        user is not None and user.is_authenticated and cache.get(pin_key(user.pk))
+    )
+
+
+def pin(request, response):
+    """Send the next reads of the client of ``request`` to the primary."""
+    window = settings.DATABASE_REPLICA_STICKY_SECONDS
+    response.set_cookie(PIN_COOKIE, "1", max_age=window, httponly=True, samesite="Lax")
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        cache.set(pin_key(user.pk), True, window)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if routing is None or not routing.replica_reads:
+            return None
+        if routing.alias is None:
+            replicas = healthy_replicas()
+            routing.alias = random.choice(replicas) if replicas else ""
+        return routing.alias or None
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """Read from a replica in the safe requests of clients that didn't just write."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        routing = _current.get()
+        if (
+            routing is not None
+            and request.method in SAFE_METHODS
+            and replica_aliases()
+            and not is_pinned(request)
+        ):
+            routing.replica_reads = True
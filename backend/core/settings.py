@@ -10,11 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import tempfile
 from datetime import timedelta
+from pathlib import Path
 
 import environ
-import os
-from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
     # Local
     "user.apps.UserConfig",
     "product.apps.ProductConfig",
+    "order.apps.OrderConfig",
     # Third-party
     "rest_framework",
     "rest_framework_simplejwt",
@@ -59,6 +61,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.PerformanceMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # third-party middleware
@@ -71,6 +75,33 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "core.urls"
 
+TEST_RUNNER = "core.testing.TestRunner"
+
+# Share of the requests measured by core.middleware.PerformanceMiddleware (0 to
+# 1). Measured requests over the query or latency budget are logged with their
+# slowest and repeated SQL statements.
+PERFORMANCE_SAMPLE_RATE = env.float("PERFORMANCE_SAMPLE_RATE", 0.01)
+# Server-Timing headers show clients the query counts and timings of measured
+# requests: off unless benchmarking.
+PERFORMANCE_SERVER_TIMING = env.bool("PERFORMANCE_SERVER_TIMING", False)
+PERFORMANCE_QUERY_BUDGET = env.int("PERFORMANCE_QUERY_BUDGET", 20)
+PERFORMANCE_LATENCY_BUDGET_MS = env.int("PERFORMANCE_LATENCY_BUDGET_MS", 500)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.performance": {
+            "handlers": ["console"],
+            "level": env.str("PERFORMANCE_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -101,8 +132,102 @@ DATABASES = {
         "PASSWORD": env.str("DATABASE_PASSWORD", "postgres"),
         "HOST": env.str("DATABASE_HOST", "db"),
         "PORT": env.str("DATABASE_PORT", "5432"),
+        "TEST": {"NAME": env.str("DATABASE_TEST_NAME", None)},
     }
 }
+if DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+    # take the write lock when the transaction starts and wait for it, instead
+    # of failing the concurrent writers (stock reservations) with "locked"
+    DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE", "timeout": 20}
+elif env.bool("DATABASE_POOL", True):
+    # Connection pooling (core.pool): each process keeps a psycopg pool per
+    # alias, between DATABASE_POOL_MIN_SIZE and DATABASE_POOL_MAX_SIZE open
+    # connections. A request waits up to DATABASE_POOL_TIMEOUT seconds for a
+    # free one; connections are checked when handed out (CONN_HEALTH_CHECKS)
+    # and replaced after DATABASE_POOL_MAX_IDLE seconds unused or
+    # DATABASE_POOL_MAX_LIFETIME seconds open.
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": env.int("DATABASE_POOL_MIN_SIZE", 2),
+            "max_size": env.int("DATABASE_POOL_MAX_SIZE", 10),
+            "timeout": env.float("DATABASE_POOL_TIMEOUT", 10),
+            "max_waiting": env.int("DATABASE_POOL_MAX_WAITING", 0),
+            "max_idle": env.float("DATABASE_POOL_MAX_IDLE", 600),
+            "max_lifetime": env.float("DATABASE_POOL_MAX_LIFETIME", 3600),
+        },
+    }
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+else:
+    # without a pool, keep each thread's connection open between requests
+    DATABASES["default"]["CONN_MAX_AGE"] = env.int("DATABASE_CONN_MAX_AGE", 60)
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Read replicas (core.replicas): DATABASE_REPLICAS lists the replica servers as
+# host[:port], or database files with SQLite, and adds the replica1, replica2...
+# aliases. Safe reads of the catalog and user views go to a replica lagging
+# less than DATABASE_REPLICA_MAX_LAG seconds; a client that wrote reads from the
+# primary for the next DATABASE_REPLICA_STICKY_SECONDS.
+for index, replica in enumerate(env.list("DATABASE_REPLICAS", default=[]), 1):
+    config = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if config["ENGINE"].endswith("sqlite3"):
+        config["NAME"] = replica
+    else:
+        config["HOST"], _, port = replica.partition(":")
+        config["PORT"] = port or config["PORT"]
+    DATABASES[f"replica{index}"] = config
+DATABASE_ROUTERS = ["core.replicas.PrimaryReplicaRouter"]
+DATABASE_REPLICA_MAX_LAG = env.float("DATABASE_REPLICA_MAX_LAG", 5)
+DATABASE_REPLICA_STICKY_SECONDS = env.int("DATABASE_REPLICA_STICKY_SECONDS", 10)
+DATABASE_REPLICA_CHECK_INTERVAL = env.float("DATABASE_REPLICA_CHECK_INTERVAL", 5)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The catalog cache uses the file backend by default, shared by every process
+# which mounts CATALOG_CACHE_LOCATION, so the invalidations of one reach the
+# others: the server workers and the commands writing the catalog (the
+# reservation sweeper and the stock flusher of docker-compose) must share it.
+# "product.cache.LocMemCatalogCache" keeps one LRU per process instead, for a
+# single process only.
+# The default cache holds the login rate limits and the read-your-writes pins
+# (core.replicas), which the server workers must share too, or every worker
+# counts and pins on its own.
+CACHES = {
+    "default": {
+        "BACKEND": env.str(
+            "CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": env.str(
+            "CACHE_LOCATION", os.path.join(tempfile.gettempdir(), "ecommerce-cache")
+        ),
+        "OPTIONS": {"MAX_ENTRIES": env.int("CACHE_MAX_ENTRIES", 10000)},
+    },
+    "catalog": {
+        "BACKEND": env.str(
+            "CATALOG_CACHE_BACKEND", "product.cache.FileBasedCatalogCache"
+        ),
+        "LOCATION": env.str(
+            "CATALOG_CACHE_LOCATION",
+            os.path.join(tempfile.gettempdir(), "ecommerce-catalog-cache"),
+        ),
+        "TIMEOUT": env.int("CATALOG_CACHE_TTL", 300),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("CATALOG_CACHE_MAX_ENTRIES", 5000),
+            "CULL_FREQUENCY": env.int("CATALOG_CACHE_CULL_FREQUENCY", 10),
+        },
+    },
+}
+CATALOG_CACHE_ENABLED = env.bool("CATALOG_CACHE_ENABLED", True)
+
+# Caching proxy in front of the API (product.edge): anonymous catalog reads are
+# shared for EDGE_CACHE_TTL seconds, 0 keeps them private. Writes purge their
+# surrogate keys from the EDGE_CACHE_PURGE_URLS proxies, from
+# EDGE_CACHE_PURGE_WORKERS background threads (0 purges inline).
+EDGE_CACHE_TTL = env.int("EDGE_CACHE_TTL", 600)
+EDGE_CACHE_PURGE_URLS = env.list("EDGE_CACHE_PURGE_URLS", default=[])
+EDGE_CACHE_PURGE_WORKERS = env.int("EDGE_CACHE_PURGE_WORKERS", 1)
+EDGE_CACHE_PURGE_TIMEOUT = env.float("EDGE_CACHE_PURGE_TIMEOUT", 2)
 
 
 # Password validation
@@ -125,6 +250,33 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "user.EcommerceUser"
 
+# Password hashing runs on a per-process pool of PASSWORD_HASH_WORKERS threads,
+# at most PASSWORD_HASH_QUEUE_DEPTH hashes may be running or waiting, the next
+# ones are answered with a 503. Stored hashes are rehashed at login whenever
+# PASSWORD_HASH_ITERATIONS changes.
+PASSWORD_HASHERS = [
+    "user.hashing.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PASSWORD_HASH_ITERATIONS = env.int("PASSWORD_HASH_ITERATIONS", 870000)
+PASSWORD_HASH_WORKERS = env.int("PASSWORD_HASH_WORKERS", 2)
+PASSWORD_HASH_QUEUE_DEPTH = env.int("PASSWORD_HASH_QUEUE_DEPTH", 8)
+# Request threads per server worker, as core.gunicorn_conf starts them. Each
+# waits on its hash, so the depth is capped at all of them but one. None for
+# the asgi workers, whose sync views run on threads of their own.
+SERVER_REQUEST_THREADS = {
+    "gthread": env.int("SERVER_THREADS", 4),
+    "sync": 1,
+}.get(
+    env.str(
+        "SERVER_WORKER_CLASS",
+        "asgi" if env.str("SERVER_INTERFACE", "wsgi") == "asgi" else "gthread",
+    )
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -147,6 +299,21 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Background threads generating product image variants, 0 generates them inline.
+IMAGE_VARIANT_WORKERS = env.int("IMAGE_VARIANT_WORKERS", 2)
+
+# Seconds an order reservation holds its stock before the sweep
+# (release_expired_reservations) gives it back.
+ORDER_RESERVATION_TTL = env.int("ORDER_RESERVATION_TTL", 900)
+
+# Catalog change feed (product.outbox): consumers don't see the events of the
+# last OUTBOX_VISIBILITY_DELAY seconds, which may still be joined by lower ids.
+# compact_outbox drops superseded events after OUTBOX_COMPACT_AFTER seconds and
+# deletion events after OUTBOX_TOMBSTONE_RETENTION seconds.
+OUTBOX_VISIBILITY_DELAY = env.float("OUTBOX_VISIBILITY_DELAY", 10)
+OUTBOX_COMPACT_AFTER = env.int("OUTBOX_COMPACT_AFTER", 24 * 3600)
+OUTBOX_TOMBSTONE_RETENTION = env.int("OUTBOX_TOMBSTONE_RETENTION", 7 * 24 * 3600)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -154,13 +321,37 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.CachedJWTAuthentication",
+    ),
+    # proxies in front of the server, whose X-Forwarded-For entries identify
+    # the clients of the login throttles: 1 behind the nginx of docker-compose,
+    # unset for clients connecting directly, which could forge the header
+    "NUM_PROXIES": env.int("NUM_PROXIES", None),
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": env.str("LOGIN_IP_THROTTLE_RATE", "30/min"),
+        "login_account": env.str("LOGIN_ACCOUNT_THROTTLE_RATE", "10/min"),
+        "password_change": env.str("PASSWORD_CHANGE_THROTTLE_RATE", "5/min"),
+        "catalog_export": env.str("CATALOG_EXPORT_THROTTLE_RATE", "10/hour"),
+    },
+    # orjson backed when installed, same bytes as rest_framework's JSONRenderer
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ),
 }
 
+# Per-process LRU of JWT authenticated users, a TTL of 0 disables it. The TTL
+# bounds how long other processes keep a user after it is changed.
+AUTH_USER_CACHE_SIZE = env.int("AUTH_USER_CACHE_SIZE", 10000)
+AUTH_USER_CACHE_TTL = env.int("AUTH_USER_CACHE_TTL", 30)
+# Build request.user from the is_staff/is_superuser claims signed at login
+# without a query. A demoted or deactivated user keeps their access until the
+# access token expires.
+JWT_TRUST_TOKEN_CLAIMS = env.bool("JWT_TRUST_TOKEN_CLAIMS", False)
+
 if not DEBUG:
     REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
-            "rest_framework.renderers.JSONRenderer",
+            "core.renderers.FastJSONRenderer",
         )
 
 CORS_ORIGIN_ALLOW_CREDENTIALS = True
@@ -173,5 +364,9 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "user.api.v1.serializers.CustomTokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "user.api.v1.serializers.CustomTokenVerifySerializer",
 }
+# Seconds between two pulls of the tokens revoked by other processes.
+TOKEN_REVOCATION_SYNC_INTERVAL = env.float("TOKEN_REVOCATION_SYNC_INTERVAL", 2.0)
 TOKEN_OBTAIN_SERIALIZER = "user.serializers.TokenObtainSerializer"
@@ -0,0 +1,45 @@
+"""
+Helpers for the test suites.
+"""
+
+import copy
+import tempfile
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.utils.module_loading import import_string
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Django's runner without the random sampling of core.performance, whose
+    log lines would land in the middle of the test output. Tests of the
+    sampling set ``PERFORMANCE_SAMPLE_RATE`` themselves.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._sampling = override_settings(PERFORMANCE_SAMPLE_RATE=0)
+        self._sampling.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._sampling.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+def use_temporary_caches(test):
+    """
+    Point the file caches at a directory of their own for ``test``, rather
+    than at the live caches of the host, and remove it afterwards.
+    """
+    directory = tempfile.TemporaryDirectory(prefix="ecommerce-test-cache-")
+    test.addCleanup(directory.cleanup)
+    caches = copy.deepcopy(settings.CACHES)
+    for alias, cache in caches.items():
+        if issubclass(import_string(cache["BACKEND"]), FileBasedCache):
+            cache["LOCATION"] = f"{directory.name}/{alias}"
+    override = override_settings(CACHES=caches)
+    override.enable()
+    test.addCleanup(override.disable)
@@ -15,12 +15,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import include, path
 
+from core.views import DatabasePoolStatsView
 from user.views import home
-from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path("", home, name="home"),
@@ -29,5 +30,12 @@ urlpatterns = [
     path("api/v1/", include("user.api.v1.urls")),
     # Product APP urls
     path("api/v1/", include("product.api.v1.urls")),
+    # Order APP urls
+    path("api/v1/", include("order.api.v1.urls")),
+    path(
+        "api/v1/database/pool/stats/",
+        DatabasePoolStatsView.as_view(),
+        name="database-pool-stats",
+    ),
 ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
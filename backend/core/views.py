@@ -0,0 +1,14 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import pool
+
+
+class DatabasePoolStatsView(APIView):
+    """Wait time and utilization of this process's database connection pools."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(pool.stats())
@@ -3,6 +3,24 @@
 # Wait for Postgres to be ready
 /wait-for-postgres.sh postgresdb
 
-python manage.py collectstatic --noinput
-python manage.py migrate --noinput
-python -m gunicorn --bind 0.0.0.0:8000 core.wsgi:application
\ No newline at end of file
+# STARTUP_MODE=fast (default) collects the static files and migrates only when
+# something changed, in a single Django startup; full always runs both; serve
+# runs neither, e.g. when a release job migrated before the rollout
+case "${STARTUP_MODE:-fast}" in
+    fast)
+        python manage.py prepare_server
+        ;;
+    full)
+        python manage.py collectstatic --noinput
+        python manage.py migrate --noinput
+        ;;
+    serve)
+        ;;
+    *)
+        >&2 echo "Unknown STARTUP_MODE ${STARTUP_MODE}, use fast, full or serve"
+        exit 1
+        ;;
+esac
+# worker class, worker count, preload and recycling come from the SERVER_*
+# variables, see core/gunicorn_conf.py
+exec python -m gunicorn -c python:core.gunicorn_conf
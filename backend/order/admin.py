@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from order.models import Order, OrderLine
+
+
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    readonly_fields = ("product", "product_name", "quantity", "price")
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "total", "expires_at", "created_at")
+    list_filter = ("status",)
+    search_fields = ("user__email",)
+    inlines = (OrderLineInline,)
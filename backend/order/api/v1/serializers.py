@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+from order.models import Order, OrderLine
+
+
+class OrderLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderLine
+        fields = ["product", "product_name", "quantity", "price"]
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    lines = OrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["id", "status", "expires_at", "total", "lines", "created_at"]
+
+
+class ReservationItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class ReservationSerializer(serializers.Serializer):
+    items = ReservationItemSerializer(many=True, allow_empty=False, max_length=100)
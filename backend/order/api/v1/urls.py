@@ -0,0 +1,14 @@
+from django.urls import include
+from rest_framework.routers import DefaultRouter
+from rest_framework.urls import path
+
+from order.api.v1.views import OrderViewSet
+
+router = DefaultRouter()
+router.register(
+    r"", OrderViewSet, basename="order"
+)  # endpoints [order-list, order-detail, order-checkout, order-cancel]
+
+urlpatterns = [
+    path("orders/", include(router.urls)),
+]
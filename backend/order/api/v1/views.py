@@ -0,0 +1,58 @@
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from order import reservations
+from order.api.v1.serializers import OrderSerializer, ReservationSerializer
+from order.models import Order
+
+
+class OrderViewSet(
+    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
+    """
+    The orders of the current user. ``POST`` reserves stock for a new order,
+    which must be checked out before its hold expires.
+    """
+
+    serializer_class = OrderSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return (
+            Order.objects.filter(user_id=self.request.user.pk)
+            .prefetch_related("lines")
+            .order_by("-created_at")
+        )
+
+    def create(self, request):
+        serializer = ReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            order = reservations.reserve(
+                request.user, serializer.validated_data["items"]
+            )
+        except reservations.ReservationError as exc:
+            return Response({"errors": exc.errors}, status=status.HTTP_409_CONFLICT)
+        return Response(
+            self.get_serializer(self.get_queryset().get(pk=order.pk)).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=True, methods=["post"])
+    def checkout(self, request, pk=None):
+        return self._transition(reservations.checkout, "checked out")
+
+    @action(detail=True, methods=["post"])
+    def cancel(self, request, pk=None):
+        return self._transition(reservations.cancel, "cancelled")
+
+    def _transition(self, transition, verb):
+        order = self.get_object()
+        if not transition(order.pk):
+            order.refresh_from_db(fields=["status"])
+            return Response(
+                {"detail": f"A {order.status} order can't be {verb}."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(self.get_serializer(self.get_object()).data)
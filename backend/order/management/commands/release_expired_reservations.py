@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from order.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = "Give the stock of expired order reservations back."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep sweeping every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, interval, **options):
+        while True:
+            released = release_expired()
+            if released or interval is None:
+                self.stdout.write(f"Released {released} expired reservations")
+            if interval is None:
+                return
+            close_old_connections()
+            time.sleep(interval)
@@ -0,0 +1,57 @@
+from django.db import models
+
+from product.models import Product
+from user.models import EcommerceUser
+
+
+class Order(models.Model):
+    """
+    An order holds its stock from the moment it is reserved: the quantities
+    are taken off ``Stock`` until the hold expires, is cancelled or is
+    checked out. See order.reservations.
+    """
+
+    class Status(models.TextChoices):
+        RESERVED = "reserved"
+        CONFIRMED = "confirmed"
+        CANCELLED = "cancelled"
+        EXPIRED = "expired"
+
+    user = models.ForeignKey(
+        EcommerceUser, on_delete=models.CASCADE, related_name="orders"
+    )
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.RESERVED
+    )
+    # end of the hold of a reserved order
+    expires_at = models.DateTimeField()
+    total = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+            # Backs the sweep of the expired holds.
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status="reserved"),
+                name="order_reserved_expiry_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Order {self.pk} ({self.status})"
+
+
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")
+    product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, null=True, related_name="order_lines"
+    )
+    product_name = models.CharField(max_length=200)
+    quantity = models.PositiveIntegerField()
+    price = models.FloatField()
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
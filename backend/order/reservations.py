@@ -0,0 +1,207 @@
+"""
+Stock reservations.
+
+Reserving an order takes its quantities off ``Stock`` right away with one
+conditional ``UPDATE ... SET quantity = quantity - n WHERE quantity >= n`` per
+product: the database decides atomically whether there is enough stock, so
+concurrent checkouts of the same product can't oversell and no lock outlives
+the reserving transaction. Products are updated in id order so concurrent
+multi-line orders can't deadlock. The stock of a sharded product is taken from
+one of its shards instead, and reaches the catalog at the next flush, see
+product.counters.
+
+A reservation is a time-limited hold. Checking it out keeps the stock taken;
+cancelling it, or letting it expire, gives the stock back. Every transition
+is a conditional ``UPDATE`` on the order status, so a hold is released at most
+once whatever races between the sweep, the customer and the checkout.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from order.models import Order, OrderLine
+from product import cache as catalog_cache
+from product import counters, outbox, read_model
+from product.models import Product, Stock
+
+
+class ReservationError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def reserve(user, items, ttl=None):
+    """
+    Hold ``items``, ``{product_id, quantity}`` entries, for ``user`` during
+    ``ttl`` seconds (``ORDER_RESERVATION_TTL`` by default) and return the
+    reserved Order. Raises ReservationError, without holding anything, when a
+    product is unknown or out of stock.
+    """
+    quantities = Counter()
+    for item in items:
+        quantities[item["product_id"]] += item["quantity"]
+    ttl = settings.ORDER_RESERVATION_TTL if ttl is None else ttl
+    now = timezone.now()
+
+    with transaction.atomic():
+        products = {
+            product["id"]: product
+            for product in Product.objects.filter(pk__in=quantities).values(
+                "id", "name", "price"
+            )
+        }
+        errors = [
+            {"product_id": product_id, "detail": "Product does not exist."}
+            for product_id in sorted(quantities.keys() - products.keys())
+        ]
+        if errors:
+            raise ReservationError(errors)
+
+        sharded = set()
+        for product_id in sorted(quantities):
+            taken, in_shards = counters.take_stock(
+                product_id, quantities[product_id], now
+            )
+            if in_shards:
+                sharded.add(product_id)
+            if not taken:
+                # give up at the first shortage, the rollback releases the
+                # rows taken so far
+                raise ReservationError(
+                    [{"product_id": product_id, "detail": "Not enough stock."}]
+                )
+        _record_stock_changes(
+            {
+                product_id: -quantity
+                for product_id, quantity in quantities.items()
+                if product_id not in sharded
+            },
+            now,
+        )
+
+        order = Order.objects.create(
+            user=user,
+            expires_at=now + timedelta(seconds=ttl),
+            total=round(
+                sum(
+                    products[product_id]["price"] * quantity
+                    for product_id, quantity in quantities.items()
+                ),
+                2,
+            ),
+        )
+        OrderLine.objects.bulk_create(
+            OrderLine(
+                order=order,
+                product_id=product_id,
+                product_name=products[product_id]["name"],
+                quantity=quantity,
+                price=products[product_id]["price"],
+            )
+            for product_id, quantity in sorted(quantities.items())
+        )
+
+    _invalidate_catalog(quantities.keys() - sharded)
+    return order
+
+
+def checkout(order_id):
+    """Turn a live hold into a confirmed order. False if it isn't one anymore."""
+    now = timezone.now()
+    return bool(
+        Order.objects.filter(
+            pk=order_id, status=Order.Status.RESERVED, expires_at__gt=now
+        ).update(status=Order.Status.CONFIRMED, updated_at=now)
+    )
+
+
+def cancel(order_id):
+    """Release a hold at the customer's request. False if it isn't one anymore."""
+    return release(order_id, Order.Status.CANCELLED)
+
+
+def release(order_id, status):
+    """
+    Move a reserved order to ``status`` and give its stock back. Returns False,
+    without touching the stock, when the order is no longer reserved.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        released = Order.objects.filter(
+            pk=order_id, status=Order.Status.RESERVED
+        ).update(status=status, updated_at=now)
+        if not released:
+            return False
+        quantities = Counter()
+        for product_id, quantity in OrderLine.objects.filter(
+            order_id=order_id, product__isnull=False
+        ).values_list("product_id", "quantity"):
+            quantities[product_id] += quantity
+        sharded = {
+            product_id
+            for product_id in sorted(quantities)
+            if counters.give_stock(product_id, quantities[product_id], now)
+        }
+        unsharded = {
+            product_id: quantity
+            for product_id, quantity in quantities.items()
+            if product_id not in sharded
+        }
+        _record_stock_changes(unsharded, now)
+
+    _invalidate_catalog(unsharded)
+    return True
+
+
+def release_expired(now=None, batch_size=500):
+    """Release the holds expired at ``now``, returns how many were released."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        order_ids = list(
+            Order.objects.filter(status=Order.Status.RESERVED, expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        # one transaction per order keeps the stock rows locked briefly
+        released += sum(
+            release(order_id, Order.Status.EXPIRED) for order_id in order_ids
+        )
+        if len(order_ids) < batch_size:
+            return released
+
+
+def _record_stock_changes(deltas, now):
+    """Carry the stock deltas into the read model, stock rows still locked."""
+    if not deltas:
+        return
+    quantities = dict(
+        Stock.objects.filter(product_id__in=deltas).values_list(
+            "product_id", "quantity"
+        )
+    )
+    read_model.apply_stock_changes(
+        {
+            product_id: (delta, quantities[product_id])
+            for product_id, delta in deltas.items()
+            if product_id in quantities
+        },
+        now,
+    )
+    outbox.record("stock", sorted(deltas))
+
+
+def _invalidate_catalog(product_ids):
+    if not product_ids:
+        return
+    catalog_cache.invalidate_objects(
+        "stock",
+        Stock.objects.filter(product_id__in=product_ids).values_list("pk", flat=True),
+    )
+    catalog_cache.invalidate_objects("product", list(product_ids))
+    catalog_cache.invalidate_lists("stock", "product")
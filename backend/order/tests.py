@@ -0,0 +1,212 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse_lazy
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.testing import use_temporary_caches
+from order import reservations
+from order.models import Order
+from product import counters, read_model
+from product.models import Category, CategorySummary, Product, ProductSummary, Stock
+from user.models import EcommerceUser
+
+
+def set_stock(product, quantity):
+    stock = product.stock
+    stock.quantity = quantity
+    stock.save()
+
+
+class OrderReservationTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.user = EcommerceUser.objects.create_user(
+            email="buyer@mail.com", password="password"
+        )
+        token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+        category = Category.objects.create(name="Phones")
+        self.phone = Product.objects.create(name="Phone", price=100, category=category)
+        self.case = Product.objects.create(name="Case", price=5.5, category=category)
+        set_stock(self.phone, 3)
+        set_stock(self.case, 10)
+
+    def reserve(self, *items):
+        return self.client.post(
+            reverse_lazy("order-list"),
+            {
+                "items": [
+                    {"product_id": product.id, "quantity": quantity}
+                    for product, quantity in items
+                ]
+            },
+            format="json",
+        )
+
+    def quantity(self, product):
+        return Stock.objects.get(product=product).quantity
+
+    def test_reserve_takes_the_stock_off(self):
+        response = self.reserve((self.phone, 2), (self.case, 1), (self.case, 1))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = response.json()
+        self.assertEqual(order["status"], "reserved")
+        self.assertEqual(order["total"], 211)
+        self.assertEqual([line["quantity"] for line in order["lines"]], [2, 2])
+        self.assertEqual((self.quantity(self.phone), self.quantity(self.case)), (1, 8))
+        self.assertEqual(ProductSummary.objects.get(pk=self.phone.pk).stock, 1)
+        self.assertEqual(
+            read_model.verify()["categories"],
+            {"missing": [], "stale": [], "orphaned": []},
+        )
+
+    def test_shortage_holds_nothing(self):
+        response = self.reserve((self.case, 2), (self.phone, 4))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            response.json()["errors"],
+            [{"product_id": self.phone.id, "detail": "Not enough stock."}],
+        )
+        self.assertEqual((self.quantity(self.phone), self.quantity(self.case)), (3, 10))
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_and_cancel(self):
+        first = self.reserve((self.phone, 1)).json()
+        second = self.reserve((self.phone, 1)).json()
+
+        response = self.client.post(reverse_lazy("order-checkout", args=[first["id"]]))
+        self.assertEqual(response.json()["status"], "confirmed")
+        response = self.client.post(reverse_lazy("order-cancel", args=[first["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.quantity(self.phone), 1)
+
+        response = self.client.post(reverse_lazy("order-cancel", args=[second["id"]]))
+        self.assertEqual(response.json()["status"], "cancelled")
+        self.assertEqual(self.quantity(self.phone), 2)
+
+    def test_expired_holds_are_released_by_the_sweep(self):
+        order = self.reserve((self.phone, 2)).json()
+        Order.objects.filter(pk=order["id"]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        response = self.client.post(reverse_lazy("order-checkout", args=[order["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        call_command("release_expired_reservations", stdout=StringIO())
+        self.assertEqual(Order.objects.get(pk=order["id"]).status, "expired")
+        self.assertEqual(self.quantity(self.phone), 3)
+        # released once only
+        self.assertEqual(reservations.release_expired(), 0)
+        self.assertEqual(self.quantity(self.phone), 3)
+        rollup = CategorySummary.objects.get(pk=self.phone.category_id)
+        self.assertEqual(rollup.stock_total, 13)
+
+    def test_orders_are_private(self):
+        order = self.reserve((self.phone, 1)).json()
+        other = APIClient()
+        stranger = EcommerceUser.objects.create_user(
+            email="other@mail.com", password="password"
+        )
+        token = RefreshToken.for_user(stranger)
+        other.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+        response = other.get(reverse_lazy("order-detail", args=[order["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(other.get(reverse_lazy("order-list")).json(), [])
+
+
+class ReservationStressTestCase(TransactionTestCase):
+    """Thousands of checkouts racing on one hot product must never oversell."""
+
+    CLIENTS = 16
+    ATTEMPTS = 2000
+    STOCK = 500
+
+    def setUp(self):
+        use_temporary_caches(self)
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest(
+                "concurrent writers need PostgreSQL or a file based SQLite test "
+                "database, see DATABASE_TEST_NAME"
+            )
+
+    def test_hot_product(self):
+        self.race(shard_count=0)
+
+    def test_hot_sharded_product(self):
+        self.race(shard_count=8)
+
+    def race(self, shard_count):
+        user = EcommerceUser.objects.create_user(
+            email="buyer@mail.com", password="password"
+        )
+        category = Category.objects.create(name="Consoles")
+        product = Product.objects.create(name="Console", price=500, category=category)
+        set_stock(product, self.STOCK)
+        counters.set_shard_count([product.pk], shard_count)
+
+        attempts = iter(range(self.ATTEMPTS))
+        lock = threading.Lock()
+        outcomes = {"reserved": 0, "sold out": 0, "failed": []}
+
+        def client():
+            while True:
+                with lock:
+                    if next(attempts, None) is None:
+                        return
+                try:
+                    order = reservations.reserve(
+                        user, [{"product_id": product.id, "quantity": 1}]
+                    )
+                except reservations.ReservationError:
+                    outcome = "sold out"
+                except DatabaseError as exc:
+                    with lock:
+                        outcomes["failed"].append(repr(exc))
+                    continue
+                else:
+                    outcome = "reserved"
+                    # give some back early on, so reserving and releasing
+                    # interleave while there still is stock to sell
+                    if order.pk % 10 == 0 and order.pk < self.STOCK:
+                        reservations.cancel(order.pk)
+                        outcome = "cancelled"
+                finally:
+                    # back to the pool after every checkout, as after a
+                    # request: there are more clients than pooled connections
+                    connections.close_all()
+                with lock:
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+        threads = [threading.Thread(target=client) for _ in range(self.CLIENTS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes["failed"], [])
+        counters.flush()
+        held = sum(
+            line.quantity
+            for order in Order.objects.exclude(status="cancelled").prefetch_related(
+                "lines"
+            )
+            for line in order.lines.all()
+        )
+        quantity = Stock.objects.get(product=product).quantity
+        self.assertEqual(held, outcomes["reserved"])
+        self.assertEqual(held + quantity, self.STOCK)
+        self.assertEqual(quantity, 0)
+        self.assertEqual(ProductSummary.objects.get(pk=product.pk).stock, 0)
+        self.assertEqual(
+            read_model.verify()["categories"],
+            {"missing": [], "stale": [], "orphaned": []},
+        )
@@ -1,6 +1,14 @@
-from product.models import Category, Product, Stock
 from django.contrib import admin
 
+from product.models import (
+    Category,
+    CategorySummary,
+    OutboxEvent,
+    Product,
+    ProductSummary,
+    Stock,
+)
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -25,4 +33,42 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Stock)
 class StockAdmin(admin.ModelAdmin):
-    list_display = ("id", "product", "quantity", "location")
+    list_display = ("id", "product", "quantity", "shard_count", "location")
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Rows maintained by the write paths only, the read model and the outbox."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProductSummary)
+class ProductSummaryAdmin(ReadOnlyAdmin):
+    list_display = ("id", "name", "price", "category_name", "stock", "updated_at")
+    search_fields = ("name",)
+
+
+@admin.register(CategorySummary)
+class CategorySummaryAdmin(ReadOnlyAdmin):
+    list_display = (
+        "category",
+        "name",
+        "product_count",
+        "in_stock_count",
+        "stock_total",
+        "min_price",
+        "max_price",
+    )
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(ReadOnlyAdmin):
+    list_display = ("id", "topic", "object_id", "action", "created_at")
+    list_filter = ("topic", "action")
@@ -0,0 +1,187 @@
+"""
+Async read path of the catalog.
+
+The list and detail endpoints of products, categories and stock are served
+natively under ASGI with the async ORM, so a worker keeps serving other
+readers while a query is in flight instead of parking a thread per request.
+Representations, filters, pagination, conditional GET, the catalog cache and
+the surrogate keys behave as on the sync viewsets, which keep serving every write.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from core.renderers import FastJSONRenderer
+from product import cache as catalog_cache
+from product import edge
+from product.api.v1.filters import ProductFilterBackend
+from product.api.v1.mixins import (
+    make_validators,
+    not_modified_response,
+    set_validator_headers,
+    validator_aggregates,
+)
+from product.api.v1.pagination import CatalogCursorPagination
+from product.api.v1.serializers import (
+    CategoryReadSerializer,
+    ProductSummaryReadSerializer,
+    StockReadSerializer,
+)
+from product.models import Category, ProductSummary, Stock
+
+
+class AsyncCatalogReadView(View):
+    """
+    Async ``GET`` of a catalog list (no ``pk``) or detail (``pk``) endpoint,
+    rendered from ``.values()`` rows by a ``ValuesSerializer``.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    queryset = None
+    serializer_class = None
+    filter_backends = ()
+    pagination_class = CatalogCursorPagination
+    cache_label = None
+    validator_fields = ("updated_at",)
+
+    async def get(self, request, pk=None):
+        # DRF's request wrapper gives the filters and paginator query_params
+        request = Request(request)
+        try:
+            queryset = self.filter_queryset(request, self.queryset.all())
+            queryset = queryset.values(*self.serializer_class.lookups())
+            if pk is None:
+                response = await self.list(request, queryset)
+            else:
+                response = await self.retrieve(request, queryset, pk)
+        except APIException as exc:
+            # invalid filters, an invalid cursor: rendered as DRF's handler does
+            detail = exc.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {"detail": detail}
+            return self.render(detail, status=exc.status_code)
+        # reads the catalog cache behind a replica
+        return await sync_to_async(edge.tag_response, thread_sensitive=False)(
+            request, response, self.cache_label, pk
+        )
+
+    def filter_queryset(self, request, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+        return queryset
+
+    async def list(self, request, queryset):
+        async def produce():
+            # the keyset paginator evaluates its page itself
+            paginator = self.pagination_class()
+            return await sync_to_async(self._paginate)(paginator, request, queryset)
+
+        async def get_cache_key():
+            # reads the generation of the lists from the cache
+            return await sync_to_async(catalog_cache.list_key, thread_sensitive=False)(
+                self.cache_label, request.build_absolute_uri()
+            )
+
+        validators = await self.read_validators(
+            queryset, request.get_full_path(), get_cache_key
+        )
+        return await self.conditional_response(
+            request, validators, lambda: self.read_through(get_cache_key, produce)
+        )
+
+    async def retrieve(self, request, queryset, pk):
+        queryset = queryset.filter(pk=pk)
+
+        async def produce():
+            return self.serialize(request, await queryset.aget())
+
+        async def get_cache_key():
+            return catalog_cache.detail_key(self.cache_label, pk)
+
+        validators = await self.read_validators(queryset, str(pk), get_cache_key)
+        if validators is None:
+            return self.not_found()
+        try:
+            return await self.conditional_response(
+                request,
+                validators,
+                # representations embed absolute media URLs
+                lambda: self.read_through(
+                    get_cache_key, produce, variant=request.get_host()
+                ),
+            )
+        except queryset.model.DoesNotExist:
+            return self.not_found()
+
+    def serialize(self, request, instance, many=False):
+        return self.serializer_class(
+            instance, many=many, context={"request": request, "view": self}
+        ).data
+
+    def _paginate(self, paginator, request, queryset):
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(
+            self.serialize(request, page, many=True)
+        ).data
+
+    async def read_validators(self, queryset, discriminator, get_cache_key):
+        async def compute():
+            aggregates = await queryset.aaggregate(
+                **validator_aggregates(self.validator_fields)
+            )
+            return make_validators(self.cache_label, discriminator, aggregates)
+
+        if not catalog_cache.is_enabled():
+            return await compute()
+        return await catalog_cache.aread_through(
+            catalog_cache.validators_key(await get_cache_key()), compute
+        )
+
+    async def read_through(self, get_cache_key, produce, variant=None):
+        if not catalog_cache.is_enabled():
+            return await produce()
+        return await catalog_cache.aread_through(
+            await get_cache_key(), produce, variant
+        )
+
+    async def conditional_response(self, request, validators, produce):
+        if validators is None:
+            return self.render(await produce())
+        response = not_modified_response(request, validators)
+        if response is None:
+            response = self.render(await produce())
+        return set_validator_headers(response, validators)
+
+    def not_found(self):
+        name = self.queryset.model._meta.object_name
+        return self.render({"detail": f"No {name} matches the given query."}, 404)
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            FastJSONRenderer().render(data),
+            content_type="application/json",
+            status=status,
+        )
+
+
+class AsyncProductView(AsyncCatalogReadView):
+    queryset = ProductSummary.objects.all()
+    serializer_class = ProductSummaryReadSerializer
+    filter_backends = (ProductFilterBackend,)
+    cache_label = "product"
+
+
+class AsyncCategoryView(AsyncCatalogReadView):
+    queryset = Category.objects.all()
+    serializer_class = CategoryReadSerializer
+    cache_label = "category"
+
+
+class AsyncStockView(AsyncCatalogReadView):
+    queryset = Stock.objects.select_related("product")
+    serializer_class = StockReadSerializer
+    cache_label = "stock"
+    validator_fields = ("updated_at", "product__updated_at")
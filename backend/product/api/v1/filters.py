@@ -0,0 +1,118 @@
+from django.db.models import Case, Count, IntegerField, Value, When
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from product.models import ProductSummary
+
+# Upper bounds of the price facet buckets, the last bucket is open ended.
+PRICE_FACET_BOUNDS = (50, 100, 250, 500, 1000)
+
+TRUE_VALUES = ("1", "true", "yes")
+FALSE_VALUES = ("0", "false", "no")
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    Server-side product filters:
+
+    - ``category``: one or more comma separated category ids
+    - ``min_price`` / ``max_price``: inclusive price range
+    - ``in_stock``: ``true`` for products with a positive stock quantity
+
+    Applies to products and to their ``ProductSummary`` read model.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        # the summaries carry the quantity themselves
+        stock = "stock" if queryset.model is ProductSummary else "stock__quantity"
+        if params.get("category"):
+            queryset = queryset.filter(
+                category_id__in=self._parse_ids("category", params["category"])
+            )
+        if params.get("min_price"):
+            queryset = queryset.filter(
+                price__gte=self._parse_price("min_price", params["min_price"])
+            )
+        if params.get("max_price"):
+            queryset = queryset.filter(
+                price__lte=self._parse_price("max_price", params["max_price"])
+            )
+        if params.get("in_stock"):
+            in_stock = params["in_stock"].lower()
+            if in_stock in TRUE_VALUES:
+                queryset = queryset.filter(**{f"{stock}__gt": 0})
+            elif in_stock in FALSE_VALUES:
+                queryset = queryset.filter(**{stock: 0})
+            else:
+                raise ValidationError({"in_stock": "Expected true or false."})
+        return queryset
+
+    def _parse_ids(self, param, value):
+        try:
+            return [int(pk) for pk in value.split(",") if pk]
+        except ValueError:
+            raise ValidationError({param: "Expected comma separated ids."})
+
+    def _parse_price(self, param, value):
+        try:
+            return float(value)
+        except ValueError:
+            raise ValidationError({param: "Expected a number."})
+
+
+def price_bucket_bounds():
+    """(min, max) of every price bucket, ``max`` is None for the last one."""
+    lower_bounds = (0, *PRICE_FACET_BOUNDS)
+    upper_bounds = (*PRICE_FACET_BOUNDS, None)
+    return list(zip(lower_bounds, upper_bounds))
+
+
+def product_facets(queryset):
+    """
+    Category, price bucket and availability counts of ``queryset``, computed
+    by a single grouped aggregate query.
+    """
+    bucket = Case(
+        *[
+            When(price__lt=bound, then=Value(index))
+            for index, bound in enumerate(PRICE_FACET_BOUNDS)
+        ],
+        default=Value(len(PRICE_FACET_BOUNDS)),
+        output_field=IntegerField(),
+    )
+    rows = (
+        queryset.order_by()
+        .annotate(
+            bucket=bucket,
+            available=Case(
+                When(stock__quantity__gt=0, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+        )
+        .values("category_id", "category__name", "bucket", "available")
+        .annotate(count=Count("pk"))
+    )
+
+    categories = {}
+    buckets = [0] * (len(PRICE_FACET_BOUNDS) + 1)
+    in_stock = 0
+    for row in rows:
+        category = categories.setdefault(
+            row["category_id"],
+            {"id": row["category_id"], "name": row["category__name"], "count": 0},
+        )
+        category["count"] += row["count"]
+        buckets[row["bucket"]] += row["count"]
+        in_stock += row["count"] if row["available"] else 0
+
+    return {
+        "categories": sorted(categories.values(), key=lambda c: (-c["count"], c["id"])),
+        "price": [
+            {"min": low, "max": high, "count": count}
+            for (low, high), count in zip(price_bucket_bounds(), buckets)
+        ],
+        "in_stock": in_stock,
+        "total": sum(buckets),
+    }
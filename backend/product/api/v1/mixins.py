@@ -0,0 +1,204 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from product import cache as catalog_cache
+from product import edge
+
+
+def validator_aggregates(fields):
+    """Aggregates from which the validators of a queryset are computed."""
+    return {
+        "count": Count("pk"),
+        **{f"max_{i}": Max(field) for i, field in enumerate(fields)},
+    }
+
+
+def make_validators(label, discriminator, aggregates):
+    """``(etag, last_modified)`` from the aggregates, None for no rows."""
+    count = aggregates.pop("count")
+    if not count:
+        return None
+    last_modified = max(v for v in aggregates.values() if v is not None)
+    raw = f"{label}:{discriminator}:{count}:{last_modified}"
+    etag = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(etag), int(last_modified.timestamp())
+
+
+def not_modified_response(request, validators):
+    """The 304 (or 412) response when the validators match, else None."""
+    etag, last_modified = validators
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def is_canonical_id(lookup):
+    """
+    Whether ``lookup`` is an id as written by the invalidations, the only ones
+    whose cached entries are ever invalidated.
+    """
+    lookup = str(lookup)
+    return lookup.isdigit() and lookup == str(int(lookup))
+
+
+def set_validator_headers(response, validators):
+    if response.status_code in (200, 304):
+        etag, last_modified = validators
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer ``list`` and ``retrieve`` with 304 Not Modified when the client's
+    validators still match, before any serializer runs.
+
+    Validators come from the row count and the newest ``updated_at`` among
+    ``validator_fields``, which must cover every related row rendered in the
+    representation. They are memoized in the catalog cache next to the data.
+    """
+
+    validator_fields = ("updated_at",)
+
+    def list(self, request, *args, **kwargs):
+        validators = self._read_validators(
+            self.filter_queryset(self.get_queryset()),
+            request.get_full_path(),
+            lambda: catalog_cache.list_key(
+                self.cache_label, request.build_absolute_uri()
+            ),
+        )
+        return self._conditional_response(
+            request, validators, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not is_canonical_id(lookup):
+            # not found, or found without validators
+            return super().retrieve(request, *args, **kwargs)
+        validators = self._read_validators(
+            self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: lookup}
+            ),
+            lookup,
+            lambda: catalog_cache.detail_key(self.cache_label, lookup),
+        )
+        return self._conditional_response(
+            request, validators, super().retrieve, *args, **kwargs
+        )
+
+    def _read_validators(self, queryset, discriminator, get_cache_key):
+        def compute():
+            aggregates = queryset.aggregate(
+                **validator_aggregates(self.validator_fields)
+            )
+            return make_validators(self.cache_label, discriminator, aggregates)
+
+        if not catalog_cache.is_enabled():
+            return compute()
+        return catalog_cache.read_through(
+            catalog_cache.validators_key(get_cache_key()), compute
+        )
+
+    def _conditional_response(self, request, validators, view, *args, **kwargs):
+        if validators is None:
+            # empty or missing, let the view render its usual response
+            return view(request, *args, **kwargs)
+        response = not_modified_response(request, validators)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return set_validator_headers(response, validators)
+
+
+class CatalogCacheMixin:
+    """
+    Serve ``list`` and ``retrieve`` through the read-through catalog cache.
+
+    ``cache_label`` names the model whose writes invalidate the entries.
+    """
+
+    cache_label = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_list_response(request, super().list, *args, **kwargs)
+
+    def cached_list_response(self, request, view, *args, **kwargs):
+        """Serve a list-like ``view`` from the cache, keyed by its full URL."""
+        if not catalog_cache.is_enabled():
+            return view(request, *args, **kwargs)
+        key = catalog_cache.list_key(self.cache_label, request.build_absolute_uri())
+        data = catalog_cache.read_through(
+            key, lambda: view(request, *args, **kwargs).data
+        )
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = str(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        # only canonical ids, so that every cached entry can be invalidated
+        if not (catalog_cache.is_enabled() and is_canonical_id(lookup)):
+            return super().retrieve(request, *args, **kwargs)
+        produce = super().retrieve
+        data = catalog_cache.read_through(
+            catalog_cache.detail_key(self.cache_label, lookup),
+            lambda: produce(request, *args, **kwargs).data,
+            # representations embed absolute media URLs
+            variant=request.get_host(),
+        )
+        return Response(data)
+
+
+class EdgeCacheMixin:
+    """
+    Tag the catalog reads of ``edge_cache_actions`` with their surrogate keys
+    and let the caching proxy share them with anonymous clients, see
+    ``product.edge``.
+    """
+
+    edge_cache_actions = ("list", "retrieve")
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ("GET", "HEAD") and self.action in self.edge_cache_actions:
+            pk = None
+            if self.action == "retrieve":
+                pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+            edge.tag_response(request, response, self.cache_label, pk)
+        return response
+
+
+class ValuesReadMixin:
+    """
+    Serve ``list`` and ``retrieve`` from ``.values()`` rows rendered by
+    ``read_serializer_class``, without building model instances nor running
+    the model serializer's fields. The rows are read from ``read_queryset``
+    when set, a read model of ``queryset``. Every other action keeps the model
+    serializer.
+    """
+
+    read_serializer_class = None
+    read_queryset = None
+
+    def is_values_read(self):
+        return self.read_serializer_class is not None and self.action in (
+            "list",
+            "retrieve",
+        )
+
+    def get_queryset(self):
+        if not self.is_values_read():
+            return super().get_queryset()
+        if self.read_queryset is not None:
+            queryset = self.read_queryset.all()
+        else:
+            queryset = super().get_queryset()
+        return queryset.values(*self.read_serializer_class.lookups())
+
+    def get_serializer_class(self):
+        if self.is_values_read():
+            return self.read_serializer_class
+        return super().get_serializer_class()
@@ -0,0 +1,14 @@
+from rest_framework.negotiation import BaseContentNegotiation
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    For views that build their own non-JSON response, pick the first renderer
+    whatever the ``Accept`` header asks for instead of answering 406.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
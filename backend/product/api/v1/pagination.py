@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), newest first. Every listing is
+    paged: clients follow the ``next`` links, up to ``max_page_size`` items
+    a page.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class SearchPagination(PageNumberPagination):
+    """Search results are ordered by relevance, so they are paged by number."""
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
@@ -1,4 +1,4 @@
-from rest_framework.permissions import BasePermission, SAFE_METHODS
+from rest_framework.permissions import SAFE_METHODS, BasePermission
 
 
 class IsEcommerceStaffOrReadOnly(BasePermission):
@@ -10,3 +10,12 @@ class IsEcommerceStaffOrReadOnly(BasePermission):
         if request.method in SAFE_METHODS:
             return True
         return request.user and request.user.is_authenticated and request.user.is_staff
+
+
+class IsEcommerceStaff(BasePermission):
+    """
+    Allows access only to ecommerce staff/admin users.
+    """
+
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and request.user.is_staff
@@ -1,12 +1,19 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
-from product.models import Product, Category, Stock
+from core import performance
+from product import outbox
+from product.models import Category, Product, Stock
 
 
 class EcommerceBaseSerializer(serializers.ModelSerializer):
     class Meta:
         abstract = True
 
+    def to_representation(self, instance):
+        with performance.span("serialize"):
+            return super().to_representation(instance)
+
     def create(self, validated_data):
         """Add requested user as creator to the object"""
         instance = super().create(validated_data)
@@ -32,8 +39,20 @@ class ProductSerializer(EcommerceBaseSerializer):
             instance.category.name if instance.category else None
         )
         representation["stock"] = instance.stock.quantity if instance.stock else 0
+        representation["image_srcset"] = self.image_srcset(instance.image_variants)
         return representation
 
+    def image_srcset(self, variants):
+        """Absolute URLs of the generated image variants, keyed by variant."""
+        request = self.context.get("request")
+        srcset = {}
+        for variant, name in (variants or {}).items():
+            if variant == "source":
+                continue
+            url = default_storage.url(name)
+            srcset[variant] = request.build_absolute_uri(url) if request else url
+        return srcset
+
 
 class CategorySerializer(EcommerceBaseSerializer):
     class Meta:
@@ -50,3 +69,141 @@ class StockSerializer(EcommerceBaseSerializer):
         representation = super().to_representation(instance)
         representation["product"] = instance.product.name if instance.product else None
         return representation
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer of ``.values()`` rows, the fast path of the list and
+    detail reads.
+
+    ``fields`` maps every output key, in output order, to the ``.values()``
+    lookup it is read from. ``get_mappers`` returns the converters of the
+    keys whose value is not rendered as is; they are built once per
+    serializer, not per row. Representations must stay identical to the ones
+    of the matching model serializer.
+    """
+
+    fields = {}
+    # read along with the fields, the cursor paginator reads created_at
+    extra_lookups = ("created_at",)
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def lookups(cls):
+        return list(dict.fromkeys([*cls.fields.values(), *cls.extra_lookups]))
+
+    def get_mappers(self):
+        return {}
+
+    @property
+    def data(self):
+        with performance.span("serialize"):
+            mappers = self.get_mappers()
+            columns = [
+                (key, lookup, mappers.get(key)) for key, lookup in self.fields.items()
+            ]
+
+            def represent(row):
+                return {
+                    key: row[lookup] if mapper is None else mapper(row[lookup])
+                    for key, lookup, mapper in columns
+                }
+
+            if self.many:
+                return [represent(row) for row in self.instance]
+            return represent(self.instance)
+
+
+class ProductReadSerializer(ValuesSerializer):
+    fields = {
+        "id": "id",
+        "name": "name",
+        "price": "price",
+        "image": "image",
+        "description": "description",
+        "category": "category_id",
+        "category_name": "category__name",
+        "stock": "stock__quantity",
+        "image_srcset": "image_variants",
+    }
+
+    def get_mappers(self):
+        request = self.context.get("request")
+        storage = Product._meta.get_field("image").storage
+
+        def absolute(url):
+            return request.build_absolute_uri(url) if request else url
+
+        def image(name):
+            return absolute(storage.url(name)) if name else None
+
+        def image_srcset(variants):
+            return {
+                variant: absolute(default_storage.url(name))
+                for variant, name in (variants or {}).items()
+                if variant != "source"
+            }
+
+        return {
+            "price": float,
+            "image": image,
+            "stock": lambda quantity: quantity or 0,
+            "image_srcset": image_srcset,
+        }
+
+
+class ProductSummaryReadSerializer(ProductReadSerializer):
+    """Product reads from the ``ProductSummary`` read model, no joins."""
+
+    fields = {
+        **ProductReadSerializer.fields,
+        "category_name": "category_name",
+        "stock": "stock",
+    }
+
+
+class CategoryReadSerializer(ValuesSerializer):
+    fields = {"id": "id", "name": "name"}
+
+
+class StockReadSerializer(ValuesSerializer):
+    fields = {
+        "id": "id",
+        "quantity": "quantity",
+        "location": "location",
+        "product": "product__name",
+    }
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    """One line of a bulk stock adjustment: a relative ``delta`` or an absolute ``set``."""
+
+    product_id = serializers.IntegerField()
+    delta = serializers.IntegerField(required=False)
+    set = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        if ("delta" in attrs) == ("set" in attrs):
+            raise serializers.ValidationError(
+                "Provide exactly one of 'delta' or 'set'."
+            )
+        return attrs
+
+
+class CatalogEventsQuerySerializer(serializers.Serializer):
+    """Query parameters of the catalog change feed."""
+
+    after = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=500)
+    topic = serializers.CharField(required=False, default="")
+
+    def validate_topic(self, value):
+        topics = [topic for topic in value.split(",") if topic]
+        unknown = sorted(set(topics) - set(outbox.TOPICS))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown topics: {', '.join(unknown)}.")
+        return topics
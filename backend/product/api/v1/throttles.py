@@ -0,0 +1,10 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class CatalogExportThrottle(SimpleRateThrottle):
+    """Full catalog exports per authenticated user."""
+
+    scope = "catalog_export"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": request.user.pk}
@@ -2,7 +2,18 @@ from django.urls import include
 from rest_framework.routers import DefaultRouter
 from rest_framework.urls import path
 
-from product.api.v1.views import ProductViewSet, CategoryViewSet, StockViewSet
+from product.api.v1.async_views import (
+    AsyncCategoryView,
+    AsyncProductView,
+    AsyncStockView,
+)
+from product.api.v1.views import (
+    CatalogCacheStatsView,
+    CatalogEventsView,
+    CategoryViewSet,
+    ProductViewSet,
+    StockViewSet,
+)
 
 router = DefaultRouter()
 router.register(
@@ -15,6 +26,25 @@ router.register(
     r"stock", StockViewSet, basename="stock"
 )  # endpoints [stock-list, stock-detail]
 
+# async read-only twins of the list and detail endpoints, for ASGI workers
+async_urlpatterns = []
+for prefix, view in (
+    ("product", AsyncProductView),
+    ("category", AsyncCategoryView),
+    ("stock", AsyncStockView),
+):
+    async_urlpatterns += [
+        path(f"{prefix}/", view.as_view(), name=f"async-{prefix}-list"),
+        path(f"{prefix}/<int:pk>/", view.as_view(), name=f"async-{prefix}-detail"),
+    ]
+
 urlpatterns = [
+    path("products/async/", include(async_urlpatterns)),
+    path(
+        "products/cache/stats/",
+        CatalogCacheStatsView.as_view(),
+        name="catalog-cache-stats",
+    ),
+    path("products/events/", CatalogEventsView.as_view(), name="catalog-events"),
     path("products/", include(router.urls)),
 ]
@@ -1,37 +1,250 @@
-from rest_framework import viewsets, status
+import io
+from pathlib import Path
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from product.api.v1.permissions import IsEcommerceStaffOrReadOnly
+from core.replicas import ReplicaReadMixin
+from product import cache as catalog_cache
+from product import exporter, outbox
+from product.api.v1.filters import ProductFilterBackend, product_facets
+from product.api.v1.mixins import (
+    CatalogCacheMixin,
+    ConditionalGetMixin,
+    EdgeCacheMixin,
+    ValuesReadMixin,
+)
+from product.api.v1.negotiation import IgnoreClientContentNegotiation
+from product.api.v1.pagination import CatalogCursorPagination, SearchPagination
+from product.api.v1.permissions import IsEcommerceStaff, IsEcommerceStaffOrReadOnly
 from product.api.v1.serializers import (
-    ProductSerializer,
+    CatalogEventsQuerySerializer,
+    CategoryReadSerializer,
     CategorySerializer,
+    ProductSerializer,
+    ProductSummaryReadSerializer,
+    StockAdjustmentSerializer,
+    StockReadSerializer,
     StockSerializer,
 )
-from product.models import Product, Category, Stock
+from product.api.v1.throttles import CatalogExportThrottle
+from product.importer import FORMATS, import_products, read_rows
+from product.inventory import StockAdjustmentError, adjust_stock
+from product.models import Category, Product, ProductSummary, Stock
+from product.search import search_products
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+class ProductViewSet(
+    ReplicaReadMixin,
+    EdgeCacheMixin,
+    ConditionalGetMixin,
+    CatalogCacheMixin,
+    ValuesReadMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Product.objects.select_related("category", "stock")
     serializer_class = ProductSerializer
+    read_serializer_class = ProductSummaryReadSerializer
+    read_queryset = ProductSummary.objects.all()
     permission_classes = [IsEcommerceStaffOrReadOnly]
+    pagination_class = CatalogCursorPagination
+    filter_backends = [ProductFilterBackend]
+    cache_label = "product"
+    edge_cache_actions = ("list", "retrieve", "search", "facets")
+    # list and retrieve read the summaries, whose updated_at already covers
+    # the category and the stock
+    validator_fields = ("updated_at",)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({"request": self.request})
         return context
 
+    @action(detail=False, methods=["get"], pagination_class=SearchPagination)
+    def search(self, request):
+        """Full-text search over name and description, ranked by relevance."""
+        return self.cached_list_response(request, self._search)
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """Category, price bucket and availability counts for the filters."""
+        return self.cached_list_response(request, self._facets)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-import",
+        parser_classes=[MultiPartParser],
+    )
+    def bulk_import(self, request):
+        """
+        Upsert products from an uploaded CSV or NDJSON ``file``, the format is
+        taken from ``?input=csv|ndjson`` or the file extension.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST
+            )
+        input_format = request.query_params.get(
+            "input", Path(upload.name).suffix.lstrip(".").lower()
+        )
+        if input_format not in FORMATS:
+            return Response(
+                {"input": [f"Expected one of {', '.join(FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        stream = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+        report = import_products(read_rows(stream, input_format), user=request.user)
+        return Response(report.as_dict())
+
+    @action(
+        detail=False,
+        methods=["get"],
+        content_negotiation_class=IgnoreClientContentNegotiation,
+        permission_classes=[IsEcommerceStaff],
+        throttle_classes=[CatalogExportThrottle],
+    )
+    def export(self, request):
+        """
+        Stream the (filtered) catalog as ``?output=ndjson`` (default) or ``csv``,
+        gzip-compressed when the client accepts it. Staff only, and throttled:
+        each export reads the whole catalog.
+        """
+        export_format = request.query_params.get("output", "ndjson")
+        if export_format not in exporter.FORMATS:
+            return Response(
+                {"output": [f"Expected one of {', '.join(exporter.FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        compress = exporter.accepts_gzip(request.headers.get("Accept-Encoding", ""))
+        response = StreamingHttpResponse(
+            exporter.export_catalog(
+                export_format,
+                compress=compress,
+                queryset=self.filter_queryset(Product.objects.all()),
+            ),
+            content_type=exporter.CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="catalog.{export_format}"'
+        )
+        if compress:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+    def _facets(self, request):
+        queryset = self.filter_queryset(Product.objects.all())
+        return Response(product_facets(queryset))
+
+    def _search(self, request):
+        query = request.query_params.get("q", "").strip()
+        queryset = self.get_queryset().none()
+        if query:
+            queryset = search_products(
+                self.filter_queryset(self.get_queryset()), query
+            ).order_by("-rank", "-id")
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(
+    ReplicaReadMixin,
+    EdgeCacheMixin,
+    ConditionalGetMixin,
+    CatalogCacheMixin,
+    ValuesReadMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    read_serializer_class = CategoryReadSerializer
     permission_classes = [IsEcommerceStaffOrReadOnly]
+    pagination_class = CatalogCursorPagination
+    cache_label = "category"
 
 
-class StockViewSet(viewsets.ModelViewSet):
-    queryset = Stock.objects.all()
+class StockViewSet(
+    ReplicaReadMixin,
+    EdgeCacheMixin,
+    ConditionalGetMixin,
+    CatalogCacheMixin,
+    ValuesReadMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Stock.objects.select_related("product")
     serializer_class = StockSerializer
+    read_serializer_class = StockReadSerializer
     permission_classes = [IsEcommerceStaffOrReadOnly]
+    pagination_class = CatalogCursorPagination
+    cache_label = "stock"
+    validator_fields = ("updated_at", "product__updated_at")
 
     def create(self, request, *args, **kwargs):
         response = {"message": "Create function is not offered in this path."}
         return Response(response, status=status.HTTP_403_FORBIDDEN)
+
+    @action(detail=False, methods=["post"], url_path="bulk-adjust")
+    def bulk_adjust(self, request):
+        """
+        Apply a list of ``{product_id, delta}`` / ``{product_id, set}`` entries
+        in one transaction, all or nothing.
+        """
+        serializer = StockAdjustmentSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=10000
+        )
+        serializer.is_valid(raise_exception=True)
+        try:
+            quantities = adjust_stock(serializer.validated_data)
+        except StockAdjustmentError as exc:
+            return Response({"errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {
+                "updated": len(quantities),
+                "stock": [
+                    {"product_id": product_id, "quantity": quantity}
+                    for product_id, quantity in sorted(quantities.items())
+                ],
+            }
+        )
+
+
+class CatalogCacheStatsView(APIView):
+    """
+    Hit ratio and eviction count of the process that answers, and size of the
+    catalog cache.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(catalog_cache.stats())
+
+
+class CatalogEventsView(APIView):
+    """
+    The catalog change feed: ``?after=<cursor>&limit=<n>&topic=<topic>[,...]``
+    returns the next events and the cursor to resume from.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        serializer = CatalogEventsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        events = outbox.read(params["after"], params["limit"], params["topic"])
+        return Response(
+            {
+                "events": events,
+                "cursor": events[-1]["id"] if events else params["after"],
+            }
+        )
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProductConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "product"
+
+    def ready(self):
+        from product.search import reinstall_sqlite_search_index
+
+        post_migrate.connect(reinstall_sqlite_search_index, sender=self)
@@ -0,0 +1,296 @@
+"""
+Read-through cache for catalog reads.
+
+List pages are stored under a per-model generation token, so a write only has
+to replace the token to orphan every cached page of that model. Detail objects
+are stored under their primary key and deleted one by one. Orphaned entries
+are reclaimed by the backend TTL and LRU eviction.
+
+Values read from a replica aren't stored during the replica lag that follows
+a write of their model: the replica may not have replayed the write yet, and
+the stale value would outlive the invalidation.
+
+Every invalidation also purges the matching surrogate keys from the caching
+proxy (``product.edge``) once the write commits.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from core import replicas
+from product import edge
+
+CATALOG_CACHE_ALIAS = "catalog"
+
+_MISSING = object()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+class LocMemCatalogCache(LocMemCache):
+    """Local-memory LRU backend that counts the entries it culls."""
+
+    def _cull(self):
+        before = len(self._cache)
+        super()._cull()
+        _count("evictions", before - len(self._cache))
+
+
+class FileBasedCatalogCache(FileBasedCache):
+    """
+    File backend that culls the least recently used entries first, the cache
+    being shared by the processes of the host (or of the containers mounting
+    its directory). A hit refreshes the modification time of its file, which
+    Django's backend doesn't read: the expiry is stored in the file.
+    """
+
+    # listing the entries takes milliseconds per thousand, so the size is
+    # checked at most this often rather than on every write
+    cull_interval = 1.0
+    _culled_at = None
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except FileNotFoundError:
+            # deleted by another process since it was read
+            pass
+        return value
+
+    def _cull(self):
+        now = time.monotonic()
+        if self._culled_at is not None and now - self._culled_at < self.cull_interval:
+            return
+        self._culled_at = now
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            _count("evictions", num_entries)
+            return
+        used_at = {}
+        for fname in filelist:
+            try:
+                used_at[fname] = os.path.getmtime(fname)
+            except FileNotFoundError:
+                # expired or invalidated by another process meanwhile
+                pass
+        culled = sorted(used_at, key=used_at.get)[
+            : int(num_entries / self._cull_frequency)
+        ]
+        for fname in culled:
+            self._delete(fname)
+        _count("evictions", len(culled))
+
+
+def get_cache():
+    return caches[CATALOG_CACHE_ALIAS]
+
+
+def is_enabled():
+    return settings.CATALOG_CACHE_ENABLED
+
+
+def read_through(key, producer, variant=None):
+    """
+    Return the cached value for ``key``, calling ``producer`` on a miss.
+
+    With ``variant`` the entry holds one value per variant (e.g. per host),
+    so all variants of an object are invalidated by deleting a single key.
+    """
+    cache = get_cache()
+    entry, value = _lookup(cache, key, variant)
+    if value is _MISSING:
+        value = producer()
+        if not _maybe_stale(cache, key):
+            _store(cache, key, entry, value, variant)
+    return value
+
+
+async def aread_through(key, producer, variant=None):
+    """
+    ``read_through`` for the async views, ``producer`` is awaited. The file
+    backend blocks on disk, so the lookup and the store run off the event
+    loop, in a worker thread.
+    """
+    entry, value = await sync_to_async(_lookup_key, thread_sensitive=False)(
+        key, variant
+    )
+    if value is _MISSING:
+        value = await producer()
+        await sync_to_async(_store_if_fresh, thread_sensitive=False)(
+            key, entry, value, variant
+        )
+    return value
+
+
+def _lookup_key(key, variant):
+    return _lookup(get_cache(), key, variant)
+
+
+def _store_if_fresh(key, entry, value, variant):
+    cache = get_cache()
+    if not _maybe_stale(cache, key):
+        _store(cache, key, entry, value, variant)
+
+
+def _lookup(cache, key, variant):
+    entry = cache.get(key, _MISSING)
+    if variant is None and entry is not _MISSING:
+        _count("hits")
+        return entry, entry
+    if variant is not None and entry is not _MISSING and variant in entry:
+        _count("hits")
+        return entry, entry[variant]
+    _count("misses")
+    return entry, _MISSING
+
+
+def _store(cache, key, entry, value, variant):
+    if variant is None:
+        cache.set(key, value)
+    else:
+        entry = {} if entry is _MISSING else entry
+        entry[variant] = value
+        cache.set(key, entry)
+
+
+def _maybe_stale(cache, key):
+    """Whether the value of ``key`` was read from a replica since a write."""
+    # keys are "catalog:<model label>:..."
+    return maybe_stale(key.split(":")[1], cache)
+
+
+def maybe_stale(model_label, cache=None):
+    """Whether this request read ``model_label`` from a replica since a write."""
+    if replicas.read_alias() is None:
+        return False
+    if cache is None:
+        cache = get_cache()
+    written_at = cache.get(_written_key(model_label))
+    return (
+        written_at is not None
+        and time.time() - written_at < settings.DATABASE_REPLICA_MAX_LAG
+    )
+
+
+def _written_key(model_label):
+    return f"catalog:{model_label}:written"
+
+
+def _generation_key(model_label):
+    return f"catalog:{model_label}:generation"
+
+
+def _generation(model_label):
+    cache = get_cache()
+    key = _generation_key(model_label)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def list_key(model_label, url):
+    digest = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+    return f"catalog:{model_label}:list:{_generation(model_label)}:{digest}"
+
+
+def detail_key(model_label, pk):
+    return f"catalog:{model_label}:detail:{pk}"
+
+
+def validators_key(key):
+    """Key of the conditional GET validators stored next to ``key``."""
+    return f"{key}:validators"
+
+
+def invalidate_objects(model_label, pks):
+    """Drop the cached detail entries of the given objects."""
+    keys = []
+    surrogate_keys = []
+    for pk in pks:
+        keys += [
+            detail_key(model_label, pk),
+            validators_key(detail_key(model_label, pk)),
+        ]
+        surrogate_keys.append(edge.object_key(model_label, pk))
+    if keys:
+        _delete_objects(model_label, keys)
+        _again_on_commit(_delete_objects, model_label, keys)
+        edge.purge(surrogate_keys)
+
+
+def _delete_objects(model_label, keys):
+    get_cache().delete_many(keys)
+    get_cache().set(_written_key(model_label), time.time(), timeout=None)
+
+
+def invalidate_lists(*model_labels):
+    """Orphan every cached list page of the given models."""
+    _orphan_lists(model_labels)
+    _again_on_commit(_orphan_lists, model_labels)
+    edge.purge(edge.list_key(label) for label in model_labels)
+
+
+def _orphan_lists(model_labels):
+    now = time.time()
+    get_cache().set_many(
+        {
+            **{_generation_key(label): uuid.uuid4().hex for label in model_labels},
+            **{_written_key(label): now for label in model_labels},
+        },
+        timeout=None,
+    )
+
+
+def _again_on_commit(invalidate, *args):
+    """
+    Invalidate again once the current transaction commits: another request
+    may have cached the old value between the write and its commit, and the
+    proxy, purged on commit, would cache it again from there.
+    """
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(invalidate, *args))
+
+
+def stats():
+    """
+    Lookups and evictions of this process since it started, with the size of
+    the cache, which the processes may share.
+    """
+    with _stats_lock:
+        data = {"pid": os.getpid(), **_stats}
+    lookups = data["hits"] + data["misses"]
+    data["hit_ratio"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+    cache = get_cache()
+    data["backend"] = settings.CACHES[CATALOG_CACHE_ALIAS]["BACKEND"]
+    data["timeout"] = cache.default_timeout
+    data["max_entries"] = cache._max_entries
+    if isinstance(cache, LocMemCache):
+        data["entries"] = len(cache._cache)
+    elif isinstance(cache, FileBasedCache):
+        data["entries"] = len(cache._list_cache_files())
+    return data
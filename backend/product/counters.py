@@ -0,0 +1,303 @@
+"""
+Sharded stock counters.
+
+Every write to a product's stock locks its single ``Stock`` row, so during a
+flash sale the writes of a hot product queue up behind each other. Setting
+``Stock.shard_count`` spreads the quantity over that many ``StockShard`` rows:
+a write takes from or gives to one shard picked at random, so concurrent
+writers mostly lock different rows, and the quantity available is the sum of
+the shards.
+
+``Stock.quantity``, which the stock API and the product read model show, is
+then the sum as of the last ``flush``. Flushing coalesces all the shard writes
+since the previous one into a single write of the stock row and its summary,
+and evens the shards out again, see the ``flush_stock_shards`` command.
+
+Locks are taken stock rows first, then shards in index order. The writers of
+a stock row lock it FOR UPDATE; the takes and gives, which only write its
+shards, lock it FOR SHARE, so they run concurrently with each other but not
+with a writer summing or rewriting the shards.
+"""
+
+import random
+from collections import defaultdict
+from itertools import batched
+
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from product import cache as catalog_cache
+from product import outbox, read_model
+
+CHUNK_SIZE = 500
+
+
+def split(quantity, shard_count):
+    """``quantity`` split as evenly as possible over ``shard_count`` shards."""
+    share, rest = divmod(quantity, shard_count)
+    return [share + (index < rest) for index in range(shard_count)]
+
+
+def spread(stock_id, shard_count, quantity):
+    """
+    Rewrite the shards of a stock to split ``quantity`` evenly over
+    ``shard_count`` of them, none for 0. The stock row must not be written
+    concurrently, the shards are locked here.
+    """
+    from product.models import StockShard
+
+    with transaction.atomic():
+        _lock_shards([stock_id])
+        StockShard.objects.filter(stock_id=stock_id, index__gte=shard_count).delete()
+        if not shard_count:
+            return
+        StockShard.objects.bulk_create(
+            [
+                StockShard(stock_id=stock_id, index=index, quantity=share)
+                for index, share in enumerate(split(quantity, shard_count))
+            ],
+            update_conflicts=True,
+            unique_fields=["stock", "index"],
+            update_fields=["quantity"],
+        )
+
+
+def respread(stock_id, previous, quantity, shard_count):
+    """
+    Spread a stock row saved with ``quantity`` and ``shard_count`` over its
+    shards. A sharded row holds the sum as of the last flush, ``previous``:
+    the change made to it applies to the live sum of the shards, which
+    already went without the stock taken since. Returns the new quantity,
+    written to the row and the read model when it differs.
+    """
+    from product.models import Stock
+
+    with transaction.atomic():
+        product_id = (
+            Stock.objects.select_for_update()
+            .filter(pk=stock_id)
+            .values_list("product_id", flat=True)
+            .get()
+        )
+        shares = _lock_shards([stock_id]).get(stock_id)
+        total = quantity
+        if shares is not None:
+            total = max(sum(shares) + quantity - previous, 0)
+        spread(stock_id, shard_count, total)
+        if total != quantity:
+            Stock.objects.filter(pk=stock_id).update(quantity=total)
+            read_model.refresh_products([product_id])
+    return total
+
+
+def totals(stock_ids):
+    """Lock the shards of ``stock_ids`` and return their sums by stock id."""
+    sums = defaultdict(int)
+    for stock_id, shares in _lock_shards(stock_ids).items():
+        sums[stock_id] = sum(shares)
+    return sums
+
+
+def take(stock_id, shard_count, quantity):
+    """
+    Take ``quantity`` off a sharded stock, False when the shards don't hold
+    that much. Must run in a transaction.
+    """
+    from product.models import StockShard
+
+    # a shard holding enough that no other transaction has locked, picked at
+    # random: waiting on a shard and moving on to the next would keep its lock
+    # (PostgreSQL locks the rows an UPDATE waited on, even those it then
+    # leaves), and take the shards out of order
+    shard = (
+        StockShard.objects.select_for_update(skip_locked=True)
+        .filter(stock_id=stock_id, quantity__gte=quantity)
+        .order_by("?")
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if shard is not None:
+        StockShard.objects.filter(pk=shard).update(quantity=F("quantity") - quantity)
+        return True
+
+    # no shard holds enough on its own, take from several
+    shares = _lock_shards([stock_id]).get(stock_id, [])
+    if sum(shares) < quantity:
+        return False
+    remaining = quantity
+    for index in sorted(range(len(shares)), key=shares.__getitem__, reverse=True):
+        taken = min(shares[index], remaining)
+        StockShard.objects.filter(stock_id=stock_id, index=index).update(
+            quantity=F("quantity") - taken
+        )
+        remaining -= taken
+        if not remaining:
+            break
+    return True
+
+
+def take_stock(product_id, quantity, now):
+    """
+    Take ``quantity`` off the stock of a product, from its row or one of its
+    shards. Returns ``(taken, sharded)``, ``taken`` being False when there
+    isn't enough stock. Must run in a transaction.
+    """
+    from product.models import Stock
+
+    stocks = Stock.objects.filter(product_id=product_id)
+    # conditional on the row still holding the stock, not its shards
+    if stocks.filter(shard_count=0, quantity__gte=quantity).update(
+        quantity=F("quantity") - quantity, updated_at=now
+    ):
+        return True, False
+    stock_id, shard_count = _share_stock(product_id)
+    if not shard_count:
+        return False, False
+    return take(stock_id, shard_count, quantity), True
+
+
+def give_stock(product_id, quantity, now):
+    """Give ``quantity`` back to the stock of a product, returns whether it's sharded."""
+    from product.models import Stock
+
+    stocks = Stock.objects.filter(product_id=product_id)
+    if stocks.filter(shard_count=0).update(
+        quantity=F("quantity") + quantity, updated_at=now
+    ):
+        return False
+    stock_id, shard_count = _share_stock(product_id)
+    if shard_count:
+        put(stock_id, shard_count, quantity)
+    return bool(shard_count)
+
+
+def put(stock_id, shard_count, quantity):
+    """Give ``quantity`` back to a sharded stock."""
+    from product.models import StockShard
+
+    StockShard.objects.filter(
+        stock_id=stock_id, index=random.randrange(shard_count)
+    ).update(quantity=F("quantity") + quantity)
+
+
+def set_shard_count(product_ids, shard_count):
+    """
+    Shard the stock of ``product_ids`` over ``shard_count`` shards, or fold it
+    back into the stock rows with 0. Returns the quantities by product id.
+    """
+    from product.models import Stock
+
+    quantities = {}
+    stock_ids = []
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Stock.objects.select_for_update()
+            .filter(product_id__in=product_ids)
+            .order_by("product_id")
+            .values_list("id", "product_id", "quantity", "shard_count")
+        )
+        live = totals([row[0] for row in rows if row[3]])
+        for stock_id, product_id, quantity, sharded in rows:
+            quantity = live[stock_id] if sharded else quantity
+            Stock.objects.filter(pk=stock_id).update(
+                quantity=quantity, shard_count=shard_count, updated_at=now
+            )
+            spread(stock_id, shard_count, quantity)
+            quantities[product_id] = quantity
+            stock_ids.append(stock_id)
+        read_model.refresh_products(quantities)
+        outbox.record("stock", quantities)
+
+    _invalidate_catalog(stock_ids, quantities)
+    return quantities
+
+
+def flush(product_ids=None):
+    """
+    Fold the shards into ``Stock.quantity``, and the read model, and even
+    them out. Returns the product ids whose quantity changed.
+    """
+    from product.models import Stock
+
+    stocks = Stock.objects.filter(shard_count__gt=0)
+    if product_ids is not None:
+        stocks = stocks.filter(product_id__in=product_ids)
+    stocks = stocks.order_by("product_id").values_list("pk", flat=True)
+    changed = {}
+    for chunk in batched(list(stocks), CHUNK_SIZE):
+        now = timezone.now()
+        flushed = {}
+        with transaction.atomic():
+            rows = list(
+                Stock.objects.select_for_update()
+                .filter(pk__in=chunk, shard_count__gt=0)
+                .order_by("product_id")
+                .values_list("id", "product_id", "quantity", "shard_count")
+            )
+            shards = _lock_shards([row[0] for row in rows])
+            for stock_id, product_id, quantity, shard_count in rows:
+                shares = shards.get(stock_id, [])
+                total = sum(shares)
+                if total != quantity:
+                    Stock.objects.filter(pk=stock_id).update(
+                        quantity=total, updated_at=now
+                    )
+                    flushed[product_id] = stock_id
+                if (
+                    len(shares) != shard_count
+                    or min(shares) < total // shard_count // 2
+                ):
+                    spread(stock_id, shard_count, total)
+            read_model.refresh_products(flushed)
+            outbox.record("stock", flushed)
+        _invalidate_catalog(flushed.values(), flushed)
+        changed.update(flushed)
+    return sorted(changed)
+
+
+def _share_stock(product_id):
+    """
+    Lock the stock row of ``product_id`` FOR SHARE, before its shards, and
+    return its id and shard count. SQLite locks the whole database instead.
+    """
+    from product.models import Stock
+
+    alias = router.db_for_write(Stock)
+    stocks = (
+        Stock.objects.using(alias)
+        .filter(product_id=product_id)
+        .values_list("id", "shard_count")
+    )
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return stocks.first() or (0, 0)
+    sql, params = stocks.query.get_compiler(connection=connection).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} FOR SHARE", params)
+        return cursor.fetchone() or (0, 0)
+
+
+def _lock_shards(stock_ids):
+    """Lock the shards of ``stock_ids``, returns their quantities in index order."""
+    from product.models import StockShard
+
+    shards = defaultdict(list)
+    rows = (
+        StockShard.objects.select_for_update()
+        .filter(stock_id__in=stock_ids)
+        .order_by("stock_id", "index")
+        .values_list("stock_id", "quantity")
+    )
+    for stock_id, quantity in rows:
+        shards[stock_id].append(quantity)
+    return shards
+
+
+def _invalidate_catalog(stock_ids, product_ids):
+    if not product_ids:
+        return
+    catalog_cache.invalidate_objects("stock", list(stock_ids))
+    catalog_cache.invalidate_objects("product", list(product_ids))
+    catalog_cache.invalidate_lists("stock", "product")
@@ -0,0 +1,153 @@
+"""
+Surrogate keys and purges for the caching proxy in front of the API.
+
+Catalog reads are tagged with the key of what they show in a ``Surrogate-Key``
+header: ``product-42`` for a product, ``product-list`` for the product lists,
+searches and facets, likewise for categories and stock. Those every anonymous
+client may share are marked ``public`` with an ``s-maxage`` of
+``EDGE_CACHE_TTL``, so the proxy answers them without reaching Django.
+
+When a write commits, the keys the catalog cache invalidated are posted to
+the proxies of ``EDGE_CACHE_PURGE_URLS``, from a background thread which
+coalesces the purges queued meanwhile. nginx (nginx-edge-cache.js) caches a
+response under its URL and the generations of its keys, derived from the URL
+the same way, and a purge bumps those generations: exactly the responses
+tagged with a purged key are orphaned. A lost purge leaves them stale for at
+most the TTL.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import transaction
+
+from core import replicas
+from product import cache as catalog_cache
+
+logger = logging.getLogger(__name__)
+
+# keys per purge request, about 60 KB
+PURGE_BATCH = 5000
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_scheduled = False
+_pending_lock = threading.Lock()
+
+
+def object_key(model_label, pk):
+    return f"{model_label}-{pk}"
+
+
+def list_key(model_label):
+    return f"{model_label}-list"
+
+
+def is_shareable(request):
+    """Whether ``request`` gets the response every anonymous client gets."""
+    # pinned clients read their own writes from the primary, nginx passes
+    # them through as well
+    return (
+        "HTTP_AUTHORIZATION" not in request.META
+        and replicas.PIN_COOKIE not in request.COOKIES
+    )
+
+
+def tag_response(request, response, model_label, pk=None):
+    """
+    Tag the read of the ``pk`` object of ``model_label``, or of its lists
+    without ``pk``, and let the proxy share it when it may.
+    """
+    if response.status_code not in (200, 304) or not settings.EDGE_CACHE_TTL:
+        return response
+    if pk is None:
+        key = list_key(model_label)
+    else:
+        pk = str(pk)
+        # only canonical ids, the purges name no other
+        if not (pk.isdigit() and pk == str(int(pk))):
+            return response
+        key = object_key(model_label, pk)
+    response["Surrogate-Key"] = key
+    if is_shareable(request) and not catalog_cache.maybe_stale(model_label):
+        # browsers still revalidate every time, the proxy once stale
+        response["Cache-Control"] = (
+            f"public, max-age=0, s-maxage={settings.EDGE_CACHE_TTL}"
+        )
+    return response
+
+
+def purge(keys):
+    """Purge ``keys`` from the proxies once the current transaction commits."""
+    if not settings.EDGE_CACHE_PURGE_URLS:
+        return
+    keys = set(keys)
+    if keys:
+        transaction.on_commit(partial(schedule_purge, keys))
+
+
+def get_executor():
+    # Created lazily so that forked server workers each start their own pool.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EDGE_CACHE_PURGE_WORKERS,
+                thread_name_prefix="edge-purge",
+            )
+    return _executor
+
+
+def schedule_purge(keys):
+    """Post ``keys`` with the keys already waiting, in the background."""
+    global _scheduled
+    if settings.EDGE_CACHE_PURGE_WORKERS <= 0:
+        send_purge(keys)
+        return
+    with _pending_lock:
+        _pending.update(keys)
+        if _scheduled:
+            return
+        _scheduled = True
+    get_executor().submit(_drain)
+
+
+def _drain():
+    global _scheduled
+    with _pending_lock:
+        keys = set(_pending)
+        _pending.clear()
+        _scheduled = False
+    try:
+        send_purge(keys)
+    except Exception:
+        logger.exception("Purging %d surrogate key(s) failed", len(keys))
+
+
+def send_purge(keys):
+    """Post ``keys``, separated by spaces, to every proxy."""
+    keys = sorted(keys)
+    for url in settings.EDGE_CACHE_PURGE_URLS:
+        for start in range(0, len(keys), PURGE_BATCH):
+            request = Request(
+                url,
+                data=" ".join(keys[start : start + PURGE_BATCH]).encode(),
+                headers={"Content-Type": "text/plain"},
+                method="POST",
+            )
+            try:
+                with urlopen(request, timeout=settings.EDGE_CACHE_PURGE_TIMEOUT):
+                    pass
+            except OSError as exc:
+                logger.warning(
+                    "Purging %d surrogate key(s) from %s failed: %s",
+                    len(keys),
+                    url,
+                    exc,
+                )
+                break
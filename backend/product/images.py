@@ -0,0 +1,145 @@
+"""
+Product image variants.
+
+Every uploaded product image gets downscaled WebP variants, generated by a
+small background thread pool once the upload has been committed, so the
+upload request never pays for the resizing. The generated file names are
+stored on ``Product.image_variants`` together with the ``source`` image they
+were made from.
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from product import cache as catalog_cache
+from product import outbox, read_model
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes, the aspect ratio is kept.
+VARIANTS = {
+    "thumb": (150, 150),
+    "small": (320, 320),
+    "medium": (640, 640),
+}
+VARIANT_DIRECTORY = "products/variants"
+WEBP_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(image_name, variant):
+    # flat in VARIANT_DIRECTORY: the stem keeps the names readable, a digest of
+    # the whole source name, unique in the storage, keeps the variants of
+    # "shoe.png" and "shoe.jpg" from overwriting each other
+    stem = PurePosixPath(image_name).stem
+    digest = hashlib.sha1(image_name.encode(), usedforsecurity=False).hexdigest()
+    return f"{VARIANT_DIRECTORY}/{stem}-{digest[:12]}_{variant}.webp"
+
+
+def generate_variants(image_name, storage=default_storage):
+    """Write the WebP variants of ``image_name`` and return their names."""
+    # Pillow is only needed here, keep it out of the server's startup
+    from PIL import Image, ImageOps
+
+    with storage.open(image_name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    names = {}
+    for variant, size in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+        name = variant_name(image_name, variant)
+        if storage.exists(name):
+            storage.delete(name)
+        names[variant] = storage.save(name, ContentFile(buffer.getvalue()))
+    return names
+
+
+def process_product_image(product_id, force=False):
+    """
+    Generate the variants of a product's current image. Returns False when
+    there is nothing to do.
+    """
+    from product.models import Product
+
+    product = (
+        Product.objects.filter(pk=product_id).values("image", "image_variants").first()
+    )
+    if product is None:
+        return False
+    image_name, previous = product["image"], product["image_variants"] or {}
+    if not image_name:
+        variants = {}
+    elif previous.get("source") == image_name and not force:
+        return False
+    else:
+        variants = {"source": image_name, **generate_variants(image_name)}
+
+    # Only record the variants if the image didn't change in the meantime.
+    with transaction.atomic():
+        updated = Product.objects.filter(pk=product_id, image=image_name).update(
+            image_variants=variants, updated_at=timezone.now()
+        )
+        if updated:
+            outbox.record("product", [product_id])
+    for variant, name in previous.items():
+        if variant != "source" and name not in variants.values():
+            default_storage.delete(name)
+    read_model.refresh_products([product_id])
+    catalog_cache.invalidate_objects("product", [product_id])
+    catalog_cache.invalidate_lists("product")
+    return bool(updated)
+
+
+def _run(product_id):
+    close_old_connections()
+    try:
+        process_product_image(product_id)
+    except Exception:
+        logger.exception("Generating image variants of product %s failed", product_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    # Created lazily so that forked server workers each start their own pool.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                thread_name_prefix="image-variants",
+            )
+    return _executor
+
+
+def schedule_variants(product_id):
+    """Generate the variants in the background, or inline without workers."""
+    if settings.IMAGE_VARIANT_WORKERS <= 0:
+        process_product_image(product_id)
+    else:
+        get_executor().submit(_run, product_id)
+
+
+def needs_variants(product):
+    variants = product.image_variants or {}
+    if product.image:
+        return variants.get("source") != product.image.name
+    return bool(variants)
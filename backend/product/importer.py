@@ -0,0 +1,255 @@
+"""
+Streaming bulk import of products.
+
+Rows are read lazily from CSV or NDJSON and written in chunks: one upsert on
+the unique ``Product.name`` and one for the matching ``Stock`` rows per chunk,
+so memory stays bounded by the chunk size whatever the size of the feed.
+Model signals are bypassed, the catalog cache is invalidated per chunk instead.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import batched
+
+from django.db import transaction
+from django.db.models import Q
+
+from product import cache as catalog_cache
+from product import counters, outbox, read_model
+from product.models import Category, Product, Stock
+
+CHUNK_SIZE = 1000
+# Only the first errors are kept so that a broken feed can't exhaust memory.
+MAX_REPORTED_ERRORS = 1000
+NAME_MAX_LENGTH = Product._meta.get_field("name").max_length
+FORMATS = ("csv", "ndjson")
+
+
+class RowError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+def read_csv(stream):
+    """Yield ``(row_number, row)`` from a CSV text stream with a header line."""
+    yield from enumerate(csv.DictReader(stream), start=1)
+
+
+def read_ndjson(stream):
+    """Yield ``(row_number, row)`` from a newline delimited JSON text stream."""
+    for row_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = RowError({"row": f"Invalid JSON: {exc}"})
+        if not isinstance(row, (dict, RowError)):
+            row = RowError({"row": "Expected a JSON object."})
+        yield row_number, row
+
+
+def read_rows(stream, input_format):
+    if input_format == "csv":
+        return read_csv(stream)
+    if input_format == "ndjson":
+        return read_ndjson(stream)
+    raise ValueError(f"Unsupported format {input_format!r}, expected one of {FORMATS}")
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def clean_row(row, categories):
+    """Validate a raw row into Product/Stock field values or raise RowError."""
+    errors = {}
+    cleaned = {}
+
+    name = row.get("name")
+    if _blank(name):
+        errors["name"] = "This field is required."
+    elif len(str(name).strip()) > NAME_MAX_LENGTH:
+        errors["name"] = (
+            f"Ensure this field has no more than {NAME_MAX_LENGTH} characters."
+        )
+    else:
+        cleaned["name"] = str(name).strip()
+
+    price = row.get("price")
+    try:
+        cleaned["price"] = float(price)
+    except (TypeError, ValueError):
+        errors["price"] = "A valid number is required."
+
+    category = row.get("category")
+    category_id = (
+        categories.get(str(category).strip()) if not _blank(category) else None
+    )
+    if category_id is None:
+        errors["category"] = f"Unknown category {category!r}."
+    else:
+        cleaned["category_id"] = category_id
+
+    description = row.get("description")
+    cleaned["description"] = None if _blank(description) else str(description)
+
+    quantity = row.get("quantity")
+    if not _blank(quantity):
+        try:
+            cleaned["quantity"] = int(quantity)
+            if cleaned["quantity"] < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors["quantity"] = "A valid positive integer is required."
+
+    if errors:
+        raise RowError(errors)
+    return cleaned
+
+
+class CategoryResolver:
+    """Resolve category references (id or name) to ids, caching lookups."""
+
+    def __init__(self):
+        self.resolved = {}
+
+    def load(self, rows):
+        refs = {
+            str(row["category"]).strip()
+            for _, row in rows
+            if isinstance(row, dict) and not _blank(row.get("category"))
+        } - self.resolved.keys()
+        if not refs:
+            return self.resolved
+        ids = [int(ref) for ref in refs if ref.isdigit()]
+        for pk, name in (
+            Category.objects.filter(Q(id__in=ids) | Q(name__in=refs))
+            .order_by("id")
+            .values_list("id", "name")
+        ):
+            if str(pk) in refs:
+                self.resolved[str(pk)] = pk
+            if name in refs:
+                self.resolved.setdefault(name, pk)
+        return self.resolved
+
+
+def import_products(rows, user=None, chunk_size=CHUNK_SIZE):
+    """Import ``(row_number, row)`` pairs and return an ImportReport."""
+    report = ImportReport()
+    resolver = CategoryResolver()
+    for chunk in batched(rows, chunk_size):
+        _import_chunk(chunk, resolver.load(chunk), user, report)
+    return report
+
+
+def _import_chunk(chunk, categories, user, report):
+    by_name = {}
+    for row_number, row in chunk:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            cleaned = clean_row(row, categories)
+        except RowError as exc:
+            report.add_error(row_number, exc.errors)
+            continue
+        # the last row wins when a chunk repeats a name
+        by_name[cleaned["name"]] = cleaned
+    if not by_name:
+        return
+
+    with transaction.atomic():
+        existing = set(
+            Product.objects.filter(name__in=by_name).values_list("name", flat=True)
+        )
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=name,
+                    price=cleaned["price"],
+                    description=cleaned["description"],
+                    category_id=cleaned["category_id"],
+                    created_by=user,
+                )
+                for name, cleaned in by_name.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=["price", "description", "category", "updated_at"],
+        )
+        # new products get a stock row, given quantities overwrite existing ones
+        Stock.objects.bulk_create(
+            [
+                Stock(product_id=product.pk, created_by=user)
+                for product in products
+                if "quantity" not in by_name[product.name]
+            ],
+            ignore_conflicts=True,
+        )
+        stocks = Stock.objects.bulk_create(
+            [
+                Stock(
+                    product_id=product.pk,
+                    quantity=by_name[product.name]["quantity"],
+                    created_by=user,
+                )
+                for product in products
+                if "quantity" in by_name[product.name]
+            ],
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=["quantity", "updated_at"],
+        )
+        # the shards hold the stock of a sharded row, set them to the quantity
+        quantities = {
+            product.pk: by_name[product.name]["quantity"]
+            for product in products
+            if "quantity" in by_name[product.name]
+        }
+        sharded = (
+            Stock.objects.filter(product_id__in=quantities, shard_count__gt=0)
+            .order_by("product_id")
+            .values_list("id", "product_id", "shard_count")
+        )
+        for stock_id, product_id, shard_count in sharded:
+            counters.spread(stock_id, shard_count, quantities[product_id])
+        read_model.refresh_products(product.pk for product in products)
+        outbox.record("product", [product.pk for product in products])
+        outbox.record(
+            "stock",
+            [
+                product.pk
+                for product in products
+                if product.name not in existing or "quantity" in by_name[product.name]
+            ],
+        )
+
+    report.created += len(by_name) - len(existing)
+    report.updated += len(existing)
+    catalog_cache.invalidate_objects("product", [product.pk for product in products])
+    catalog_cache.invalidate_objects("stock", [stock.pk for stock in stocks])
+    catalog_cache.invalidate_lists("product", "stock")
@@ -0,0 +1,119 @@
+"""
+Batched stock adjustments.
+
+A batch of ``{product_id, delta}`` / ``{product_id, set}`` entries is applied
+in one transaction: the affected stock rows are locked in product id order (so
+concurrent batches can't deadlock), every resulting quantity is checked, and
+the changes are written with ``F()`` expressions in a single CASE-based UPDATE
+per chunk of rows. The shards of sharded stocks are locked and summed first,
+then rewritten to hold the new quantity, see product.counters.
+"""
+
+from itertools import batched
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from product import cache as catalog_cache
+from product import counters, outbox, read_model
+from product.models import Stock
+
+CHUNK_SIZE = 500
+
+
+class StockAdjustmentError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def fold_adjustments(entries):
+    """
+    Fold entries into one ``("set", value)`` or ``("delta", value)`` operation
+    per product, applying them in the order given.
+    """
+    plan = {}
+    for entry in entries:
+        product_id = entry["product_id"]
+        previous = plan.get(product_id)
+        if entry.get("set") is not None:
+            plan[product_id] = ("set", entry["set"])
+        elif previous is None:
+            plan[product_id] = ("delta", entry["delta"])
+        else:
+            plan[product_id] = (previous[0], previous[1] + entry["delta"])
+    return plan
+
+
+def adjust_stock(entries):
+    """
+    Apply the adjustments atomically and return the new quantities keyed by
+    product id. Raises StockAdjustmentError, without writing anything, when a
+    product is unknown or a quantity would drop below zero.
+    """
+    plan = fold_adjustments(entries)
+    quantities = {}
+    stock_ids = []
+    sharded = {}
+    with transaction.atomic():
+        for product_ids in batched(sorted(plan), CHUNK_SIZE):
+            rows = list(
+                Stock.objects.select_for_update()
+                .filter(product_id__in=product_ids)
+                .order_by("product_id")
+                .values_list("id", "product_id", "quantity", "shard_count")
+            )
+            live = counters.totals([row[0] for row in rows if row[3]])
+            for stock_id, product_id, quantity, shard_count in rows:
+                if shard_count:
+                    quantity = live[stock_id]
+                    sharded[stock_id] = (product_id, shard_count)
+                operation, value = plan[product_id]
+                quantities[product_id] = (
+                    value if operation == "set" else quantity + value
+                )
+                stock_ids.append(stock_id)
+
+        errors = [
+            {"product_id": product_id, "detail": "Product does not exist."}
+            for product_id in sorted(plan.keys() - quantities.keys())
+        ] + [
+            {
+                "product_id": product_id,
+                "detail": f"Stock quantity can't go below zero (would be {quantity}).",
+            }
+            for product_id, quantity in sorted(quantities.items())
+            if quantity < 0
+        ]
+        if errors:
+            raise StockAdjustmentError(errors)
+
+        now = timezone.now()
+        sharded_products = {product_id for product_id, _ in sharded.values()}
+        for product_ids in batched(sorted(plan), CHUNK_SIZE):
+            whens = []
+            for product_id in product_ids:
+                operation, value = plan[product_id]
+                then = (
+                    # a sharded stock row holds a stale sum, set it outright
+                    Value(quantities.get(product_id, 0))
+                    if operation == "set" or product_id in sharded_products
+                    else F("quantity") + value
+                )
+                whens.append(When(product_id=product_id, then=then))
+            Stock.objects.filter(product_id__in=product_ids).update(
+                quantity=Case(
+                    *whens, default=F("quantity"), output_field=PositiveIntegerField()
+                ),
+                updated_at=now,
+            )
+        for stock_id, (product_id, shard_count) in sharded.items():
+            counters.spread(stock_id, shard_count, quantities[product_id])
+        read_model.refresh_products(quantities)
+        outbox.record("stock", sorted(quantities))
+
+    catalog_cache.invalidate_objects("stock", stock_ids)
+    catalog_cache.invalidate_objects("product", list(quantities))
+    catalog_cache.invalidate_lists("stock", "product")
+    return quantities
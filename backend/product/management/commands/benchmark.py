@@ -0,0 +1,503 @@
+"""
+Benchmarks of the catalog, one scenario per subcommand:
+
+- ``api`` drives the catalog and auth endpoints with concurrent clients, in
+  process or against a running server.
+- ``read-path`` compares the sync catalog reads on a WSGI server with their
+  async twins on an ASGI server.
+- ``server`` starts gunicorn with its defaults and with the
+  core.gunicorn_conf profiles, and compares them on one endpoint.
+- ``stock-writes`` takes and gives back stock of one hot product per shard
+  count.
+
+Each scenario prints a table of its results and writes them, with the options
+and the environment of the run, to a JSON report.
+"""
+
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmark import LoadResult, run_http, run_in_process, run_load
+from product import counters
+from product.models import Category, Product, Stock
+from user.models import EcommerceUser
+
+BENCHMARK_EMAIL = "benchmark@example.com"
+BENCHMARK_PASSWORD = "benchmark-password"
+BENCHMARK_PRODUCT = "Benchmark hot product"
+SAMPLE_SIZE = 2000
+
+API_SCENARIOS = (
+    "product-list",
+    "product-detail",
+    "category-list",
+    "category-detail",
+    "stock-list",
+    "stock-detail",
+    "login",
+    "token-refresh",
+)
+
+# sync viewset path -> async twin
+READ_PATH_ENDPOINTS = {
+    "product": ("/api/v1/products/product/", "/api/v1/products/async/product/"),
+    "category": ("/api/v1/products/category/", "/api/v1/products/async/category/"),
+    "stock": ("/api/v1/products/stock/", "/api/v1/products/async/stock/"),
+}
+
+# profile -> gunicorn arguments and environment, "defaults" being the server
+# entrypoint.sh used to start
+SERVER_PROFILES = {
+    "defaults": (["core.wsgi:application"], {}),
+    "sync": (["-c", "python:core.gunicorn_conf"], {"SERVER_WORKER_CLASS": "sync"}),
+    "gthread": (
+        ["-c", "python:core.gunicorn_conf"],
+        {"SERVER_WORKER_CLASS": "gthread"},
+    ),
+    "asgi": (["-c", "python:core.gunicorn_conf"], {"SERVER_WORKER_CLASS": "asgi"}),
+}
+
+# columns of every results table, after the labels of the scenario
+RESULT_COLUMNS = (
+    ("requests", "requests"),
+    ("errors", "errors"),
+    ("throughput", "req/s"),
+    ("p50_ms", "p50 ms"),
+    ("p95_ms", "p95 ms"),
+    ("p99_ms", "p99 ms"),
+)
+
+# options of every command, left out of the reports
+BASE_OPTIONS = {
+    "stdout",
+    "stderr",
+    "verbosity",
+    "settings",
+    "pythonpath",
+    "traceback",
+    "no_color",
+    "force_color",
+    "skip_checks",
+    "scenario",
+    "output",
+}
+
+
+def sample_ids(model, rng_seed, size=SAMPLE_SIZE):
+    """Up to ``size`` existing ids spread over the whole table."""
+    bounds = model.objects.order_by("id").values_list("id", flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return []
+    span = range(first, last + 1)
+    candidates = random.Random(rng_seed).sample(span, min(len(span), size * 2))
+    ids = list(
+        model.objects.filter(id__in=candidates).values_list("id", flat=True)[:size]
+    )
+    return ids or [first]
+
+
+def build_api_scenarios(page_size, seed):
+    product_ids = sample_ids(Product, seed)
+    stock_ids = sample_ids(Stock, seed)
+    category_ids = sample_ids(Category, seed)
+    if not product_ids:
+        raise CommandError("The catalog is empty, run `seed_catalog` first.")
+
+    user, created = EcommerceUser.objects.get_or_create(email=BENCHMARK_EMAIL)
+    if created or not user.check_password(BENCHMARK_PASSWORD):
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save()
+    refresh = str(RefreshToken.for_user(user))
+    listing = f"?page_size={page_size}" if page_size else ""
+
+    return {
+        "product-list": lambda rng: (
+            "GET",
+            f"/api/v1/products/product/{listing}",
+            None,
+        ),
+        "product-detail": lambda rng: (
+            "GET",
+            f"/api/v1/products/product/{rng.choice(product_ids)}/",
+            None,
+        ),
+        "category-list": lambda rng: (
+            "GET",
+            f"/api/v1/products/category/{listing}",
+            None,
+        ),
+        "category-detail": lambda rng: (
+            "GET",
+            f"/api/v1/products/category/{rng.choice(category_ids)}/",
+            None,
+        ),
+        "stock-list": lambda rng: ("GET", f"/api/v1/products/stock/{listing}", None),
+        "stock-detail": lambda rng: (
+            "GET",
+            f"/api/v1/products/stock/{rng.choice(stock_ids)}/",
+            None,
+        ),
+        "login": lambda rng: (
+            "POST",
+            "/api/v1/auth/login/",
+            {"email": BENCHMARK_EMAIL, "password": BENCHMARK_PASSWORD},
+        ),
+        "token-refresh": lambda rng: (
+            "POST",
+            "/api/v1/auth/token/refresh/",
+            {"refresh": refresh},
+        ),
+    }
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"The server exited with code {process.returncode}")
+        try:
+            with urlopen(url, timeout=5):
+                return
+        except HTTPError:
+            # answering, if with an error the load results will show
+            return
+        except (URLError, OSError):
+            time.sleep(0.2)
+    raise CommandError(f"The server didn't answer {url} within {timeout}s")
+
+
+def process_tree(pid):
+    """``pid`` and its descendants, read from /proc."""
+    pids = [pid]
+    for parent in pids:
+        for task in Path(f"/proc/{parent}/task").glob("*/children"):
+            pids.extend(int(child) for child in task.read_text().split())
+    return pids
+
+
+def memory_mb(pids):
+    """
+    Proportional set size of ``pids``: the memory shared copy-on-write counts
+    once over the processes sharing it, unlike their resident sizes. None where
+    /proc doesn't report it.
+    """
+    total = 0
+    for pid in pids:
+        try:
+            rollup = Path(f"/proc/{pid}/smaps_rollup").read_text()
+        except OSError:
+            return None
+        for line in rollup.splitlines():
+            if line.startswith("Pss:"):
+                total += int(line.split()[1])
+    return round(total / 1024, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the catalog: `api` endpoints with concurrent clients, sync "
+        "against async `read-path`, gunicorn `server` profiles, or sharded "
+        "`stock-writes`. Prints the results and writes them to a JSON report, "
+        "see `benchmark <scenario> --help`."
+    )
+
+    def add_arguments(self, parser):
+        scenarios = parser.add_subparsers(dest="scenario", required=True)
+
+        api = self.add_scenario(
+            scenarios,
+            "api",
+            "Drive the catalog and auth endpoints with concurrent clients. Seed "
+            "a catalog with `seed_catalog` first. Login and refresh are rate "
+            "limited, raise LOGIN_IP_THROTTLE_RATE / LOGIN_ACCOUNT_THROTTLE_RATE "
+            "to benchmark them.",
+            concurrency=16,
+            duration=None,
+        )
+        api.add_argument(
+            "--driver", choices=("in-process", "http"), default="in-process"
+        )
+        api.add_argument(
+            "--url", default="http://localhost:8000", help="Server of the http driver."
+        )
+        api.add_argument(
+            "--scenario", choices=API_SCENARIOS, action="append", dest="scenarios"
+        )
+        api.add_argument(
+            "--requests", type=int, default=1000, help="Requests per scenario."
+        )
+        api.add_argument(
+            "--warmup", type=int, default=50, help="Unmeasured requests first."
+        )
+        api.add_argument(
+            "--page-size",
+            type=int,
+            default=20,
+            help="Keyset page size of the list scenarios, 0 for the default one.",
+        )
+        api.add_argument("--seed", type=int, default=42)
+
+        read_path = self.add_scenario(
+            scenarios,
+            "read-path",
+            "Compare the sync catalog reads on a WSGI server with their async "
+            "twins on an ASGI server. Both servers must be running, e.g. "
+            "`gunicorn core.wsgi:application -b :8000` and `gunicorn "
+            "core.asgi:application -k uvicorn_worker.UvicornWorker -b :8001`.",
+            concurrency=100,
+            duration=10.0,
+        )
+        read_path.add_argument("--wsgi-url", default="http://127.0.0.1:8000")
+        read_path.add_argument("--asgi-url", default="http://127.0.0.1:8001")
+        read_path.add_argument(
+            "--endpoint", choices=READ_PATH_ENDPOINTS, action="append", dest="endpoints"
+        )
+        read_path.add_argument(
+            "--query", default="", help='Query string, e.g. "page_size=20".'
+        )
+
+        server = self.add_scenario(
+            scenarios,
+            "server",
+            "Start gunicorn with its defaults (one sync worker, no preload) and "
+            "with the core.gunicorn_conf profiles, then compare them on the same "
+            "endpoint, with their proportional memory. Each server runs with the "
+            "current environment, so the same database.",
+            concurrency=64,
+            duration=10.0,
+        )
+        server.add_argument(
+            "--profile", choices=SERVER_PROFILES, action="append", dest="profiles"
+        )
+        server.add_argument(
+            "--path",
+            default="/api/v1/products/product/",
+            help="Endpoint requested, with its query string.",
+        )
+        server.add_argument(
+            "--warmup", type=float, default=2.0, help="Unmeasured seconds first."
+        )
+
+        stock_writes = self.add_scenario(
+            scenarios,
+            "stock-writes",
+            "Take and give back a unit of one hot product per transaction from "
+            "concurrent clients, for each shard count. Only meaningful on "
+            "PostgreSQL: SQLite has a single writer.",
+            concurrency=16,
+            duration=5.0,
+        )
+        stock_writes.add_argument(
+            "--shards",
+            default="0,4,16",
+            help="Comma separated shard counts to compare, 0 for the plain row.",
+        )
+
+    def add_scenario(self, scenarios, name, description, concurrency, duration):
+        parser = scenarios.add_parser(name, help=description, description=description)
+        parser.add_argument("--concurrency", type=int, default=concurrency)
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=duration,
+            help="Seconds per run.",
+        )
+        parser.add_argument(
+            "--output",
+            help=f"Report file, benchmark-{name}-<timestamp>.json by default.",
+        )
+        return parser
+
+    def handle(self, *args, **options):
+        name = options["scenario"]
+        started_at = datetime.now(UTC)
+        run = getattr(self, f"run_{name.replace('-', '_')}")
+        labels, rows = run(options)
+
+        self.write_table(labels, rows)
+        report = {
+            "scenario": name,
+            "started_at": started_at.isoformat(),
+            "options": {
+                key: value for key, value in options.items() if key not in BASE_OPTIONS
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "products": Product.objects.count(),
+                "catalog_cache": settings.CATALOG_CACHE_ENABLED,
+            },
+            "results": rows,
+        }
+        output = options["output"] or (
+            f"benchmark-{name}-{started_at.strftime('%Y%m%dT%H%M%S')}.json"
+        )
+        with open(output, "w") as destination:
+            json.dump(report, destination, indent=2)
+        self.stderr.write(self.style.SUCCESS(f"Results written to {output}"))
+
+    def write_table(self, labels, rows):
+        widths = {
+            label: max(len(label), *(len(str(row[label])) for row in rows)) + 2
+            for label in labels
+        }
+        self.stdout.write(
+            "".join(f"{label:<{widths[label]}}" for label in labels)
+            + "".join(f"{header:>10}" for _, header in RESULT_COLUMNS)
+        )
+        for row in rows:
+            self.stdout.write(
+                "".join(f"{row[label]!s:<{widths[label]}}" for label in labels)
+                + "".join(f"{row[key]:>10}" for key, _ in RESULT_COLUMNS)
+            )
+
+    def report_progress(self, label, result):
+        self.stderr.write(f"{label}: {result.throughput:.1f} req/s")
+
+    def run_api(self, options):
+        scenarios = build_api_scenarios(options["page_size"], options["seed"])
+
+        def run(name, requests, duration=None):
+            kwargs = {
+                "concurrency": options["concurrency"],
+                "requests": requests,
+                "duration": duration,
+                "seed": options["seed"],
+            }
+            if options["driver"] == "http":
+                return run_http(name, options["url"], scenarios[name], **kwargs)
+            return run_in_process(name, scenarios[name], **kwargs)
+
+        rows = []
+        for name in options["scenarios"] or API_SCENARIOS:
+            if options["warmup"]:
+                run(name, options["warmup"])
+            result = run(name, options["requests"], options["duration"])
+            self.report_progress(name, result)
+            rows.append(result.as_dict())
+        return ("name", "queries_per_request"), rows
+
+    def run_read_path(self, options):
+        query = f"?{options['query']}" if options["query"] else ""
+        rows = []
+        for endpoint in options["endpoints"] or list(READ_PATH_ENDPOINTS):
+            sync_path, async_path = READ_PATH_ENDPOINTS[endpoint]
+            for server, url in (
+                ("wsgi", options["wsgi_url"] + sync_path + query),
+                ("asgi", options["asgi_url"] + async_path + query),
+            ):
+                result = run_load(url, options["concurrency"], options["duration"])
+                self.report_progress(f"{endpoint} {server}", result)
+                rows.append(
+                    {"endpoint": endpoint, "server": server, **result.as_dict()}
+                )
+        return ("endpoint", "server"), rows
+
+    def run_server(self, options):
+        rows = []
+        for name in options["profiles"] or ["defaults", "gthread"]:
+            arguments, environment = SERVER_PROFILES[name]
+            address = f"127.0.0.1:{free_port()}"
+            url = f"http://{address}{options['path']}"
+            process = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", *arguments, "--bind", address],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, **environment},
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_until_up(url, process)
+                if options["warmup"]:
+                    run_load(url, options["concurrency"], options["warmup"])
+                result = run_load(url, options["concurrency"], options["duration"])
+                pids = process_tree(process.pid)
+                memory = memory_mb(pids)
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=60)
+            self.report_progress(name, result)
+            rows.append(
+                {
+                    "profile": name,
+                    "workers": len(pids) - 1,
+                    "memory_mb": memory or "-",
+                    **result.as_dict(),
+                }
+            )
+        return ("profile", "workers", "memory_mb"), rows
+
+    def run_stock_writes(self, options):
+        category, _ = Category.objects.get_or_create(name="Benchmark")
+        product, _ = Product.objects.get_or_create(
+            name=BENCHMARK_PRODUCT, defaults={"price": 1, "category": category}
+        )
+        rows = []
+        for shard_count in map(int, options["shards"].split(",")):
+            counters.set_shard_count([product.pk], shard_count)
+            # enough stock for any client to always find some
+            counters.give_stock(product.pk, options["concurrency"] * 10, timezone.now())
+            result = self.take_and_give(
+                product.pk, options["concurrency"], options["duration"]
+            )
+            result.name = f"{shard_count} shards"
+            self.report_progress(result.name, result)
+            rows.append(result.as_dict())
+        counters.set_shard_count([product.pk], 0)
+        return ("name",), rows
+
+    def take_and_give(self, product_id, concurrency, duration):
+        result = LoadResult(name="", concurrency=concurrency)
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def client():
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    with transaction.atomic():
+                        taken, _ = counters.take_stock(product_id, 1, timezone.now())
+                    if taken:
+                        with transaction.atomic():
+                            counters.give_stock(product_id, 1, timezone.now())
+                    with lock:
+                        result.record(
+                            200 if taken else 409, time.perf_counter() - started
+                        )
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            for future in [executor.submit(client) for _ in range(concurrency)]:
+                future.result()
+        result.duration = time.perf_counter() - started
+        return result
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from product import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Drop the catalog change events superseded by a later event of the same "
+        "object, and the old deletion events."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep compacting every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, interval, **options):
+        while True:
+            dropped = outbox.compact()
+            if dropped or interval is None:
+                self.stdout.write(f"Dropped {dropped} outbox events")
+            if interval is None:
+                return
+            close_old_connections()
+            time.sleep(interval)
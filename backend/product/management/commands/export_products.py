@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from product.exporter import FORMATS, export_catalog
+
+
+class Command(BaseCommand):
+    help = "Stream the whole catalog as NDJSON or CSV with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=FORMATS, default="ndjson", dest="export_format"
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help='Destination file, "-" (default) for stdout.',
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Compress the output, implied by an output file ending in .gz.",
+        )
+
+    def handle(self, export_format, output, gzip, **options):
+        compress = gzip or output.endswith(".gz")
+        blocks = export_catalog(export_format, compress=compress)
+        if output == "-":
+            for block in blocks:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
+            return
+        with open(output, "wb") as destination:
+            for block in blocks:
+                destination.write(block)
+        self.stderr.write(self.style.SUCCESS(f"Catalog exported to {output}"))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from product import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold the shards of the sharded stocks into their stock rows and the "
+        "product read model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep flushing every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, interval, **options):
+        while True:
+            flushed = counters.flush()
+            if flushed or interval is None:
+                self.stdout.write(f"Flushed {len(flushed)} sharded stocks")
+            if interval is None:
+                return
+            close_old_connections()
+            time.sleep(interval)
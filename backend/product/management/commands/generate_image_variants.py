@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from PIL import Image
+
+from product.images import process_product_image
+from product.models import Product
+
+# what an unreadable image or a missing file raises, from Pillow
+# (UnidentifiedImageError is an OSError) or the storage
+IMAGE_ERRORS = (
+    OSError,
+    ValueError,
+    Image.DecompressionBombError,
+    SuspiciousFileOperation,
+)
+
+
+class Command(BaseCommand):
+    help = "Generate the thumbnail and WebP variants of existing product images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants that are already up to date.",
+        )
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, force, workers, **options):
+        product_ids = (
+            Product.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .order_by("id")
+            .values_list("id", flat=True)
+            .iterator()
+        )
+
+        def process(product_id):
+            try:
+                return process_product_image(product_id, force=force)
+            except IMAGE_ERRORS as exc:
+                self.stderr.write(f"product {product_id}: {exc}")
+                return None
+
+        def process_in_thread(product_id):
+            try:
+                return process(product_id)
+            finally:
+                close_old_connections()
+
+        if workers <= 1:
+            results = [process(product_id) for product_id in product_ids]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(process_in_thread, product_ids))
+
+        generated = results.count(True)
+        failed = results.count(None)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{generated} generated, {len(results) - generated - failed} "
+                f"up to date, {failed} failed"
+            )
+        )
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.importer import CHUNK_SIZE, FORMATS, import_products, read_rows
+from user.models import EcommerceUser
+
+
+class Command(BaseCommand):
+    help = "Stream products from a CSV or NDJSON feed, upserting on product name."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Feed file, or "-" to read from stdin.')
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            dest="input_format",
+            help="Feed format, guessed from the file extension by default.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--user", help="Email of the user recorded as creator.")
+
+    def handle(self, path, input_format, chunk_size, user, **options):
+        input_format = input_format or Path(path).suffix.lstrip(".").lower()
+        if input_format == "jsonl":
+            input_format = "ndjson"
+        if input_format not in FORMATS:
+            raise CommandError("Unknown feed format, pass --format csv|ndjson.")
+        if user:
+            try:
+                user = EcommerceUser.objects.get(email=user)
+            except EcommerceUser.DoesNotExist:
+                raise CommandError(f"User {user} does not exist.")
+
+        if path == "-":
+            report = import_products(
+                read_rows(sys.stdin, input_format), user=user, chunk_size=chunk_size
+            )
+        else:
+            with open(path, newline="", encoding="utf-8") as stream:
+                report = import_products(
+                    read_rows(stream, input_format), user=user, chunk_size=chunk_size
+                )
+
+        for error in report.errors:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report.created} created, {report.updated} updated, "
+                f"{report.failed} failed"
+            )
+        )
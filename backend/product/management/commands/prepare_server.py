@@ -0,0 +1,72 @@
+import hashlib
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# collectstatic's default ignore patterns
+IGNORE_PATTERNS = ["CVS", ".*", "*~"]
+FINGERPRINT_FILE = ".fingerprint"
+
+
+def static_fingerprint():
+    """A digest of the static files to collect: their paths, sizes and mtimes."""
+    entries = []
+    for finder in get_finders():
+        for path, storage in finder.list(IGNORE_PATTERNS):
+            prefix = getattr(storage, "prefix", None) or ""
+            stat = os.stat(storage.path(path))
+            entries.append(
+                f"{os.path.join(prefix, path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+            )
+    digest = hashlib.sha256(settings.STORAGES["staticfiles"]["BACKEND"].encode())
+    for entry in sorted(entries):
+        digest.update(entry.encode() + b"\n")
+    return digest.hexdigest()
+
+
+def pending_migrations(database=DEFAULT_DB_ALIAS):
+    executor = MigrationExecutor(connections[database])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the pending migrations and collect the static files, skipping "
+        "each when there is nothing to do. Replaces `collectstatic` and "
+        "`migrate` at container start with a single, usually no-op, startup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--skip-static", action="store_true", help="Don't collect static files."
+        )
+        parser.add_argument(
+            "--skip-migrate", action="store_true", help="Don't apply migrations."
+        )
+
+    def handle(self, *args, **options):
+        if not options["skip_static"]:
+            self.collect_static(options["verbosity"])
+        if not options["skip_migrate"]:
+            self.migrate(options["verbosity"])
+
+    def collect_static(self, verbosity):
+        stamp = Path(settings.STATIC_ROOT) / FINGERPRINT_FILE
+        fingerprint = static_fingerprint()
+        if stamp.exists() and stamp.read_text() == fingerprint:
+            self.stdout.write("Static files unchanged, not collected.")
+            return
+        call_command("collectstatic", interactive=False, verbosity=verbosity)
+        stamp.write_text(fingerprint)
+
+    def migrate(self, verbosity):
+        if not pending_migrations():
+            self.stdout.write("No migrations to apply.")
+            return
+        call_command("migrate", interactive=False, verbosity=verbosity)
@@ -0,0 +1,192 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PHASE_MARKER = "profile_startup:"
+
+# Run in a fresh interpreter: load the app the way the server does, then serve
+# one request straight through WSGI, without the test client's imports.
+PROBE = f"""
+import io, json, os, sys, time
+started = time.time()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.time()
+sys.stderr.write("{PHASE_MARKER}first_request\\n")
+path, _, query = sys.argv[1].partition("?")
+environ = {{
+    "REQUEST_METHOD": "GET",
+    "PATH_INFO": path,
+    "QUERY_STRING": query,
+    "SERVER_NAME": sys.argv[2],
+    "SERVER_PORT": "80",
+    "HTTP_HOST": sys.argv[2],
+    "wsgi.input": io.BytesIO(),
+    "wsgi.errors": sys.stderr,
+    "wsgi.url_scheme": "http",
+}}
+statuses = []
+response = application(environ, lambda status, headers, *args: statuses.append(status))
+b"".join(response)
+response.close()
+answered = time.time()
+print(json.dumps({{
+    "started": started,
+    "loaded": loaded,
+    "answered": answered,
+    "status": statuses[0],
+}}))
+"""
+
+
+def parse_importtime(lines):
+    """
+    The ``-X importtime`` lines as ``(phase, module, self_us, cumulative_us,
+    depth)``, ``phase`` being "app" until the first request starts.
+    """
+    imports = []
+    phase = "app"
+    for line in lines:
+        if line.startswith(PHASE_MARKER):
+            phase = line[len(PHASE_MARKER) :].strip()
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((phase, name.strip(), int(own), int(cumulative), depth))
+    return imports
+
+
+def summarize(imports, top):
+    phases = defaultdict(lambda: {"modules": 0, "ms": 0.0})
+    packages = defaultdict(float)
+    for phase, module, own, _, _ in imports:
+        phases[phase]["modules"] += 1
+        phases[phase]["ms"] += own / 1000
+        packages[module.partition(".")[0]] += own / 1000
+    slowest = sorted(imports, key=lambda entry: entry[3], reverse=True)[:top]
+    return {
+        "by_phase": {
+            phase: {"modules": data["modules"], "ms": round(data["ms"], 1)}
+            for phase, data in phases.items()
+        },
+        "packages": [
+            {"package": package, "ms": round(ms, 1)}
+            for package, ms in sorted(
+                packages.items(), key=lambda item: item[1], reverse=True
+            )[:top]
+        ],
+        "modules": [
+            {
+                "module": module,
+                "phase": phase,
+                "self_ms": round(own / 1000, 1),
+                "cumulative_ms": round(cumulative / 1000, 1),
+            }
+            for phase, module, own, cumulative, _ in slowest
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app in fresh interpreters and report the time to load it and "
+        "to answer a first request, with the modules imported on the way by "
+        "import time. Runs against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default="/api/v1/products/category/",
+            help="First request, with its query string.",
+        )
+        parser.add_argument(
+            "--runs", type=int, default=3, help="Cold starts, the median is kept."
+        )
+        parser.add_argument(
+            "--top", type=int, default=15, help="Slowest modules and packages shown."
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the report as JSON."
+        )
+
+    def handle(self, *args, **options):
+        hosts = [
+            host for host in settings.ALLOWED_HOSTS if not host.startswith((".", "*"))
+        ]
+        host = hosts[0] if hosts else "localhost"
+        runs = [
+            self.start(options["path"], host) for _ in range(max(options["runs"], 1))
+        ]
+
+        phases = {
+            name: round(statistics.median(run[0][name] for run in runs), 1)
+            for name in ("interpreter_ms", "app_ms", "first_request_ms", "total_ms")
+        }
+        # the imports of the first start, the later ones only differ by noise
+        report = {
+            "path": options["path"],
+            "status": runs[0][0]["status"],
+            "runs": len(runs),
+            **phases,
+            **summarize(runs[0][1], options["top"]),
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"GET {report['path']} -> {report['status']}, median of {report['runs']}"
+        )
+        for name, value in phases.items():
+            self.stdout.write(f"  {name:<20}{value:>10}")
+        for phase, data in report["by_phase"].items():
+            self.stdout.write(
+                f"  imports in {phase:<16}{data['modules']:>6} modules"
+                f"{data['ms']:>10} ms"
+            )
+        self.stdout.write(f"\n{'package':<32}{'self ms':>10}")
+        for row in report["packages"]:
+            self.stdout.write(f"{row['package']:<32}{row['ms']:>10}")
+        self.stdout.write(f"\n{'module':<48}{'phase':<15}{'self':>8}{'cumul.':>9}")
+        for row in report["modules"]:
+            self.stdout.write(
+                f"{row['module']:<48}{row['phase']:<15}"
+                f"{row['self_ms']:>8}{row['cumulative_ms']:>9}"
+            )
+
+    def start(self, path, host):
+        launched = time.time()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, path, host],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "core.settings"},
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if process.returncode:
+            raise CommandError(
+                f"The app failed to start:\n{process.stderr.splitlines()[-1:]}"
+            )
+        times = json.loads(process.stdout.splitlines()[-1])
+        return (
+            {
+                "interpreter_ms": (times["started"] - launched) * 1000,
+                "app_ms": (times["loaded"] - times["started"]) * 1000,
+                "first_request_ms": (times["answered"] - times["loaded"]) * 1000,
+                "total_ms": (times["answered"] - launched) * 1000,
+                "status": times["status"],
+            },
+            parse_importtime(process.stderr.splitlines()),
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product import cache as catalog_cache
+from product import read_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the product summaries and category rollups from the catalog, "
+        "then verify them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Only report the drift, fail when there is any.",
+        )
+
+    def handle(self, verify_only, **options):
+        if not verify_only:
+            count = read_model.rebuild(
+                progress=lambda total: self.stderr.write(
+                    f"{total} products", ending="\r"
+                )
+            )
+            self.stderr.write("")
+            # any cached product read may have come from a drifted summary
+            catalog_cache.get_cache().clear()
+            self.stdout.write(f"Rebuilt {count} product summaries")
+
+        report = read_model.verify()
+        drift = False
+        for kind, problems in report.items():
+            for problem, ids in problems.items():
+                if ids:
+                    drift = True
+                    shown = ", ".join(map(str, ids[:20]))
+                    more = f" and {len(ids) - 20} more" if len(ids) > 20 else ""
+                    self.stderr.write(f"{len(ids)} {problem} {kind}: {shown}{more}")
+        if drift:
+            raise CommandError("The read model is out of sync with the catalog.")
+        self.stdout.write(self.style.SUCCESS("The read model matches the catalog"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from product.seed import parse_count, seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Top the catalog up to N synthetic benchmark products (e.g. 10k, 100k, "
+        "1M), deterministically for a given seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("products", type=parse_count)
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, products, categories, seed, batch_size, **options):
+        created = seed_catalog(
+            products,
+            categories=categories,
+            seed=seed,
+            batch_size=batch_size,
+            progress=lambda total: self.stderr.write(f"{total} products", ending="\r"),
+        )
+        self.stderr.write("")
+        self.stderr.write(self.style.SUCCESS(f"Created {created} benchmark products"))
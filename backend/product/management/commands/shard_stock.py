@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Spread the stock of hot products over several rows so that concurrent "
+        "writes don't queue up on one row lock; --shards 0 folds it back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="+", type=int)
+        parser.add_argument("--shards", type=int, default=8)
+
+    def handle(self, product_ids, shards, **options):
+        if not 0 <= shards <= 256:
+            raise CommandError("--shards must be between 0 and 256.")
+        quantities = counters.set_shard_count(product_ids, shards)
+        missing = sorted(set(product_ids) - quantities.keys())
+        if missing:
+            self.stderr.write(f"No stock for products {', '.join(map(str, missing))}")
+        for product_id, quantity in sorted(quantities.items()):
+            self.stdout.write(
+                f"Product {product_id}: {quantity} in stock over {shards} shards"
+            )
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0003_alter_product_name"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["created_at", "id"], name="product_category_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["created_at", "id"], name="product_product_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                fields=["created_at", "id"], name="product_stock_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from product.search import drop_search_index, install_search_index
+
+
+def forwards(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0004_timestamped_created_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
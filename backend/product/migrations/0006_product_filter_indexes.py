@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0005_product_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "price"], name="product_category_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["price"], name="product_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["product"],
+                name="product_stock_in_stock_idx",
+            ),
+        ),
+    ]
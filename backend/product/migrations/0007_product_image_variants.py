@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0006_product_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
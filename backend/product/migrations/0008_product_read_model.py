@@ -0,0 +1,151 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:30
+
+from itertools import batched
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+
+
+def populate(apps, schema_editor):
+    """Summarize the existing catalog, like product.read_model.rebuild."""
+    Category = apps.get_model("product", "Category")
+    Product = apps.get_model("product", "Product")
+    ProductSummary = apps.get_model("product", "ProductSummary")
+    CategorySummary = apps.get_model("product", "CategorySummary")
+
+    rows = Product.objects.order_by("pk").values(
+        "id",
+        "name",
+        "price",
+        "image",
+        "image_variants",
+        "description",
+        "category_id",
+        "category__name",
+        "stock__quantity",
+        "created_at",
+        "updated_at",
+        "category__updated_at",
+        "stock__updated_at",
+    )
+    for chunk in batched(rows.iterator(chunk_size=1000), 1000):
+        ProductSummary.objects.bulk_create(
+            ProductSummary(
+                id=row["id"],
+                name=row["name"],
+                price=row["price"],
+                image=row["image"],
+                image_variants=row["image_variants"],
+                description=row["description"],
+                category_id=row["category_id"],
+                category_name=row["category__name"],
+                stock=row["stock__quantity"] or 0,
+                created_at=row["created_at"],
+                updated_at=max(
+                    t
+                    for t in (
+                        row["updated_at"],
+                        row["category__updated_at"],
+                        row["stock__updated_at"],
+                    )
+                    if t is not None
+                ),
+            )
+            for row in chunk
+        )
+
+    CategorySummary.objects.bulk_create(
+        CategorySummary(
+            category_id=category["id"],
+            name=category["name"],
+            product_count=category["product_count"],
+            in_stock_count=category["in_stock_count"],
+            stock_total=category["stock_total"] or 0,
+            min_price=category["min_price"],
+            max_price=category["max_price"],
+        )
+        for category in Category.objects.values("id", "name").annotate(
+            product_count=Count("product_summaries"),
+            in_stock_count=Count(
+                "product_summaries", filter=Q(product_summaries__stock__gt=0)
+            ),
+            stock_total=Sum("product_summaries__stock"),
+            min_price=Min("product_summaries__price"),
+            max_price=Max("product_summaries__price"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0007_product_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategorySummary",
+            fields=[
+                (
+                    "category",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="product.category",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("product_count", models.PositiveIntegerField(default=0)),
+                ("in_stock_count", models.PositiveIntegerField(default=0)),
+                ("stock_total", models.PositiveBigIntegerField(default=0)),
+                ("min_price", models.FloatField(blank=True, null=True)),
+                ("max_price", models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductSummary",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("name", models.CharField(max_length=200)),
+                ("price", models.FloatField()),
+                ("image", models.CharField(blank=True, max_length=100, null=True)),
+                ("image_variants", models.JSONField(blank=True, default=dict)),
+                ("description", models.TextField(blank=True, null=True)),
+                ("category_name", models.CharField(max_length=100)),
+                ("stock", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="product_summaries",
+                        to="product.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["created_at", "id"], name="summary_created_idx"
+                    ),
+                    models.Index(
+                        fields=["category", "created_at", "id"],
+                        name="summary_category_created_idx",
+                    ),
+                    models.Index(
+                        fields=["category", "price"], name="summary_category_price_idx"
+                    ),
+                    models.Index(fields=["price"], name="summary_price_idx"),
+                    models.Index(
+                        condition=models.Q(("stock__gt", 0)),
+                        fields=["created_at", "id"],
+                        name="summary_in_stock_created_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0008_product_read_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stock",
+            name="shard_count",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="StockShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveSmallIntegerField()),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shards",
+                        to="product.stock",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("stock", "index"), name="stock_shard_unique_index"
+                    )
+                ],
+            },
+        ),
+    ]
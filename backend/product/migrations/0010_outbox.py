@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product", "0009_stock_shards"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("topic", models.CharField(max_length=20)),
+                ("object_id", models.BigIntegerField()),
+                ("action", models.CharField(default="saved", max_length=10)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["topic", "object_id", "id"], name="outbox_object_idx"
+                    ),
+                    models.Index(fields=["created_at"], name="outbox_created_idx"),
+                ],
+            },
+        ),
+    ]
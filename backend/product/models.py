@@ -1,7 +1,9 @@
-from django.db import models
-from django.db.models.signals import post_save, pre_delete
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
+from product import cache as catalog_cache
+from product import counters, images, outbox, read_model
 from user.models import EcommerceUser
 
 
@@ -19,6 +21,18 @@ class TimeStampedModel(models.Model):
 
     class Meta:
         abstract = True
+        indexes = [
+            # Backs the keyset pagination used by the listing endpoints.
+            models.Index(
+                fields=["created_at", "id"], name="%(app_label)s_%(class)s_created_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # commit the row together with what its post_save receivers write,
+        # the outbox event included
+        with transaction.atomic(using=kwargs.get("using"), savepoint=False):
+            super().save(*args, **kwargs)
 
 
 class Category(TimeStampedModel):
@@ -32,11 +46,23 @@ class Product(TimeStampedModel):
     name = models.CharField(max_length=200, unique=True)
     price = models.FloatField()
     image = models.ImageField(upload_to="products/", null=True, blank=True)
+    # {"source": <image name>, <variant>: <file name>}, see product.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(blank=True, null=True)
     category = models.ForeignKey(
         Category, on_delete=models.CASCADE, related_name="products"
     )
 
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            *TimeStampedModel.Meta.indexes,
+            # Back the category and price range filters of the listing.
+            models.Index(
+                fields=["category", "price"], name="product_category_price_idx"
+            ),
+            models.Index(fields=["price"], name="product_price_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -47,19 +73,253 @@ class Stock(TimeStampedModel):
     product = models.OneToOneField(
         Product, on_delete=models.CASCADE, related_name="stock"
     )
+    # 0 keeps the quantity in this row, otherwise it is spread over that many
+    # StockShard rows and ``quantity`` is their sum as of the last flush, see
+    # product.counters
+    shard_count = models.PositiveSmallIntegerField(default=0)
+
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            *TimeStampedModel.Meta.indexes,
+            # Back the in-stock filter of the listing.
+            models.Index(
+                fields=["product"],
+                condition=models.Q(quantity__gt=0),
+                name="product_stock_in_stock_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity} in stock"
 
 
+class StockShard(models.Model):
+    """A slice of a hot product's stock, written instead of the Stock row."""
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name="shards")
+    index = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["stock", "index"], name="stock_shard_unique_index"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.stock_id}/{self.index} - {self.quantity} in stock"
+
+
+class OutboxEvent(models.Model):
+    """A committed catalog change, see product.outbox."""
+
+    topic = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, default=outbox.SAVED)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Back the compaction, which looks for later events of an object.
+            models.Index(fields=["topic", "object_id", "id"], name="outbox_object_idx"),
+            models.Index(fields=["created_at"], name="outbox_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.id} {self.topic} {self.object_id} {self.action}"
+
+
+class ProductSummary(models.Model):
+    """
+    Denormalized read model of a product: one row with everything the product
+    list and detail render, category name and stock quantity included.
+    Maintained by product.read_model, never written to directly.
+    """
+
+    # the product id, without a foreign key so the row outlives its product
+    # until product.read_model drops it
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=200)
+    price = models.FloatField()
+    image = models.CharField(max_length=100, null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    description = models.TextField(blank=True, null=True)
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="product_summaries"
+    )
+    category_name = models.CharField(max_length=100)
+    stock = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    # the newest updated_at of the product, its category and its stock
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Back the keyset pagination and the filters of the listing.
+            models.Index(fields=["created_at", "id"], name="summary_created_idx"),
+            models.Index(
+                fields=["category", "created_at", "id"],
+                name="summary_category_created_idx",
+            ),
+            models.Index(
+                fields=["category", "price"], name="summary_category_price_idx"
+            ),
+            models.Index(fields=["price"], name="summary_price_idx"),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(stock__gt=0),
+                name="summary_in_stock_created_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class CategorySummary(models.Model):
+    """Rollup of the product summaries of a category."""
+
+    category = models.OneToOneField(
+        Category, on_delete=models.CASCADE, primary_key=True, related_name="summary"
+    )
+    name = models.CharField(max_length=100)
+    product_count = models.PositiveIntegerField(default=0)
+    in_stock_count = models.PositiveIntegerField(default=0)
+    stock_total = models.PositiveBigIntegerField(default=0)
+    min_price = models.FloatField(null=True, blank=True)
+    max_price = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
 # Create Stock Automatically On Create New Products
 @receiver(post_save, sender=Product)
 def create_stock(sender, instance, created, **kwargs):
     if created:
         Stock.objects.create(product=instance)
+    else:
+        # stock rows render the product name
+        catalog_cache.invalidate_objects(
+            "stock", Stock.objects.filter(product=instance).values_list("pk", flat=True)
+        )
+    catalog_cache.invalidate_objects("product", [instance.pk])
+    catalog_cache.invalidate_lists("product", "stock")
+
+
+# Generate the image variants in the background once the upload is committed
+@receiver(post_save, sender=Product)
+def queue_image_variants(sender, instance, **kwargs):
+    if images.needs_variants(instance):
+        product_id = instance.pk
+        transaction.on_commit(lambda: images.schedule_variants(product_id))
 
 
 # delete stock associated with the product
 @receiver(pre_delete, sender=Product)
 def delete_stock(sender, instance, **kwargs):
     instance.stock.delete()
+    catalog_cache.invalidate_objects("product", [instance.pk])
+    catalog_cache.invalidate_lists("product")
+
+
+# Drop cached catalog reads whenever a category changes
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    catalog_cache.invalidate_objects("category", [instance.pk])
+    # product rows render the category name
+    catalog_cache.invalidate_objects(
+        "product", instance.products.values_list("pk", flat=True)
+    )
+    catalog_cache.invalidate_lists("category", "product")
+
+
+# Drop cached catalog reads whenever a stock changes
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_stock_cache(sender, instance, **kwargs):
+    catalog_cache.invalidate_objects("stock", [instance.pk])
+    # product rows render the stock quantity
+    catalog_cache.invalidate_objects("product", [instance.product_id])
+    catalog_cache.invalidate_lists("stock", "product")
+
+
+# Keep the product read model in sync, see product.read_model
+@receiver(post_save, sender=Product)
+def refresh_product_summary(sender, instance, created, **kwargs):
+    # a new product is summarized once create_stock has created its stock
+    if not created:
+        read_model.refresh_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def drop_product_summary(sender, instance, **kwargs):
+    read_model.refresh_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_summaries(sender, instance, **kwargs):
+    read_model.refresh_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def drop_category_summary(sender, instance, **kwargs):
+    read_model.refresh_rollups([instance.pk])
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def refresh_stock_summary(sender, instance, **kwargs):
+    read_model.refresh_products([instance.product_id])
+
+
+# A changed quantity or shard count is spread over the shards, see
+# product.counters; the quantity of a sharded row is only the sum as of the
+# last flush, so the other saves leave the shards alone
+@receiver(pre_save, sender=Stock)
+def read_stock_counts(sender, instance, **kwargs):
+    instance._saved_counts = None
+    if not instance._state.adding:
+        instance._saved_counts = (
+            Stock.objects.filter(pk=instance.pk)
+            .values_list("quantity", "shard_count")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Stock)
+def spread_stock_shards(sender, instance, created, **kwargs):
+    counts = (instance.quantity, instance.shard_count)
+    saved = getattr(instance, "_saved_counts", None)
+    if created or saved is None:
+        if instance.shard_count:
+            counters.spread(instance.pk, instance.shard_count, instance.quantity)
+    elif counts != saved:
+        instance.quantity = counters.respread(
+            instance.pk, saved[0], instance.quantity, instance.shard_count
+        )
+
+
+# Append the changes to the outbox, see product.outbox
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def record_saved(sender, instance, **kwargs):
+    outbox.record(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def record_deleted(sender, instance, **kwargs):
+    outbox.record(sender._meta.model_name, [instance.pk], outbox.DELETED)
+
+
+@receiver(post_save, sender=Stock)
+def record_stock_saved(sender, instance, **kwargs):
+    outbox.record("stock", [instance.product_id])
+
+
+@receiver(post_delete, sender=Stock)
+def record_stock_deleted(sender, instance, **kwargs):
+    outbox.record("stock", [instance.product_id], outbox.DELETED)
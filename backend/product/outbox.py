@@ -0,0 +1,95 @@
+"""
+Transactional outbox of the catalog changes.
+
+Every write of a product, category or stock appends ``OutboxEvent`` rows in
+the transaction of the write, so an event exists if and only if its change
+committed. The model signals append one event per saved or deleted object,
+the bulk writers one INSERT per chunk of objects. Stock events are keyed by
+product id, a product having a single stock.
+
+Consumers follow the log with ``read``, from a cursor: the id of the last
+event they processed. Ids are allocated on insert but only show up on commit,
+so a transaction still running may commit ids below those already read:
+``read`` leaves the events of the last ``OUTBOX_VISIBILITY_DELAY`` seconds to
+the next call, which must outlast the longest catalog write transaction.
+
+``compact`` keeps the log from growing without bound: an event superseded by
+a later one of the same object is dropped once older than
+``OUTBOX_COMPACT_AFTER`` seconds, and deletion events once older than
+``OUTBOX_TOMBSTONE_RETENTION``. Reading from the start still yields every
+live object, so a new consumer can bootstrap from the log.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+CHUNK_SIZE = 1000
+TOPICS = ("product", "category", "stock")
+SAVED = "saved"
+DELETED = "deleted"
+
+
+def record(topic, object_ids, action=SAVED):
+    """Append an event per object to the outbox, in the current transaction."""
+    from product.models import OutboxEvent
+
+    OutboxEvent.objects.bulk_create(
+        (
+            OutboxEvent(topic=topic, object_id=object_id, action=action)
+            for object_id in object_ids
+        ),
+        batch_size=CHUNK_SIZE,
+    )
+
+
+def read(after=0, limit=500, topics=None):
+    """
+    Up to ``limit`` events following the ``after`` cursor, in commit-safe id
+    order, optionally of ``topics`` only.
+    """
+    from product.models import OutboxEvent
+
+    settled = timezone.now() - timedelta(seconds=settings.OUTBOX_VISIBILITY_DELAY)
+    events = OutboxEvent.objects.filter(pk__gt=after, created_at__lte=settled)
+    if topics:
+        events = events.filter(topic__in=topics)
+    return list(
+        events.order_by("pk").values(
+            "id", "topic", "object_id", "action", "created_at"
+        )[:limit]
+    )
+
+
+def compact(now=None):
+    """Drop the superseded and expired events, returns how many were dropped."""
+    from product.models import OutboxEvent
+
+    now = now or timezone.now()
+    superseded = OutboxEvent.objects.filter(
+        created_at__lt=now - timedelta(seconds=settings.OUTBOX_COMPACT_AFTER)
+    ).filter(
+        Exists(
+            OutboxEvent.objects.filter(
+                topic=OuterRef("topic"),
+                object_id=OuterRef("object_id"),
+                pk__gt=OuterRef("pk"),
+            )
+        )
+    )
+    tombstones = OutboxEvent.objects.filter(
+        action=DELETED,
+        created_at__lt=now - timedelta(seconds=settings.OUTBOX_TOMBSTONE_RETENTION),
+    )
+    dropped = 0
+    for events in (superseded, tombstones):
+        # chunk by chunk, appends don't wait on a long compaction
+        while chunk := list(
+            events.order_by("pk").values_list("pk", flat=True)[:CHUNK_SIZE]
+        ):
+            with transaction.atomic():
+                dropped += OutboxEvent.objects.filter(pk__in=chunk).delete()[0]
+    return dropped
@@ -0,0 +1,376 @@
+"""
+Denormalized product read model.
+
+``ProductSummary`` keeps one row per product with everything the product list
+and detail render, so those reads hit a single table instead of joining
+``Category`` and ``Stock``. ``CategorySummary`` rolls the summaries up per
+category.
+
+Both are maintained incrementally by the write paths: the model signals for
+single writes, and the bulk writers (importer, stock adjustments, image
+variants, seeding) which call ``refresh_products`` with the ids they touched.
+The summaries of those products are rebuilt, and the changes between the old
+and new summaries are applied to the rollups as deltas. ``rebuild``
+recomputes everything from scratch and ``verify`` reports any drift, see the
+``rebuild_read_model`` command.
+
+Rows are locked stock first, then product summaries, then rollups, each in id
+order: a summary is rebuilt with its stock row locked, and a rollup changed
+with its row locked, so concurrent writers apply their changes one after the
+other instead of overwriting each other's.
+"""
+
+from collections import defaultdict
+from itertools import batched
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Greatest
+
+CHUNK_SIZE = 1000
+SUMMARY_FIELDS = (
+    "name",
+    "price",
+    "image",
+    "image_variants",
+    "description",
+    "category_id",
+    "category_name",
+    "stock",
+    "created_at",
+    "updated_at",
+)
+ROLLUP_FIELDS = (
+    "name",
+    "product_count",
+    "in_stock_count",
+    "stock_total",
+    "min_price",
+    "max_price",
+)
+
+
+def build_summaries(products):
+    """Unsaved ``ProductSummary`` rows of the ``products`` queryset."""
+    from product.models import ProductSummary
+
+    rows = products.values(
+        "id",
+        "name",
+        "price",
+        "image",
+        "image_variants",
+        "description",
+        "category_id",
+        "category__name",
+        "stock__quantity",
+        "created_at",
+        "updated_at",
+        "category__updated_at",
+        "stock__updated_at",
+    )
+    for row in rows:
+        timestamps = (
+            row["updated_at"],
+            row["category__updated_at"],
+            row["stock__updated_at"],
+        )
+        yield ProductSummary(
+            id=row["id"],
+            name=row["name"],
+            price=row["price"],
+            image=row["image"],
+            image_variants=row["image_variants"],
+            description=row["description"],
+            category_id=row["category_id"],
+            category_name=row["category__name"],
+            stock=row["stock__quantity"] or 0,
+            created_at=row["created_at"],
+            updated_at=max(t for t in timestamps if t is not None),
+        )
+
+
+def build_rollups(category_ids):
+    """Unsaved ``CategorySummary`` rows of the existing categories among the ids."""
+    from product.models import Category, CategorySummary, ProductSummary
+
+    aggregates = {
+        row["category_id"]: row
+        for row in ProductSummary.objects.filter(category_id__in=category_ids)
+        .values("category_id")
+        .order_by()
+        .annotate(
+            product_count=Count("pk"),
+            in_stock_count=Count("pk", filter=Q(stock__gt=0)),
+            stock_total=Sum("stock"),
+            min_price=Min("price"),
+            max_price=Max("price"),
+        )
+    }
+    for pk, name in Category.objects.filter(pk__in=category_ids).values_list(
+        "pk", "name"
+    ):
+        row = aggregates.get(pk, {})
+        yield CategorySummary(
+            category_id=pk,
+            name=name,
+            product_count=row.get("product_count", 0),
+            in_stock_count=row.get("in_stock_count", 0),
+            stock_total=row.get("stock_total") or 0,
+            min_price=row.get("min_price"),
+            max_price=row.get("max_price"),
+        )
+
+
+def refresh_products(product_ids, rollups=True):
+    """
+    Bring the summaries of ``product_ids`` in line with their products, drop
+    those of deleted products and carry the changes into the rollups of the
+    categories they were or are in. Returns the ids of those categories, so
+    that bulk writers can pass ``rollups=False`` and recompute the rollups
+    once at the end.
+    """
+    from product.models import Product, ProductSummary, Stock
+
+    touched = set()
+    for chunk in batched(sorted(set(product_ids)), CHUNK_SIZE):
+        with transaction.atomic():
+            # a stock write racing this one waits for it, rather than seeing
+            # its summary overwritten with the quantity read here
+            list(
+                Stock.objects.select_for_update()
+                .filter(product_id__in=chunk)
+                .order_by("product_id")
+                .values_list("pk", flat=True)
+            )
+            previous = (
+                ProductSummary.objects.select_for_update()
+                .filter(pk__in=chunk)
+                .order_by("pk")
+                .values_list("pk", "category_id", "price", "stock")
+            )
+            previous = {pk: tuple(summary) for pk, *summary in previous}
+            summaries = list(build_summaries(Product.objects.filter(pk__in=chunk)))
+            ProductSummary.objects.filter(pk__in=chunk).exclude(
+                pk__in=[summary.pk for summary in summaries]
+            ).delete()
+            ProductSummary.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=SUMMARY_FIELDS,
+            )
+            current = {
+                summary.pk: (summary.category_id, summary.price, summary.stock)
+                for summary in summaries
+            }
+            if rollups:
+                _apply_summary_changes(previous, current)
+        touched |= {category_id for category_id, _, _ in previous.values()}
+        touched |= {category_id for category_id, _, _ in current.values()}
+    return touched
+
+
+def _apply_summary_changes(previous, current):
+    """
+    Carry the changes between the ``previous`` and ``current`` summaries,
+    ``(category_id, price, stock)`` by product id, into the rollups. The price
+    bounds of a category are only aggregated again when a product at one of
+    them leaves it or changes price.
+    """
+    from product.models import CategorySummary, ProductSummary
+
+    changes = defaultdict(
+        lambda: {"counts": defaultdict(int), "entering": [], "leaving": []}
+    )
+    for pk in previous.keys() | current.keys():
+        before, after = previous.get(pk), current.get(pk)
+        if before == after:
+            continue
+        priced = before is None or after is None or before[:2] != after[:2]
+        for summary, sign in ((before, -1), (after, 1)):
+            if summary is None:
+                continue
+            category_id, price, stock = summary
+            counts = changes[category_id]["counts"]
+            counts["product_count"] += sign
+            counts["in_stock_count"] += sign * (stock > 0)
+            counts["stock_total"] += sign * stock
+            if priced:
+                changes[category_id]["leaving" if sign < 0 else "entering"].append(
+                    price
+                )
+    if not changes:
+        return
+
+    rollups = {
+        rollup.pk: rollup
+        for rollup in CategorySummary.objects.select_for_update()
+        .filter(category_id__in=changes)
+        .order_by("pk")
+    }
+    # categories without a rollup yet, or deleted meanwhile
+    refresh_rollups(changes.keys() - rollups.keys())
+    for category_id in sorted(rollups):
+        rollup, change = rollups[category_id], changes[category_id]
+        bounds = (rollup.min_price, rollup.max_price)
+        if any(price in bounds for price in change["leaving"]):
+            bounds = ProductSummary.objects.filter(category_id=category_id).aggregate(
+                min_price=Min("price"), max_price=Max("price")
+            )
+        else:
+            prices = [price for price in bounds if price is not None]
+            prices += change["entering"]
+            bounds = {
+                "min_price": min(prices, default=None),
+                "max_price": max(prices, default=None),
+            }
+        CategorySummary.objects.filter(pk=category_id).update(
+            **{
+                field: F(field) + delta
+                for field, delta in change["counts"].items()
+                if delta
+            },
+            **bounds,
+        )
+
+
+def apply_stock_changes(changes, now):
+    """
+    Cheap path for stock-only writes: ``changes`` maps product ids to
+    ``(delta, quantity)``, the applied delta and the resulting quantity. The
+    caller must hold the stock rows (updated in the same transaction), so the
+    quantities are current. Rollups are adjusted by delta instead of being
+    recomputed, rows are updated in product then category id order.
+    """
+    from product.models import CategorySummary, ProductSummary
+
+    category_ids = dict(
+        ProductSummary.objects.filter(pk__in=changes).values_list("pk", "category_id")
+    )
+    rollups = {}
+    for product_id in sorted(changes):
+        delta, quantity = changes[product_id]
+        ProductSummary.objects.filter(pk=product_id).update(
+            stock=quantity, updated_at=now
+        )
+        if product_id not in category_ids:
+            continue
+        stock_total, in_stock = rollups.get(category_ids[product_id], (0, 0))
+        rollups[category_ids[product_id]] = (
+            stock_total + delta,
+            in_stock + (quantity > 0) - (quantity - delta > 0),
+        )
+    for category_id in sorted(rollups):
+        stock_total, in_stock = rollups[category_id]
+        CategorySummary.objects.filter(pk=category_id).update(
+            stock_total=F("stock_total") + stock_total,
+            in_stock_count=F("in_stock_count") + in_stock,
+        )
+
+
+def refresh_category(category):
+    """Carry a saved category's name into its summaries and rollup."""
+    from product.models import CategorySummary, ProductSummary
+
+    with transaction.atomic():
+        ProductSummary.objects.filter(category_id=category.pk).update(
+            category_name=category.name,
+            updated_at=Greatest(F("updated_at"), Value(category.updated_at)),
+        )
+        if not CategorySummary.objects.filter(pk=category.pk).update(
+            name=category.name
+        ):
+            # a new category
+            refresh_rollups([category.pk])
+
+
+def refresh_rollups(category_ids):
+    """Recompute the rollups of ``category_ids``, dropping deleted categories."""
+    from product.models import CategorySummary
+
+    category_ids = set(category_ids)
+    if not category_ids:
+        return
+    with transaction.atomic():
+        # writers of these categories wait until the recomputed rollups commit
+        list(
+            CategorySummary.objects.select_for_update()
+            .filter(category_id__in=category_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        rollups = list(build_rollups(category_ids))
+        CategorySummary.objects.filter(category_id__in=category_ids).exclude(
+            category_id__in=[rollup.category_id for rollup in rollups]
+        ).delete()
+        CategorySummary.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=["category"],
+            update_fields=ROLLUP_FIELDS,
+        )
+
+
+def rebuild(progress=None):
+    """Recompute the whole read model. Returns the number of summaries."""
+    from product.models import Category, CategorySummary, Product, ProductSummary
+
+    with transaction.atomic():
+        ProductSummary.objects.all().delete()
+        CategorySummary.objects.all().delete()
+        product_ids = Product.objects.order_by("pk").values_list("pk", flat=True)
+        count = 0
+        for chunk in batched(product_ids.iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+            ProductSummary.objects.bulk_create(
+                build_summaries(Product.objects.filter(pk__in=chunk))
+            )
+            count += len(chunk)
+            if progress:
+                progress(count)
+        CategorySummary.objects.bulk_create(
+            build_rollups(Category.objects.values_list("pk", flat=True))
+        )
+    return count
+
+
+def verify():
+    """
+    Compare the read model with the catalog. Returns the ids of the products
+    and categories whose summaries are ``missing``, ``stale`` or ``orphaned``.
+    """
+    from product.models import Category, CategorySummary, Product, ProductSummary
+
+    report = {}
+    report["products"] = _compare(
+        Product.objects.order_by("pk").values_list("pk", flat=True),
+        lambda chunk: build_summaries(Product.objects.filter(pk__in=chunk)),
+        ProductSummary.objects.all(),
+        SUMMARY_FIELDS,
+    )
+    report["categories"] = _compare(
+        Category.objects.order_by("pk").values_list("pk", flat=True),
+        build_rollups,
+        CategorySummary.objects.all(),
+        ROLLUP_FIELDS,
+    )
+    return report
+
+
+def _compare(source_ids, build, stored, fields):
+    missing, stale = [], []
+    for chunk in batched(source_ids.iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+        expected = {row.pk: _values(row, fields) for row in build(chunk)}
+        actual = {row.pk: _values(row, fields) for row in stored.filter(pk__in=chunk)}
+        missing += [pk for pk in expected if pk not in actual]
+        stale += [pk for pk in expected if pk in actual and expected[pk] != actual[pk]]
+    orphaned = list(
+        stored.exclude(pk__in=source_ids.model.objects.values("pk"))
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    return {"missing": missing, "stale": stale, "orphaned": orphaned}
+
+
+def _values(row, fields):
+    return tuple(getattr(row, field) for field in fields)
@@ -0,0 +1,149 @@
+"""
+Full-text product search over ``Product.name`` and ``Product.description``.
+
+PostgreSQL keeps a weighted ``tsvector`` in a generated column with a GIN
+index. SQLite (local development and tests) keeps an external-content FTS5
+table in sync with triggers. Both are maintained by the database itself, so
+bulk writes that bypass model signals stay searchable.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+PRODUCT_TABLE = "product_product"
+SQLITE_INDEX_TABLE = "product_product_search"
+
+POSTGRES_INDEX_SQL = [
+    f"""
+    ALTER TABLE {PRODUCT_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS product_product_search_idx
+    ON {PRODUCT_TABLE} USING GIN (search_vector)
+    """,
+]
+
+SQLITE_INDEX_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_INDEX_TABLE} USING fts5(
+        name, description, content='{PRODUCT_TABLE}', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_INDEX_TABLE}_ai
+    AFTER INSERT ON {PRODUCT_TABLE} BEGIN
+        INSERT INTO {SQLITE_INDEX_TABLE} (rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_INDEX_TABLE}_ad
+    AFTER DELETE ON {PRODUCT_TABLE} BEGIN
+        INSERT INTO {SQLITE_INDEX_TABLE} ({SQLITE_INDEX_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_INDEX_TABLE}_au
+    AFTER UPDATE ON {PRODUCT_TABLE} BEGIN
+        INSERT INTO {SQLITE_INDEX_TABLE} ({SQLITE_INDEX_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {SQLITE_INDEX_TABLE} (rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"INSERT INTO {SQLITE_INDEX_TABLE} ({SQLITE_INDEX_TABLE}) VALUES ('rebuild')",
+]
+
+
+def install_search_index(connection):
+    """Create the search index for the connection's database, if missing."""
+    if connection.vendor == "postgresql":
+        statements = POSTGRES_INDEX_SQL
+    elif connection.vendor == "sqlite":
+        statements = SQLITE_INDEX_SQL
+    else:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS product_product_search_idx")
+            cursor.execute(
+                f"ALTER TABLE {PRODUCT_TABLE} DROP COLUMN IF EXISTS search_vector"
+            )
+        elif connection.vendor == "sqlite":
+            cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_INDEX_TABLE}")
+
+
+def reinstall_sqlite_search_index(sender, using, **kwargs):
+    """
+    ``post_migrate`` receiver: SQLite rebuilds a table to alter it, which
+    drops its triggers, so put them back and resync the index.
+    """
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        install_search_index(connection)
+
+
+def _sqlite_match_query(query):
+    # Quote every term so user input can never be parsed as FTS5 syntax.
+    return " ".join(f'"{term}"' for term in re.findall(r"\w+", query))
+
+
+def search_products(queryset, query):
+    """
+    Filter ``queryset`` down to the products matching ``query`` and annotate
+    each with a ``rank`` where higher is more relevant.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('english', %s)"
+        return queryset.filter(
+            RawSQL(
+                f"{PRODUCT_TABLE}.search_vector @@ {tsquery}",
+                [query],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            rank=RawSQL(
+                f"ts_rank({PRODUCT_TABLE}.search_vector, {tsquery})",
+                [query],
+                output_field=FloatField(),
+            )
+        )
+    if vendor == "sqlite":
+        match_query = _sqlite_match_query(query)
+        if not match_query:
+            return queryset.none()
+        return queryset.filter(
+            RawSQL(
+                f"{PRODUCT_TABLE}.id IN (SELECT rowid FROM {SQLITE_INDEX_TABLE} "
+                f"WHERE {SQLITE_INDEX_TABLE} MATCH %s)",
+                [match_query],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            rank=RawSQL(
+                f"(SELECT -bm25({SQLITE_INDEX_TABLE}, 10.0, 1.0) "
+                f"FROM {SQLITE_INDEX_TABLE} WHERE {SQLITE_INDEX_TABLE} MATCH %s "
+                f"AND rowid = {PRODUCT_TABLE}.id)",
+                [match_query],
+                output_field=FloatField(),
+            )
+        )
+    return queryset.filter(
+        Q(name__icontains=query) | Q(description__icontains=query)
+    ).annotate(rank=Value(0.0, output_field=FloatField()))
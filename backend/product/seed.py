@@ -0,0 +1,117 @@
+"""
+Synthetic catalogs for benchmarks.
+
+Seeding is deterministic for a given seed and incremental: it tops the
+catalog up to the requested number of benchmark products, so a 1M catalog
+can be grown from a 100k one. Rows are bulk inserted in batches, model
+signals are bypassed, the category rollups of the read model are refreshed
+and the catalog cache is invalidated once at the end.
+"""
+
+import random
+from itertools import batched
+
+from django.db import transaction
+
+from product import cache as catalog_cache
+from product import outbox, read_model
+from product.models import Category, Product, Stock
+
+NAME_PREFIX = "Benchmark product"
+CATEGORY_PREFIX = "Benchmark category"
+WORDS = [
+    "wireless",
+    "compact",
+    "classic",
+    "premium",
+    "organic",
+    "steel",
+    "cotton",
+    "leather",
+    "smart",
+    "portable",
+    "ergonomic",
+    "waterproof",
+    "vintage",
+    "modern",
+    "solar",
+    "ceramic",
+    "bamboo",
+]
+
+
+def parse_count(value):
+    """``"10k"`` -> 10000, ``"1M"`` -> 1000000."""
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    value = str(value).strip().lower()
+    if value and value[-1] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
+
+
+def seed_catalog(products, categories=50, seed=42, batch_size=5000, progress=None):
+    """
+    Make sure ``products`` benchmark products spread over ``categories``
+    benchmark categories exist, each with a stock row. Returns the number of
+    products created.
+    """
+    rng = random.Random(seed)
+    category_ids = list(
+        Category.objects.filter(name__startswith=CATEGORY_PREFIX)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    if len(category_ids) < categories:
+        with transaction.atomic():
+            created = Category.objects.bulk_create(
+                Category(name=f"{CATEGORY_PREFIX} {index}")
+                for index in range(len(category_ids), categories)
+            )
+            outbox.record("category", [category.pk for category in created])
+        category_ids += [category.pk for category in created]
+
+    existing = Product.objects.filter(name__startswith=NAME_PREFIX).count()
+    # skip the random draws of the existing products, so the data only
+    # depends on the seed
+    for _ in range(existing):
+        _draw(rng, category_ids)
+
+    created = 0
+    for indexes in batched(range(existing, products), batch_size):
+        with transaction.atomic():
+            draws = [_draw(rng, category_ids) for _ in indexes]
+            rows = Product.objects.bulk_create(
+                _product(index, *draw[:3]) for index, draw in zip(indexes, draws)
+            )
+            Stock.objects.bulk_create(
+                Stock(product_id=product.pk, quantity=draw[3])
+                for product, draw in zip(rows, draws)
+            )
+            read_model.refresh_products((product.pk for product in rows), rollups=False)
+            outbox.record("product", [product.pk for product in rows])
+            outbox.record("stock", [product.pk for product in rows])
+        created += len(rows)
+        if progress:
+            progress(existing + created)
+
+    read_model.refresh_rollups(category_ids)
+    catalog_cache.invalidate_lists("product", "category", "stock")
+    return created
+
+
+def _draw(rng, category_ids):
+    return (
+        rng.choice(category_ids),
+        round(rng.uniform(1, 2000), 2),
+        " ".join(rng.choices(WORDS, k=8)),
+        rng.randint(0, 500),
+    )
+
+
+def _product(index, category_id, price, description):
+    return Product(
+        name=f"{NAME_PREFIX} {index:07d}",
+        category_id=category_id,
+        price=price,
+        description=description,
+    )
@@ -1,16 +1,66 @@
+import asyncio
+import gzip
+import io
 import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from urllib.error import URLError
 
-from rest_framework.test import APITestCase, APIClient
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.reverse import reverse_lazy
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from product.models import Product, Category
+from core import benchmark, gunicorn_conf, pool, replicas
+from core.benchmark import LoadResult
+from core.renderers import FastJSONRenderer
+from core.testing import use_temporary_caches
+from product import cache as catalog_cache
+from product import counters, edge, exporter, outbox, read_model
+from product.api.v1.serializers import (
+    ProductSerializer,
+    StockSerializer,
+)
+from product.api.v1.throttles import CatalogExportThrottle
+from product.images import VARIANT_DIRECTORY, VARIANTS, process_product_image
+from product.importer import import_products
+from product.inventory import adjust_stock
+from product.management.commands import profile_startup
+from product.models import (
+    Category,
+    CategorySummary,
+    OutboxEvent,
+    Product,
+    ProductSummary,
+    Stock,
+    StockShard,
+)
+from product.seed import NAME_PREFIX, parse_count, seed_catalog
 from user.models import EcommerceUser
 
 
 class ProductViewSetTestCase(APITestCase):
     def setUp(self):
+        use_temporary_caches(self)
         self.client = APIClient()
         self.staff_user = EcommerceUser.objects.create_user(
             email="staff@mail.com", password="password", is_staff=True
@@ -42,7 +92,39 @@ class ProductViewSetTestCase(APITestCase):
             Product.objects.create(**data)
         response = self.client.get(reverse_lazy("product-list"))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.json()), Product.objects.count())
+        self.assertEqual(len(response.json()["results"]), Product.objects.count())
+
+    def test_product_list_query_count_is_constant(self):
+        data = self.product_data.copy()
+        for i in range(10):
+            data["name"] = f"Product {i}"
+            Product.objects.create(**data)
+        # one query for the conditional GET validators, one for the rows
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse_lazy("product-list"))
+        self.assertEqual(len(response.json()["results"]), Product.objects.count())
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse_lazy("product-list"), {"page_size": 4})
+        self.assertEqual(len(response.json()["results"]), 4)
+
+    def test_product_list_keyset_pagination(self):
+        data = self.product_data.copy()
+        for i in range(4):
+            data["name"] = f"Product {i}"
+            Product.objects.create(**data)
+        seen = []
+        response = self.client.get(reverse_lazy("product-list"), {"page_size": 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            page = response.json()
+            seen.extend(item["id"] for item in page["results"])
+            if not page["next"]:
+                break
+            response = self.client.get(page["next"])
+        expected = list(
+            Product.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
 
     def test_product_create_as_staff(self):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
@@ -77,7 +159,7 @@ class ProductViewSetTestCase(APITestCase):
 
     def test_product_create_as_regular_user(self):
         token = RefreshToken.for_user(self.regular_user)
-        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(token.access_token)}")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
         self.product_data["category"] = self.category.id
         response = self.client.post(reverse_lazy("product-list"), self.product_data)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -89,6 +171,7 @@ class ProductViewSetTestCase(APITestCase):
 
 class CategoryViewSetTestCase(APITestCase):
     def setUp(self):
+        use_temporary_caches(self)
         self.client = APIClient()
         self.staff_user = EcommerceUser.objects.create_user(
             email="staff@mail.com", password="password", is_staff=True
@@ -133,7 +216,7 @@ class CategoryViewSetTestCase(APITestCase):
             email="regular@mail.com", password="password"
         )
         token = RefreshToken.for_user(regular_user)
-        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {str(token.access_token)}")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
         response = self.client.delete(
             reverse_lazy("category-detail", kwargs={"pk": self.category.id})
         )
@@ -142,6 +225,7 @@ class CategoryViewSetTestCase(APITestCase):
 
 class StockViewSetTestCase(APITestCase):
     def setUp(self):
+        use_temporary_caches(self)
         self.client = APIClient()
         self.staff_user = EcommerceUser.objects.create_user(
             email="staff@mail.com", password="password", is_staff=True
@@ -166,6 +250,15 @@ class StockViewSetTestCase(APITestCase):
         response = self.client.get(reverse_lazy("stock-list"))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_stock_list_query_count_is_constant(self):
+        for i in range(5):
+            Product.objects.create(
+                name=f"Product {i}", price=10, category=self.product.category
+            )
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse_lazy("stock-list"))
+        self.assertEqual(len(response.json()["results"]), 6)
+
     def test_stock_create_is_disabled(self):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
         response = self.client.post(
@@ -192,3 +285,1640 @@ class StockViewSetTestCase(APITestCase):
             reverse_lazy("stock-detail", kwargs={"pk": self.stock.id})
         )
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class CatalogCacheTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Test Category")
+        self.product = Product.objects.create(
+            name="Test Product", price=100, category=self.category
+        )
+        self.detail_url = reverse_lazy("product-detail", kwargs={"pk": self.product.id})
+
+    def test_product_reads_are_served_from_cache(self):
+        self.client.get(reverse_lazy("product-list"))
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            self.client.get(reverse_lazy("product-list"))
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.json()["name"], "Test Product")
+
+    def test_product_save_invalidates_cache(self):
+        self.client.get(reverse_lazy("product-list"))
+        self.client.get(self.detail_url)
+        self.product.name = "Renamed Product"
+        self.product.save()
+        self.assertEqual(
+            self.client.get(self.detail_url).json()["name"], "Renamed Product"
+        )
+        self.assertEqual(
+            self.client.get(reverse_lazy("product-list")).json()["results"][0]["name"],
+            "Renamed Product",
+        )
+
+    def test_category_and_stock_saves_invalidate_products(self):
+        self.client.get(self.detail_url)
+        self.category.name = "Renamed Category"
+        self.category.save()
+        stock = self.product.stock
+        stock.quantity = 7
+        stock.save()
+        data = self.client.get(self.detail_url).json()
+        self.assertEqual(data["category_name"], "Renamed Category")
+        self.assertEqual(data["stock"], 7)
+
+    def test_file_cache_culls_the_least_recently_used(self):
+        cache = catalog_cache.FileBasedCatalogCache(
+            settings.CACHES["catalog"]["LOCATION"] + "-culled",
+            {"OPTIONS": {"MAX_ENTRIES": 3, "CULL_FREQUENCY": 3}},
+        )
+        self.addCleanup(cache.clear)
+        for i, key in enumerate(["read", "written", "gone"]):
+            cache.set(key, key)
+            os.utime(cache._key_to_file(key), (i, i))
+        cache.get("read")
+        getmtime = os.path.getmtime
+
+        def deleted_meanwhile(fname):
+            # expired, or invalidated by another process, since the listing
+            if fname == cache._key_to_file("gone"):
+                raise FileNotFoundError(fname)
+            return getmtime(fname)
+
+        cache._culled_at = None
+        with mock.patch("os.path.getmtime", deleted_meanwhile):
+            cache.set("new", "new")
+        self.assertEqual(
+            cache.get_many(["read", "written", "new"]), {"read": "read", "new": "new"}
+        )
+
+    def test_invalidations_reach_other_processes(self):
+        key = catalog_cache.detail_key("product", self.product.id)
+
+        def cached_elsewhere():
+            # another process, like a server worker or the stock flusher
+            probe = (
+                "import django; django.setup(); from product import cache; "
+                f"print(cache.get_cache().get({key!r}) is not None)"
+            )
+            return subprocess.run(
+                [sys.executable, "-c", probe],
+                cwd=settings.BASE_DIR,
+                env={
+                    **os.environ,
+                    "DJANGO_SETTINGS_MODULE": "core.settings",
+                    "CATALOG_CACHE_LOCATION": settings.CACHES["catalog"]["LOCATION"],
+                },
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+
+        self.client.get(self.detail_url)
+        self.assertEqual(cached_elsewhere(), "True")
+        self.product.name = "Renamed Product"
+        self.product.save()
+        self.assertEqual(cached_elsewhere(), "False")
+
+    def test_cache_stats_for_staff(self):
+        staff_user = EcommerceUser.objects.create_user(
+            email="staff@mail.com", password="password", is_staff=True
+        )
+        self.client.get(self.detail_url)
+        self.client.get(self.detail_url)
+        token = RefreshToken.for_user(staff_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+        response = self.client.get(reverse_lazy("catalog-cache-stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(response.json()["hits"], 1)
+        self.assertIn("evictions", response.json())
+
+
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Test Category")
+        self.product = Product.objects.create(
+            name="Test Product", price=100, category=self.category
+        )
+        self.detail_url = reverse_lazy("product-detail", kwargs={"pk": self.product.id})
+
+    def test_matching_etag_returns_not_modified(self):
+        for url in (reverse_lazy("product-list"), self.detail_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("Last-Modified", response)
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b"")
+
+    def test_not_modified_skips_serializer(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        with mock.patch.object(ProductSerializer, "to_representation") as method:
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        method.assert_not_called()
+
+    def test_related_change_updates_etag(self):
+        list_etag = self.client.get(reverse_lazy("product-list"))["ETag"]
+        detail_etag = self.client.get(self.detail_url)["ETag"]
+        stock = self.product.stock
+        stock.quantity = 3
+        stock.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["stock"], 3)
+        response = self.client.get(
+            reverse_lazy("product-list"), HTTP_IF_NONE_MATCH=list_etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_non_canonical_lookups(self):
+        for name in ("product-detail", "stock-detail", "category-detail"):
+            response = self.client.get(reverse_lazy(name, kwargs={"pk": "abc"}))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        url = reverse_lazy("product-detail", kwargs={"pk": f"00{self.product.id}"})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response)
+        self.product.name = "Renamed Product"
+        self.product.save()
+        self.assertEqual(self.client.get(url).json()["name"], "Renamed Product")
+
+    def test_validators_without_cache(self):
+        with self.settings(CATALOG_CACHE_ENABLED=False):
+            etag = self.client.get(self.detail_url)["ETag"]
+            with self.assertNumQueries(1):
+                response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class EdgeCacheTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Test Category")
+        self.product = Product.objects.create(
+            name="Test Product", price=100, category=self.category
+        )
+
+    def test_anonymous_reads_are_tagged_and_shared(self):
+        stock_id = self.product.stock.id
+        for name, kwargs, key in (
+            ("product-list", {}, "product-list"),
+            ("product-search", {}, "product-list"),
+            ("product-facets", {}, "product-list"),
+            ("product-detail", {"pk": self.product.id}, f"product-{self.product.id}"),
+            (
+                "category-detail",
+                {"pk": self.category.id},
+                f"category-{self.category.id}",
+            ),
+            ("stock-list", {}, "stock-list"),
+            ("stock-detail", {"pk": stock_id}, f"stock-{stock_id}"),
+            ("async-product-list", {}, "product-list"),
+            ("async-stock-detail", {"pk": stock_id}, f"stock-{stock_id}"),
+        ):
+            response = self.client.get(reverse_lazy(name, kwargs=kwargs))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Surrogate-Key"], key)
+            self.assertEqual(
+                response["Cache-Control"], "public, max-age=0, s-maxage=600"
+            )
+        url = reverse_lazy("product-detail", kwargs={"pk": self.product.id})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=self.client.get(url)["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn("s-maxage=600", response["Cache-Control"])
+
+    def test_private_reads_are_not_shared(self):
+        url = reverse_lazy("product-detail", kwargs={"pk": self.product.id})
+        user = EcommerceUser.objects.create_user(
+            email="user@mail.com", password="password"
+        )
+        token = RefreshToken.for_user(user)
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION=f"Bearer {token.access_token}"
+        )
+        self.assertEqual(response["Surrogate-Key"], f"product-{self.product.id}")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.client.cookies[replicas.PIN_COOKIE] = "1"
+        self.assertEqual(self.client.get(url)["Cache-Control"], "no-cache")
+        del self.client.cookies[replicas.PIN_COOKIE]
+        # only canonical ids are purged
+        response = self.client.get(
+            reverse_lazy("product-detail", kwargs={"pk": f"0{self.product.id}"})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Surrogate-Key", response)
+        with self.settings(EDGE_CACHE_TTL=0):
+            response = self.client.get(url)
+        self.assertNotIn("Surrogate-Key", response)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+    @override_settings(
+        EDGE_CACHE_PURGE_URLS=["http://edge.test/purge"], EDGE_CACHE_PURGE_WORKERS=0
+    )
+    def test_writes_purge_their_keys_once_committed(self):
+        with mock.patch("product.edge.urlopen") as urlopen:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.category.name = "Renamed Category"
+                self.category.save()
+            urlopen.assert_not_called()
+            for callback in callbacks:
+                callback()
+        keys = set()
+        for call in urlopen.call_args_list:
+            request = call.args[0]
+            self.assertEqual(request.full_url, "http://edge.test/purge")
+            self.assertEqual(request.get_method(), "POST")
+            keys.update(request.data.decode().split())
+        self.assertEqual(
+            keys,
+            {
+                f"category-{self.category.id}",
+                "category-list",
+                f"product-{self.product.id}",
+                "product-list",
+            },
+        )
+
+    def test_reads_cached_before_the_commit_are_dropped(self):
+        url = reverse_lazy("product-detail", kwargs={"pk": self.product.id})
+        stale = self.client.get(url).json()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Renamed Product"
+            self.product.save()
+            # another request caching the old row before the commit
+            catalog_cache.get_cache().set(
+                catalog_cache.detail_key("product", self.product.id),
+                {"testserver": stale},
+            )
+        self.assertEqual(self.client.get(url).json()["name"], "Renamed Product")
+
+    @override_settings(EDGE_CACHE_PURGE_URLS=["http://edge.test/purge"])
+    def test_queued_purges_are_coalesced(self):
+        executor = mock.Mock()
+        with mock.patch("product.edge.get_executor", return_value=executor):
+            edge.schedule_purge({"product-1"})
+            edge.schedule_purge({"product-2", "product-list"})
+        executor.submit.assert_called_once()
+        with mock.patch("product.edge.urlopen") as urlopen:
+            executor.submit.call_args.args[0]()
+        request = urlopen.call_args.args[0]
+        self.assertEqual(request.data, b"product-1 product-2 product-list")
+
+    @override_settings(
+        EDGE_CACHE_PURGE_URLS=["http://edge.test/purge"], EDGE_CACHE_PURGE_WORKERS=0
+    )
+    def test_unreachable_proxy_is_logged(self):
+        with (
+            mock.patch("product.edge.urlopen", side_effect=URLError("refused")),
+            self.assertLogs("product.edge", "WARNING") as logs,
+        ):
+            edge.schedule_purge({"product-1"})
+        self.assertIn("refused", logs.output[0])
+
+
+class ProductSearchTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        category = Category.objects.create(name="Test Category")
+        self.phone = Product.objects.create(
+            name="Android Phone", price=300, category=category, description="A phone"
+        )
+        self.case = Product.objects.create(
+            name="Leather Case",
+            price=20,
+            category=category,
+            description="Fits any android phone",
+        )
+        Product.objects.create(name="Desk Lamp", price=40, category=category)
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse_lazy("product-search"), {"q": query, **params}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_search_ranks_name_matches_first(self):
+        data = self.search("android phone")
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(
+            [item["id"] for item in data["results"]], [self.phone.id, self.case.id]
+        )
+
+    def test_search_index_follows_saves_and_deletes(self):
+        self.phone.name = "Smart Speaker"
+        self.phone.description = ""
+        self.phone.save()
+        self.assertEqual(self.search("speaker")["results"][0]["id"], self.phone.id)
+        self.case.delete()
+        self.assertEqual(self.search("android")["count"], 0)
+
+    def test_search_is_paginated(self):
+        data = self.search("phone", page_size=1)
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(len(data["results"]), 1)
+        self.assertIsNotNone(data["next"])
+
+    def test_search_handles_syntax_characters_and_empty_query(self):
+        self.assertEqual(self.search('phone" *(')["count"], 2)
+        self.assertEqual(self.search("")["count"], 0)
+
+
+class ProductFilterTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.phones = Category.objects.create(name="Phones")
+        self.books = Category.objects.create(name="Books")
+        self.cheap_phone = Product.objects.create(
+            name="Cheap Phone", price=80, category=self.phones
+        )
+        self.premium_phone = Product.objects.create(
+            name="Premium Phone", price=900, category=self.phones
+        )
+        self.novel = Product.objects.create(name="Novel", price=15, category=self.books)
+        Stock.objects.filter(product=self.premium_phone).update(quantity=4)
+        read_model.refresh_products([self.premium_phone.id])
+
+    def product_ids(self, **params):
+        response = self.client.get(reverse_lazy("product-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item["id"] for item in response.json()["results"]}
+
+    def test_filter_by_category_price_and_stock(self):
+        self.assertEqual(
+            self.product_ids(category=self.phones.id),
+            {self.cheap_phone.id, self.premium_phone.id},
+        )
+        self.assertEqual(
+            self.product_ids(
+                category=f"{self.phones.id},{self.books.id}", max_price=80
+            ),
+            {self.cheap_phone.id, self.novel.id},
+        )
+        self.assertEqual(self.product_ids(min_price=100), {self.premium_phone.id})
+        self.assertEqual(self.product_ids(in_stock="true"), {self.premium_phone.id})
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get(reverse_lazy("product-list"), {"min_price": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_facets_come_from_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse_lazy("product-facets"))
+        data = response.json()
+        self.assertEqual(data["total"], 3)
+        self.assertEqual(data["in_stock"], 1)
+        self.assertEqual(
+            [(c["name"], c["count"]) for c in data["categories"]],
+            [("Phones", 2), ("Books", 1)],
+        )
+        self.assertEqual(
+            [bucket["count"] for bucket in data["price"]], [1, 1, 0, 0, 1, 0]
+        )
+
+    def test_facets_apply_filters(self):
+        data = self.client.get(
+            reverse_lazy("product-facets"), {"category": self.phones.id}
+        ).json()
+        self.assertEqual(data["total"], 2)
+        self.assertEqual([c["id"] for c in data["categories"]], [self.phones.id])
+
+
+class ProductImportTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.staff_user = EcommerceUser.objects.create_user(
+            email="staff@mail.com", password="password", is_staff=True
+        )
+        self.category = Category.objects.create(name="Phones")
+        self.existing = Product.objects.create(
+            name="Existing Phone", price=100, category=self.category
+        )
+        token = RefreshToken.for_user(self.staff_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+
+    def test_bulk_import_csv_upserts_products_and_stock(self):
+        feed = (
+            "name,price,category,description,quantity\n"
+            f"New Phone,250,{self.category.id},Brand new,5\n"
+            "Existing Phone,120,Phones,,\n"
+            "Broken,abc,Unknown,,\n"
+        )
+        response = self.client.post(
+            reverse_lazy("product-bulk-import"),
+            {"file": SimpleUploadedFile("feed.csv", feed.encode())},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual((data["created"], data["updated"], data["failed"]), (1, 1, 1))
+        self.assertEqual(data["errors"][0]["row"], 3)
+        self.assertEqual(set(data["errors"][0]["errors"]), {"price", "category"})
+
+        new_phone = Product.objects.get(name="New Phone")
+        self.assertEqual(new_phone.stock.quantity, 5)
+        self.assertEqual(new_phone.created_by, self.staff_user)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.price, 120)
+        self.assertEqual(Stock.objects.filter(product=self.existing).count(), 1)
+
+    def test_bulk_import_requires_staff(self):
+        self.client.credentials()
+        response = self.client.post(
+            reverse_lazy("product-bulk-import"),
+            {"file": SimpleUploadedFile("feed.csv", b"name,price,category\n")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_import_command_reads_ndjson_in_chunks(self):
+        rows = [
+            {"name": f"Phone {i}", "price": i, "category": "Phones", "quantity": i}
+            for i in range(5)
+        ]
+        lines = [json.dumps(row) for row in rows] + ["not json"]
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as feed:
+            feed.write("\n".join(lines))
+            feed.flush()
+            out, err = io.StringIO(), io.StringIO()
+            call_command(
+                "import_products", feed.name, chunk_size=2, stdout=out, stderr=err
+            )
+        self.assertIn("5 created, 0 updated, 1 failed", out.getvalue())
+        self.assertIn("row 6", err.getvalue())
+        self.assertEqual(Stock.objects.get(product__name="Phone 4").quantity, 4)
+
+
+class StockBulkAdjustTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        staff_user = EcommerceUser.objects.create_user(
+            email="staff@mail.com", password="password", is_staff=True
+        )
+        category = Category.objects.create(name="Test Category")
+        self.products = [
+            Product.objects.create(name=f"Product {i}", price=10, category=category)
+            for i in range(3)
+        ]
+        Stock.objects.update(quantity=10)
+        token = RefreshToken.for_user(staff_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+
+    def quantities(self):
+        return [
+            Stock.objects.get(product=product).quantity for product in self.products
+        ]
+
+    def test_bulk_adjust_applies_deltas_and_sets(self):
+        first, second, third = self.products
+        entries = [
+            {"product_id": first.id, "delta": -4},
+            {"product_id": second.id, "set": 2},
+            {"product_id": second.id, "delta": 3},
+            {"product_id": third.id, "delta": 1},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse_lazy("stock-bulk-adjust"), entries, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stock_table = Stock._meta.db_table
+        updates = [q for q in queries if q["sql"].startswith(f'UPDATE "{stock_table}"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(response.json()["updated"], 3)
+        self.assertEqual(self.quantities(), [6, 5, 11])
+
+    def test_bulk_adjust_is_all_or_nothing(self):
+        entries = [
+            {"product_id": self.products[0].id, "delta": 5},
+            {"product_id": self.products[1].id, "delta": -11},
+            {"product_id": 999999, "delta": 1},
+        ]
+        response = self.client.post(
+            reverse_lazy("stock-bulk-adjust"), entries, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [error["product_id"] for error in response.json()["errors"]],
+            [999999, self.products[1].id],
+        )
+        self.assertEqual(self.quantities(), [10, 10, 10])
+
+    def test_bulk_adjust_validates_entries(self):
+        entries = [{"product_id": self.products[0].id, "delta": 1, "set": 4}]
+        response = self.client.post(
+            reverse_lazy("stock-bulk-adjust"), entries, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_adjust_requires_staff(self):
+        self.client.credentials()
+        response = self.client.post(
+            reverse_lazy("stock-bulk-adjust"),
+            [{"product_id": self.products[0].id, "delta": 1}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CatalogExportTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Phones")
+        for i in range(3):
+            Product.objects.create(
+                name=f"Phone {i}", price=10 + i, category=self.category
+            )
+        Stock.objects.filter(product__name="Phone 2").update(quantity=9)
+        staff_user = EcommerceUser.objects.create_user(
+            email="staff@example.com", password="password123", is_staff=True
+        )
+        self.client.force_authenticate(staff_user)
+
+    def test_export_ndjson_joins_category_and_stock(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse_lazy("product-export"))
+            content = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(
+            [row["name"] for row in rows], ["Phone 0", "Phone 1", "Phone 2"]
+        )
+        self.assertEqual(rows[2]["category_name"], "Phones")
+        self.assertEqual(rows[2]["stock"], 9)
+
+    def test_export_csv_gzip(self):
+        response = self.client.get(
+            reverse_lazy("product-export"),
+            {"output": "csv"},
+            HTTP_ACCEPT_ENCODING="gzip, deflate",
+            HTTP_ACCEPT="text/csv",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        lines = content.splitlines()
+        self.assertTrue(lines[0].startswith("id,name,price"))
+        self.assertEqual(len(lines), 4)
+
+    def test_export_honours_refused_gzip(self):
+        response = self.client.get(
+            reverse_lazy("product-export"), HTTP_ACCEPT_ENCODING="gzip;q=0, br"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 3)
+        self.assertTrue(exporter.accepts_gzip("br;q=1, *;q=0.5"))
+        self.assertFalse(exporter.accepts_gzip("gzip; q=0.0, *"))
+        self.assertFalse(exporter.accepts_gzip("identity"))
+
+    def test_export_requires_staff(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse_lazy("product-export"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        customer = EcommerceUser.objects.create_user(
+            email="customer@example.com", password="password123"
+        )
+        self.client.force_authenticate(customer)
+        response = self.client.get(reverse_lazy("product-export"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_is_throttled(self):
+        rates = {**settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]}
+        rates["catalog_export"] = "2/hour"
+        with mock.patch.object(CatalogExportThrottle, "THROTTLE_RATES", rates):
+            statuses = [
+                self.client.get(reverse_lazy("product-export")).status_code
+                for _ in range(3)
+            ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_export_command_writes_gzip_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/catalog.ndjson.gz"
+            call_command("export_products", output=path, stderr=io.StringIO())
+            with gzip.open(path, "rt") as exported:
+                self.assertEqual(len(exported.readlines()), 3)
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0)
+class ProductImageVariantsTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root.name)
+        self.settings_override.enable()
+        self.client = APIClient()
+        staff_user = EcommerceUser.objects.create_user(
+            email="staff@mail.com", password="password", is_staff=True
+        )
+        self.category = Category.objects.create(name="Phones")
+        token = RefreshToken.for_user(staff_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def image_file(self, name="phone.png", size=(800, 600)):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def test_upload_generates_variants_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse_lazy("product-list"),
+                {
+                    "name": "Phone",
+                    "price": 10,
+                    "category": self.category.id,
+                    "image": self.image_file(),
+                },
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        product = Product.objects.get(pk=response.json()["id"])
+        self.assertEqual(product.image_variants["source"], product.image.name)
+
+        data = self.client.get(
+            reverse_lazy("product-detail", kwargs={"pk": product.id})
+        ).json()
+        self.assertEqual(set(data["image_srcset"]), {"thumb", "small", "medium"})
+        self.assertTrue(data["image_srcset"]["thumb"].endswith("_thumb.webp"))
+        with default_storage.open(product.image_variants["thumb"]) as thumb:
+            image = Image.open(thumb)
+            self.assertEqual((image.format, image.width), ("WEBP", 150))
+
+    def test_variants_of_same_stem_images_are_kept_apart(self):
+        products = []
+        for name, color in (("shoe.png", "red"), ("shoe.jpg", "blue")):
+            product = Product.objects.create(
+                name=name, price=10, category=self.category
+            )
+            buffer = io.BytesIO()
+            Image.new("RGB", (300, 300), color).save(buffer, "PNG")
+            Product.objects.filter(pk=product.pk).update(
+                image=default_storage.save(
+                    f"products/{name}", SimpleUploadedFile(name, buffer.getvalue())
+                )
+            )
+            process_product_image(product.pk)
+            product.refresh_from_db()
+            products.append(product)
+        red, blue = products
+        self.assertNotEqual(red.image_variants["thumb"], blue.image_variants["thumb"])
+        self.assertEqual(
+            os.path.dirname(red.image_variants["thumb"]), VARIANT_DIRECTORY
+        )
+        self.assertTrue(
+            os.path.basename(red.image_variants["thumb"]).startswith("shoe-")
+        )
+        with default_storage.open(red.image_variants["thumb"]) as thumb:
+            red_value, _, blue_value = Image.open(thumb).convert("RGB").getpixel((0, 0))
+        self.assertGreater(red_value, blue_value)
+        # replacing one image leaves the other's variants alone
+        Product.objects.filter(pk=blue.pk).update(
+            image=default_storage.save("products/boot.png", self.image_file())
+        )
+        process_product_image(blue.pk)
+        for name in red.image_variants.values():
+            self.assertTrue(default_storage.exists(name))
+
+    def test_backfill_command(self):
+        product = Product.objects.create(name="Phone", price=10, category=self.category)
+        # bypass the signals like products created before the pipeline existed
+        Product.objects.filter(pk=product.pk).update(
+            image=default_storage.save("products/old.png", self.image_file())
+        )
+        broken = Product.objects.create(name="Broken", price=10, category=self.category)
+        Product.objects.filter(pk=broken.pk).update(
+            image=default_storage.save(
+                "products/broken.png", SimpleUploadedFile("broken.png", b"not a png")
+            )
+        )
+        out, err = io.StringIO(), io.StringIO()
+        call_command("generate_image_variants", workers=1, stdout=out, stderr=err)
+        self.assertIn("1 generated, 0 up to date, 1 failed", out.getvalue())
+        self.assertIn(f"product {broken.pk}:", err.getvalue())
+        product.refresh_from_db()
+        self.assertEqual(set(product.image_variants), {"source", *VARIANTS})
+
+
+class ReadModelTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.phones = Category.objects.create(name="Phones")
+        self.books = Category.objects.create(name="Books")
+        self.phone = Product.objects.create(
+            name="Phone", price=100, category=self.phones
+        )
+        self.novel = Product.objects.create(name="Novel", price=15, category=self.books)
+
+    def assertInSync(self):
+        report = read_model.verify()
+        for problems in report.values():
+            self.assertEqual(problems, {"missing": [], "stale": [], "orphaned": []})
+
+    def test_single_writes_keep_the_read_model_in_sync(self):
+        stock = self.phone.stock
+        stock.quantity = 5
+        stock.save()
+        summary = ProductSummary.objects.get(pk=self.phone.pk)
+        self.assertEqual((summary.category_name, summary.stock), ("Phones", 5))
+        self.assertEqual(summary.updated_at, Stock.objects.get(pk=stock.pk).updated_at)
+
+        self.phones.name = "Smartphones"
+        self.phones.save()
+        self.phone.category = self.books
+        self.phone.price = 120
+        self.phone.save()
+        rollup = CategorySummary.objects.get(pk=self.books.pk)
+        self.assertEqual(
+            (rollup.product_count, rollup.in_stock_count, rollup.stock_total),
+            (2, 1, 5),
+        )
+        self.assertEqual((rollup.min_price, rollup.max_price), (15, 120))
+        self.assertEqual(
+            CategorySummary.objects.get(pk=self.phones.pk).product_count, 0
+        )
+        self.assertInSync()
+
+        self.novel.delete()
+        self.assertFalse(ProductSummary.objects.filter(pk=self.novel.pk).exists())
+        self.books.delete()
+        self.assertFalse(ProductSummary.objects.exists())
+        self.assertInSync()
+
+    def test_bulk_writes_keep_the_read_model_in_sync(self):
+        adjust_stock([{"product_id": self.novel.pk, "set": 3}])
+        rows = [(1, {"name": "Phone", "price": "90", "category": "Books"})]
+        import_products(rows)
+        self.assertEqual(ProductSummary.objects.get(pk=self.novel.pk).stock, 3)
+        self.assertEqual(
+            ProductSummary.objects.get(pk=self.phone.pk).category_name, "Books"
+        )
+        self.assertInSync()
+
+    def test_rollups_are_updated_by_deltas(self):
+        cheap, dear = (
+            Product.objects.create(name=name, price=price, category=self.phones)
+            for name, price in (("Cheap Phone", 50), ("Dear Phone", 200))
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.phone.price = 150
+            self.phone.save()
+        # no product at a bound moved, so the category isn't aggregated
+        self.assertFalse([q for q in queries if "MIN(" in q["sql"].upper()])
+        rollup = CategorySummary.objects.get(pk=self.phones.pk)
+        self.assertEqual((rollup.min_price, rollup.max_price), (50, 200))
+
+        dear.price = 60
+        dear.save()
+        cheap.category = self.books
+        cheap.save()
+        rollup = CategorySummary.objects.get(pk=self.phones.pk)
+        self.assertEqual((rollup.product_count, rollup.min_price), (2, 60))
+        self.assertEqual(rollup.max_price, 150)
+        self.assertInSync()
+
+    def test_verify_and_rebuild(self):
+        Stock.objects.filter(product=self.phone).update(quantity=8)
+        ProductSummary.objects.filter(pk=self.novel.pk).delete()
+        report = read_model.verify()
+        self.assertEqual(report["products"]["stale"], [self.phone.pk])
+        self.assertEqual(report["products"]["missing"], [self.novel.pk])
+        self.assertEqual(report["categories"]["stale"], [self.books.pk])
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_read_model", verify_only=True, stderr=io.StringIO())
+        out = io.StringIO()
+        call_command("rebuild_read_model", stdout=out, stderr=io.StringIO())
+        self.assertIn("matches the catalog", out.getvalue())
+        self.assertInSync()
+
+    def test_product_reads_use_the_summaries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse_lazy("product-list"))
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertTrue(
+            all('product_product"' not in query["sql"] for query in queries)
+        )
+
+
+class ShardedStockTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        category = Category.objects.create(name="Consoles")
+        self.product = Product.objects.create(
+            name="Console", price=500, category=category
+        )
+        stock = self.product.stock
+        stock.quantity = 10
+        stock.save()
+        counters.set_shard_count([self.product.pk], 4)
+
+    def shards(self):
+        return list(
+            StockShard.objects.filter(stock__product=self.product)
+            .order_by("index")
+            .values_list("quantity", flat=True)
+        )
+
+    def take(self, quantity):
+        with transaction.atomic():
+            return counters.take_stock(self.product.pk, quantity, timezone.now())
+
+    def test_writes_land_on_the_shards_until_flushed(self):
+        self.assertEqual(self.shards(), [3, 3, 2, 2])
+        self.assertEqual(self.take(2), (True, True))
+        self.assertEqual(self.take(5), (True, True))  # from several shards
+        self.assertEqual(self.take(4), (False, True))
+        self.assertEqual(sum(self.shards()), 3)
+        self.assertEqual(Stock.objects.get(product=self.product).quantity, 10)
+
+        self.assertEqual(counters.flush(), [self.product.pk])
+        self.assertEqual(counters.flush(), [])
+        stock = Stock.objects.get(product=self.product)
+        self.assertEqual(stock.quantity, 3)
+        self.assertEqual(ProductSummary.objects.get(pk=self.product.pk).stock, 3)
+        self.assertEqual(
+            StockSerializer(stock).data,
+            {"id": stock.id, "quantity": 3, "location": None, "product": "Console"},
+        )
+
+    def test_adjustments_and_saves_respread_the_shards(self):
+        self.take(3)
+        quantities = adjust_stock([{"product_id": self.product.pk, "delta": 5}])
+        self.assertEqual(quantities, {self.product.pk: 12})
+        self.assertEqual(self.shards(), [3, 3, 3, 3])
+        self.assertEqual(Stock.objects.get(product=self.product).quantity, 12)
+
+        stock = Stock.objects.get(product=self.product)
+        stock.quantity = 7
+        stock.shard_count = 2
+        stock.save()
+        self.assertEqual(self.shards(), [4, 3])
+
+    def test_saves_keep_the_stock_taken_since_the_flush(self):
+        self.take(3)
+        stock = Stock.objects.get(product=self.product)
+        stock.location = "Warehouse B"
+        stock.save()
+        self.assertEqual(sum(self.shards()), 7)
+        # the change made to the flushed sum applies to the live one
+        stock.quantity = 15
+        stock.save()
+        self.assertEqual(sum(self.shards()), 12)
+        self.assertEqual(Stock.objects.get(product=self.product).quantity, 12)
+        self.assertEqual(ProductSummary.objects.get(pk=self.product.pk).stock, 12)
+
+    def test_imported_quantities_are_spread(self):
+        self.take(3)
+        rows = [
+            (
+                1,
+                {
+                    "name": "Console",
+                    "price": "500",
+                    "category": "Consoles",
+                    "quantity": "5",
+                },
+            )
+        ]
+        self.assertEqual(import_products(rows).errors, [])
+        self.assertEqual(self.shards(), [2, 1, 1, 1])
+        counters.flush()
+        self.assertEqual(Stock.objects.get(product=self.product).quantity, 5)
+
+    def test_unsharding_folds_the_shards_back(self):
+        self.take(4)
+        self.assertEqual(
+            counters.set_shard_count([self.product.pk], 0), {self.product.pk: 6}
+        )
+        self.assertEqual(self.shards(), [])
+        self.assertEqual(self.take(6), (True, False))
+        self.assertEqual(Stock.objects.get(product=self.product).quantity, 0)
+
+
+class StockLockOrderTestCase(TransactionTestCase):
+    """Takes and adjustments racing on several products, PostgreSQL only."""
+
+    def setUp(self):
+        use_temporary_caches(self)
+        if connection.vendor != "postgresql":
+            self.skipTest("row locks are only tested on PostgreSQL")
+
+    def test_an_order_and_an_adjustment_of_two_products_dont_deadlock(self):
+        category = Category.objects.create(name="Consoles")
+        sharded, unsharded = (
+            Product.objects.create(name=name, price=500, category=category)
+            for name in ("Console", "Controller")
+        )
+        adjust_stock(
+            [
+                {"product_id": sharded.pk, "set": 10},
+                {"product_id": unsharded.pk, "set": 10},
+            ]
+        )
+        counters.set_shard_count([sharded.pk], 4)
+        taken = threading.Event()
+        errors = []
+
+        def order():
+            try:
+                with transaction.atomic():
+                    counters.take_stock(sharded.pk, 1, timezone.now())
+                    taken.set()
+                    # the adjustment locks what it can meanwhile
+                    time.sleep(0.5)
+                    counters.take_stock(unsharded.pk, 1, timezone.now())
+            except DatabaseError as exc:
+                errors.append(exc)
+            finally:
+                taken.set()
+                connections.close_all()
+
+        def adjustment():
+            taken.wait()
+            try:
+                adjust_stock(
+                    [
+                        {"product_id": sharded.pk, "delta": 5},
+                        {"product_id": unsharded.pk, "delta": 5},
+                    ]
+                )
+            except DatabaseError as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=order), threading.Thread(target=adjustment)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        counters.flush()
+        self.assertEqual(
+            dict(Stock.objects.values_list("product_id", "quantity")),
+            {sharded.pk: 14, unsharded.pk: 14},
+        )
+
+
+class ReadModelConcurrencyTestCase(TransactionTestCase):
+    """Writers of one category racing on its rollup, PostgreSQL only."""
+
+    def setUp(self):
+        use_temporary_caches(self)
+        if connection.vendor != "postgresql":
+            self.skipTest("row locks are only tested on PostgreSQL")
+
+    def test_concurrent_stock_writes_of_a_category_are_all_rolled_up(self):
+        category = Category.objects.create(name="Tablets")
+        products = [
+            Product.objects.create(name=f"Tablet {i}", price=300, category=category)
+            for i in range(4)
+        ]
+        errors = []
+
+        def writer(product):
+            try:
+                for _ in range(5):
+                    adjust_stock([{"product_id": product.pk, "delta": 1}])
+            except DatabaseError as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=writer, args=[p]) for p in products]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        rollup = CategorySummary.objects.get(pk=category.pk)
+        self.assertEqual((rollup.in_stock_count, rollup.stock_total), (4, 20))
+        report = read_model.verify()
+        self.assertEqual(report["categories"]["stale"], [])
+
+
+@override_settings(OUTBOX_VISIBILITY_DELAY=0)
+class OutboxTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.category = Category.objects.create(name="Phones")
+        self.product = Product.objects.create(
+            name="Phone", price=100, category=self.category
+        )
+
+    def events(self, **kwargs):
+        return [
+            (event["topic"], event["object_id"], event["action"])
+            for event in outbox.read(**kwargs)
+        ]
+
+    def test_writes_append_events_in_their_transaction(self):
+        self.assertEqual(
+            self.events(),
+            [
+                ("category", self.category.pk, "saved"),
+                ("stock", self.product.pk, "saved"),
+                ("product", self.product.pk, "saved"),
+            ],
+        )
+        cursor = OutboxEvent.objects.latest("pk").pk
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.product.name = "Rolled back"
+            self.product.save()
+            raise RuntimeError
+        adjust_stock([{"product_id": self.product.pk, "delta": 4}])
+        product_id = self.product.pk
+        self.product.delete()
+        self.assertEqual(
+            self.events(after=cursor),
+            [
+                ("stock", product_id, "saved"),
+                # deleted by delete_stock, then by the cascade
+                ("stock", product_id, "deleted"),
+                ("stock", product_id, "deleted"),
+                ("product", product_id, "deleted"),
+            ],
+        )
+        self.assertEqual(
+            self.events(after=cursor, topics=["product"]),
+            [("product", product_id, "deleted")],
+        )
+
+    @override_settings(OUTBOX_VISIBILITY_DELAY=60)
+    def test_recent_events_wait_for_the_visibility_delay(self):
+        self.assertEqual(self.events(), [])
+
+    def test_compaction_keeps_the_latest_event_of_each_object(self):
+        other = Product.objects.create(name="Tablet", price=300, category=self.category)
+        self.product.price = 120
+        self.product.save()
+        other_id = other.pk
+        other.delete()
+        later = timezone.now() + timedelta(days=2)
+        with override_settings(OUTBOX_TOMBSTONE_RETENTION=30 * 24 * 3600):
+            outbox.compact(now=later)
+        self.assertEqual(
+            sorted(self.events()),
+            [
+                ("category", self.category.pk, "saved"),
+                ("product", self.product.pk, "saved"),
+                ("product", other_id, "deleted"),
+                ("stock", self.product.pk, "saved"),
+                ("stock", other_id, "deleted"),
+            ],
+        )
+        outbox.compact(now=later + timedelta(days=7))
+        self.assertEqual(len(self.events()), 3)
+
+    def test_events_api(self):
+        url = reverse_lazy("catalog-events")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        staff = EcommerceUser.objects.create_user(
+            email="staff@mail.com", password="password", is_staff=True
+        )
+        self.client.force_authenticate(staff)
+        response = self.client.get(url, {"limit": 2})
+        events = response.json()["events"]
+        self.assertEqual([event["topic"] for event in events], ["category", "stock"])
+        self.assertEqual(response.json()["cursor"], events[-1]["id"])
+        response = self.client.get(url, {"after": events[-1]["id"], "topic": "product"})
+        self.assertEqual(
+            [event["object_id"] for event in response.json()["events"]],
+            [self.product.pk],
+        )
+        response = self.client.get(url, {"topic": "order"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastReadPathTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Caf\u00e9 \u2028 <Phones>")
+        for i in range(3):
+            Product.objects.create(
+                name=f"Product {i} \u263a",
+                price=9.99 * (i + 1),
+                category=self.category,
+                description=None if i else 'Says "hi"',
+            )
+        Product.objects.filter(name__startswith="Product 0").update(
+            image="products/phone.png",
+            image_variants={"source": "products/phone.png", "thumb": "t.webp"},
+        )
+        Stock.objects.filter(product__name__startswith="Product 1").update(
+            quantity=7, location="A1"
+        )
+        read_model.refresh_products(Product.objects.values_list("pk", flat=True))
+
+    def expected(self, serializer_class, instance, **kwargs):
+        request = APIRequestFactory().get("/")
+        return JSONRenderer().render(
+            serializer_class(instance, context={"request": request}, **kwargs).data
+        )
+
+    def expected_page(self, serializer_class, queryset):
+        request = APIRequestFactory().get("/")
+        results = serializer_class(
+            queryset.order_by("-created_at", "-id"),
+            context={"request": request},
+            many=True,
+        ).data
+        return JSONRenderer().render(
+            {"next": None, "previous": None, "results": results}
+        )
+
+    def test_product_reads_match_the_model_serializer(self):
+        products = Product.objects.order_by("id")
+        response = self.client.get(reverse_lazy("product-list"))
+        self.assertEqual(
+            response.content, self.expected_page(ProductSerializer, products)
+        )
+        response = self.client.get(
+            reverse_lazy("product-detail", kwargs={"pk": products[0].pk})
+        )
+        self.assertEqual(
+            response.content, self.expected(ProductSerializer, products[0])
+        )
+
+    def test_stock_list_matches_the_model_serializer(self):
+        response = self.client.get(reverse_lazy("stock-list"))
+        self.assertEqual(
+            response.content, self.expected_page(StockSerializer, Stock.objects)
+        )
+
+    def test_listing_mode_pages_values_rows(self):
+        response = self.client.get(reverse_lazy("product-list"), {"page_size": 2})
+        page = response.json()
+        self.assertEqual(len(page["results"]), 2)
+        self.assertEqual(len(self.client.get(page["next"]).json()["results"]), 1)
+
+
+class FastJSONRendererTestCase(APITestCase):
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_output_matches_json_renderer(self):
+        self.assertSameBytes(
+            {
+                "text": "caf\u00e9 \u2028\u2029 \x00 </script> \U0001f600",
+                "numbers": [1, -0.0, 0.1, 1e16, 123.45, 2**63 - 1],
+                "nested": {1: None, "flag": True},
+                "when": timezone.now(),
+                "price": Decimal("9.99"),
+            }
+        )
+
+    def test_values_orjson_renders_differently_fall_back(self):
+        self.assertSameBytes(
+            {"tiny": [1e-05, 1.5e-07, -2e-09], "huge": 2**70, "none": None}
+        )
+        for value in (math.inf, math.nan):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({"price": None, "value": [value]})
+        self.assertEqual(
+            FastJSONRenderer().render([1], "application/json; indent=2"),
+            JSONRenderer().render([1], "application/json; indent=2"),
+        )
+
+
+class AsyncReadPathTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Test Category")
+        for i in range(3):
+            Product.objects.create(
+                name=f"Product {i}", price=100 * (i + 1), category=self.category
+            )
+        self.product = Product.objects.first()
+
+    def test_async_reads_match_sync_reads(self):
+        for name, kwargs, params in (
+            ("product-list", {}, {}),
+            ("product-list", {}, {"page_size": 2, "min_price": 150}),
+            ("product-detail", {"pk": self.product.id}, {}),
+            ("category-list", {}, {}),
+            ("category-detail", {"pk": self.category.id}, {}),
+            ("stock-list", {}, {}),
+            ("stock-detail", {"pk": self.product.stock.id}, {}),
+        ):
+            sync_response = self.client.get(reverse_lazy(name, kwargs=kwargs), params)
+            async_response = self.client.get(
+                reverse_lazy(f"async-{name}", kwargs=kwargs), params
+            )
+            self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+            self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_async_conditional_get_and_cache(self):
+        url = reverse_lazy("async-product-detail", kwargs={"pk": self.product.id})
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.product.name = "Renamed Product"
+        self.product.save()
+        self.assertEqual(self.client.get(url).json()["name"], "Renamed Product")
+
+    def test_async_errors(self):
+        response = self.client.get(
+            reverse_lazy("async-product-detail", kwargs={"pk": 0})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(
+            reverse_lazy("async-product-list"), {"min_price": "cheap"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("min_price", response.json())
+        sync_response = self.client.get(reverse_lazy("product-list"), {"cursor": "zzz"})
+        response = self.client.get(
+            reverse_lazy("async-product-list"), {"cursor": "zzz"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), sync_response.json())
+
+    async def test_async_client_reads_product_list(self):
+        response = await self.async_client.get(reverse_lazy("async-product-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 3)
+
+    async def test_async_reads_keep_the_catalog_cache_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = []
+        get_cache = catalog_cache.get_cache
+
+        def recording_get_cache():
+            threads.append(threading.get_ident())
+            return get_cache()
+
+        url = reverse_lazy("async-product-detail", kwargs={"pk": self.product.id})
+        with mock.patch.object(catalog_cache, "get_cache", recording_get_cache):
+            for path in (reverse_lazy("async-product-list"), url, url):
+                response = await self.async_client.get(path)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1, PERFORMANCE_SERVER_TIMING=True)
+class PerformanceMiddlewareTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Test Category")
+        for i in range(3):
+            Product.objects.create(
+                name=f"Product {i}", price=10, category=self.category
+            )
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs("core.performance", "INFO") as logs:
+            response = self.client.get(reverse_lazy("product-list"))
+        timing = response["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn("serialize;dur=", timing)
+        self.assertIn("total;dur=", timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["queries"], 2)
+        self.assertEqual(record["path"], "/api/v1/products/product/")
+
+    @override_settings(PERFORMANCE_QUERY_BUDGET=1)
+    def test_over_budget_requests_log_their_sql(self):
+        with self.assertLogs("core.performance", "WARNING") as logs:
+            self.client.get(reverse_lazy("product-list"))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record["slowest_queries"]), 2)
+        self.assertIn("product_product", record["slowest_queries"][0]["sql"])
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        response = self.client.get(reverse_lazy("product-list"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_async_views_are_measured(self):
+        with self.assertLogs("core.performance", "INFO"):
+            response = self.client.get(reverse_lazy("async-product-list"))
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+
+
+class DatabasePoolStatsTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+
+    def test_pool_stats_for_staff(self):
+        url = reverse_lazy("database-pool-stats")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        staff_user = EcommerceUser.objects.create_user(
+            email="staff@mail.com", password="password", is_staff=True
+        )
+        token = RefreshToken.for_user(staff_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+        # psycopg_pool counters, which omit the zeros
+        fake_pool = mock.Mock()
+        fake_pool.get_stats.return_value = {
+            "pool_min": 2,
+            "pool_max": 10,
+            "pool_size": 4,
+            "pool_available": 1,
+            "requests_num": 40,
+            "requests_queued": 4,
+            "requests_wait_ms": 200,
+            "usage_ms": 800,
+        }
+        with mock.patch.object(pool, "pools", return_value={"default": fake_pool}):
+            response = self.client.get(url)
+        stats = response.json()["pools"]["default"]
+        self.assertEqual(stats["in_use"], 3)
+        self.assertEqual(stats["utilization"], 0.3)
+        self.assertEqual(stats["wait_ms_avg"], 5.0)
+        self.assertEqual(stats["queued_wait_ms_avg"], 50.0)
+        self.assertEqual(stats["queued_ratio"], 0.1)
+        self.assertEqual(stats["requests_errors"], 0)
+
+    def test_sqlite_is_not_pooled(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("tests the SQLite configuration")
+        self.assertEqual(pool.stats()["pools"], {})
+
+
+class ReplicaRoutingTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.staff = EcommerceUser.objects.create_user(
+            email="staff@mail.com", password="password", is_staff=True
+        )
+        self.category = Category.objects.create(name="Phones")
+        self.list_url = reverse_lazy("product-list")
+        self.detail_url = reverse_lazy("category-detail", args=[self.category.pk])
+
+    def replica_reads(self, method, *args, **kwargs):
+        """Whether the request read from a replica, with one stand-in replica."""
+        with (
+            mock.patch("core.replicas.replica_aliases", return_value=["replica1"]),
+            mock.patch(
+                "core.replicas.healthy_replicas", return_value=[]
+            ) as healthy_replicas,
+        ):
+            response = method(*args, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return healthy_replicas.called
+
+    def test_router(self):
+        router = replicas.PrimaryReplicaRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        token = replicas.activate()
+        try:
+            replicas.current().replica_reads = True
+            with mock.patch(
+                "core.replicas.healthy_replicas", return_value=["replica1"]
+            ):
+                self.assertEqual(router.db_for_read(Product), "replica1")
+            self.assertEqual(replicas.read_alias(), "replica1")
+            self.assertEqual(router.db_for_write(Product), "default")
+            self.assertTrue(replicas.current().wrote)
+        finally:
+            replicas.deactivate(token)
+        self.assertFalse(router.allow_migrate("replica1", "product"))
+
+    def test_lagging_replicas_are_skipped(self):
+        self.assertTrue(replicas.check("default"))
+        with (
+            override_settings(DATABASE_REPLICA_MAX_LAG=-1),
+            self.assertLogs("core.replicas", "WARNING") as logs,
+        ):
+            self.assertFalse(replicas.check("default"))
+        self.assertIn("reading from the primary", logs.output[0])
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        self.assertTrue(self.replica_reads(self.client.get, self.list_url))
+        self.client.force_authenticate(self.staff)
+        self.assertTrue(self.replica_reads(self.client.get, self.detail_url))
+        self.replica_reads(self.client.patch, self.detail_url, {"name": "Mobiles"})
+        self.assertIn(replicas.PIN_COOKIE, self.client.cookies)
+        self.assertFalse(self.replica_reads(self.client.get, self.detail_url))
+
+        # clients without cookies are pinned by user
+        self.client.cookies.clear()
+        self.assertFalse(self.replica_reads(self.client.get, self.detail_url))
+        cache.clear()
+        catalog_cache.get_cache().clear()
+        self.assertTrue(self.replica_reads(self.client.get, self.detail_url))
+
+    def test_replica_reads_are_not_cached_right_after_a_write(self):
+        catalog_cache.invalidate_lists("product")
+        with mock.patch("core.replicas.read_alias", return_value="replica1"):
+            catalog_cache.read_through(catalog_cache.detail_key("product", 1), dict)
+        self.assertIsNone(catalog_cache.get_cache().get("catalog:product:detail:1"))
+        catalog_cache.read_through(catalog_cache.detail_key("product", 1), dict)
+        self.assertEqual(catalog_cache.get_cache().get("catalog:product:detail:1"), {})
+
+
+def catalog_queries(context):
+    return [query for query in context.captured_queries if "product_" in query["sql"]]
+
+
+class ReplicaReadTestCase(TransactionTestCase):
+    """Reads against a replica mirroring the test database, see DATABASE_REPLICAS."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        use_temporary_caches(self)
+        if "replica1" not in connections or connection.is_in_memory_db():
+            self.skipTest(
+                "needs DATABASE_REPLICAS and a file based SQLite test database "
+                "or PostgreSQL, see DATABASE_TEST_NAME"
+            )
+        self.category = Category.objects.create(name="Phones")
+        self.url = reverse_lazy("category-detail", args=[self.category.pk])
+
+    def test_reads_hit_the_replica_until_the_client_writes(self):
+        staff = EcommerceUser.objects.create_user(
+            email="staff@mail.com", password="password", is_staff=True
+        )
+        self.client.force_login(staff)
+        token = RefreshToken.for_user(staff)
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {token.access_token}"
+        with (
+            CaptureQueriesContext(connections["replica1"]) as replica,
+            CaptureQueriesContext(connection) as primary,
+        ):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()["name"], "Phones")
+        # authentication reads the primary, before the view routes its reads
+        self.assertTrue(catalog_queries(replica))
+        self.assertFalse(catalog_queries(primary))
+
+        self.client.patch(
+            self.url, {"name": "Mobiles"}, content_type="application/json"
+        )
+        catalog_cache.get_cache().clear()
+        with CaptureQueriesContext(connections["replica1"]) as replica:
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()["name"], "Mobiles")
+        self.assertFalse(catalog_queries(replica))
+
+
+class BenchmarkSuiteTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+
+    def test_parse_count(self):
+        self.assertEqual(parse_count("10k"), 10_000)
+        self.assertEqual(parse_count("1M"), 1_000_000)
+        self.assertEqual(parse_count("250"), 250)
+
+    def test_seed_catalog_is_incremental_and_deterministic(self):
+        self.assertEqual(seed_catalog(30, categories=3, batch_size=7), 30)
+        self.assertEqual(seed_catalog(30, categories=3), 0)
+        self.assertEqual(seed_catalog(45, categories=3, batch_size=7), 15)
+        products = Product.objects.filter(name__startswith=NAME_PREFIX)
+        self.assertEqual(products.count(), 45)
+        self.assertEqual(Stock.objects.filter(product__in=products).count(), 45)
+        fields = ("price", "description", "stock__quantity")
+        grown = list(products.order_by("name").values_list(*fields))
+
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+        seed_catalog(45, categories=3, batch_size=20)
+        self.assertEqual(list(products.order_by("name").values_list(*fields)), grown)
+
+    def test_load_result_summary(self):
+        result = LoadResult(name="product-list", concurrency=2, duration=2.0)
+        for latency in (0.01, 0.02, 0.03, 0.04):
+            result.record(200, latency, queries=2)
+        result.record(503, 0.5)
+        summary = result.as_dict()
+        self.assertEqual(summary["requests"], 4)
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(summary["throughput"], 2.0)
+        self.assertEqual(summary["queries_per_request"], 2)
+        self.assertEqual(summary["statuses"], {"200": 4, "503": 1})
+        self.assertLessEqual(summary["p50_ms"], summary["p99_ms"])
+
+    def test_responses_are_read_whatever_their_framing(self):
+        responses = (
+            b"HTTP/1.1 100 Continue\r\n\r\n"
+            b"HTTP/1.1 204 No Content\r\nContent-Length: 12\r\n\r\n"
+            b"HTTP/1.1 304 Not Modified\r\nContent-Length: 12\r\n\r\n"
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"3;ext=1\r\nabc\r\n0\r\nServer-Timing: db;dur=1\r\n\r\n"
+            b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"
+            b"HTTP/1.1 200 OK\r\n\r\nuntil closed"
+        )
+
+        async def read_all():
+            reader = asyncio.StreamReader()
+            reader.feed_data(responses)
+            reader.feed_eof()
+            return [await benchmark._read_response(reader) for _ in range(5)]
+
+        statuses = [
+            (status, keep_alive) for status, _, keep_alive in asyncio.run(read_all())
+        ]
+        self.assertEqual(
+            statuses, [(204, True), (304, True), (200, True), (200, True), (200, False)]
+        )
+
+    def test_benchmark_scenarios_write_a_report(self):
+        result = LoadResult(name="", concurrency=1, duration=1.0)
+        result.record(200, 0.01)
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            mock.patch(
+                "product.management.commands.benchmark.run_load", return_value=result
+            ) as run_load,
+        ):
+            output = os.path.join(directory, "report.json")
+            call_command(
+                "benchmark",
+                "read-path",
+                "--endpoint=stock",
+                "--duration=1",
+                f"--output={output}",
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+            with open(output) as report_file:
+                report = json.load(report_file)
+        self.assertEqual(
+            [call.args[0] for call in run_load.call_args_list],
+            [
+                "http://127.0.0.1:8000/api/v1/products/stock/",
+                "http://127.0.0.1:8001/api/v1/products/async/stock/",
+            ],
+        )
+        self.assertEqual(report["scenario"], "read-path")
+        self.assertEqual(
+            [(row["server"], row["requests"]) for row in report["results"]],
+            [("wsgi", 1), ("asgi", 1)],
+        )
+
+    def test_server_workers_follow_cpus_and_memory(self):
+        self.assertEqual(gunicorn_conf.size_workers("sync", 4, 8192, 200), 9)
+        self.assertEqual(gunicorn_conf.size_workers("gthread", 4, 8192, 200), 4)
+        self.assertEqual(gunicorn_conf.size_workers("asgi", 1, 8192, 200), 2)
+        # capped by the memory limit, never below one
+        self.assertEqual(gunicorn_conf.size_workers("sync", 8, 1024, 200), 5)
+        self.assertEqual(gunicorn_conf.size_workers("sync", 8, 100, 200), 1)
+
+    def test_import_times_are_split_by_phase(self):
+        imports = profile_startup.parse_importtime(
+            [
+                "import time: self [us] | cumulative | imported package",
+                "import time:       120 |        120 |   django.utils",
+                "import time:       300 |        420 | django",
+                "profile_startup:first_request",
+                "import time:       900 |        900 | rest_framework",
+                "Unrelated output",
+            ]
+        )
+        self.assertEqual(
+            imports,
+            [
+                ("app", "django.utils", 120, 120, 1),
+                ("app", "django", 300, 420, 0),
+                ("first_request", "rest_framework", 900, 900, 0),
+            ],
+        )
+        summary = profile_startup.summarize(imports, top=1)
+        self.assertEqual(summary["by_phase"]["app"], {"modules": 2, "ms": 0.4})
+        self.assertEqual(
+            summary["packages"], [{"package": "rest_framework", "ms": 0.9}]
+        )
+
+    def test_prepare_server_skips_unchanged_static_files(self):
+        collectstatic_handle = "django.contrib.staticfiles.management.commands.collectstatic.Command.handle"
+        with (
+            tempfile.TemporaryDirectory() as static_root,
+            override_settings(STATIC_ROOT=static_root),
+            mock.patch(collectstatic_handle, return_value="") as collectstatic,
+        ):
+            call_command("prepare_server", stdout=io.StringIO())
+            output = io.StringIO()
+            call_command("prepare_server", stdout=output)
+        self.assertEqual(collectstatic.call_count, 1)
+        self.assertIn("Static files unchanged", output.getvalue())
+        self.assertIn("No migrations to apply", output.getvalue())
@@ -1,6 +1,7 @@
-from user.models import EcommerceUser
 from django.contrib import admin
 
+from user.models import EcommerceUser, RevokedToken
+
 
 @admin.register(EcommerceUser)
 class EcommerceUserAdmin(admin.ModelAdmin):
@@ -15,3 +16,9 @@ class EcommerceUserAdmin(admin.ModelAdmin):
         "is_staff",
         "is_superuser",
     )
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ("id", "jti", "user", "expires_at", "created_at")
+    search_fields = ("jti", "user__email")
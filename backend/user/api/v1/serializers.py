@@ -1,6 +1,16 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+    TokenVerifySerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
 
+from user import revocation
+from user.authentication import user_claims
 from user.models import EcommerceUser
 
 
@@ -53,6 +63,16 @@ class PasswordChangeSerializer(serializers.Serializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # signed copies of the authorization fields, see CachedJWTAuthentication
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        # copied into the access tokens, revoking it ends the whole login
+        token[revocation.SESSION_CLAIM] = token[api_settings.JTI_CLAIM]
+        return token
+
     def validate(self, attrs):
         # Call the parent validate method to authenticate and get tokens
         data = super().validate(attrs)
@@ -60,3 +80,30 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         user = self.user
         data["user"] = UserSerializer(user).data
         return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh the user claims of the new access token from the database."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if revocation.is_revoked(refresh):
+            raise TokenError(_("Token is revoked"))
+        user = EcommerceUser.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+        access = refresh.access_token
+        for claim, value in user_claims(user).items():
+            access[claim] = value
+        return {"access": str(access)}
+
+
+class CustomTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        if revocation.is_revoked(UntypedToken(attrs["token"])):
+            raise TokenError(_("Token is revoked"))
+        return {}
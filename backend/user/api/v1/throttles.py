@@ -0,0 +1,37 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    """Password attempts (login, registration) per client IP."""
+
+    scope = "login_ip"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class LoginAccountThrottle(SimpleRateThrottle):
+    """Login attempts per account, whatever the IPs they come from."""
+
+    scope = "login_account"
+
+    def get_cache_key(self, request, view):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if not email:
+            return None
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": str(email).strip().lower(),
+        }
+
+
+class PasswordChangeThrottle(SimpleRateThrottle):
+    """Password changes per authenticated user."""
+
+    scope = "password_change"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": request.user.pk}
@@ -7,8 +7,8 @@ from rest_framework_simplejwt.views import (
 from user.api.v1.views import (
     CustomTokenObtainPairView,
     LogoutView,
-    RegistrationView,
     PasswordChangeView,
+    RegistrationView,
     UserDetailView,
     UserProfileView,
 )
@@ -1,24 +1,33 @@
-from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import permissions, status
 from rest_framework.generics import RetrieveAPIView, RetrieveUpdateAPIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from core.replicas import ReplicaReadMixin
+from user import revocation
 from user.api.v1.serializers import (
-    RegistrationSerializer,
-    UserSerializer,
-    PasswordChangeSerializer,
     CustomTokenObtainPairSerializer,
+    PasswordChangeSerializer,
+    RegistrationSerializer,
     UserProfileSerializer,
+    UserSerializer,
 )
+from user.api.v1.throttles import (
+    LoginAccountThrottle,
+    LoginIPThrottle,
+    PasswordChangeThrottle,
+)
+from user.authentication import load_user
 
 
 class RegistrationView(APIView):
     permission_classes = (AllowAny,)
+    throttle_classes = (LoginIPThrottle,)
     serializer_class = RegistrationSerializer
 
     def post(self, request):
@@ -33,9 +42,11 @@ class RegistrationView(APIView):
 
 class PasswordChangeView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_classes = (PasswordChangeThrottle,)
     serializer_class = PasswordChangeSerializer
 
     def post(self, request):
+        load_user(request.user)
         serializer = self.serializer_class(
             data=request.data, context={"request": request}
         )
@@ -47,35 +58,41 @@ class PasswordChangeView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserDetailView(RetrieveAPIView):
+class UserDetailView(ReplicaReadMixin, RetrieveAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        return load_user(self.request.user)
 
 
-class UserProfileView(RetrieveUpdateAPIView):
+class UserProfileView(ReplicaReadMixin, RetrieveUpdateAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = UserProfileSerializer
 
     def get_object(self):
-        return self.request.user
+        return load_user(self.request.user)
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = (LoginIPThrottle, LoginAccountThrottle)
 
 
 class LogoutView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request):
-        print(request.data)
+        """
+        Revoke the given ``token`` (refresh or access) together with its login
+        session, and the access token of this request.
+        """
         try:
-            refresh_token = request.data["token"]
-            token = RefreshToken(refresh_token)
-            token.blacklist()
-            return Response(status=status.HTTP_200_OK)
-        except (ObjectDoesNotExist, TokenError):
+            token = UntypedToken(request.data["token"])
+        except (KeyError, TokenError):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if token.get(api_settings.USER_ID_CLAIM) != request.user.pk:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        revocation.revoke(token, request.user)
+        revocation.revoke(request.auth, request.user)
+        return Response(status=status.HTTP_200_OK)
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.db.models import DEFERRED
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from user import revocation
+from user.cache import user_cache
+
+# Authorization fields signed into the tokens at login, see user_claims().
+CLAIM_FIELDS = ("email", "is_staff", "is_superuser")
+
+
+def user_claims(user):
+    return {field: getattr(user, field) for field in CLAIM_FIELDS}
+
+
+def load_user(user):
+    """
+    Fully load a user built from token claims, before reading its profile or
+    writing it back. Users loaded from the database are returned as they are.
+    """
+    if user.is_authenticated and user.get_deferred_fields():
+        user.refresh_from_db(
+            fields=[field.attname for field in user._meta.concrete_fields]
+        )
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` resolving users without a query in the common case.
+
+    Users come from the per-process ``user_cache``. On a miss, with
+    ``JWT_TRUST_TOKEN_CLAIMS`` enabled, the user is built from the claims
+    signed at login and its other fields are loaded on first access.
+    Otherwise the user is loaded from the database and cached.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revocation.is_revoked(validated_token):
+            raise InvalidToken(_("Token is revoked"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+        if settings.JWT_TRUST_TOKEN_CLAIMS:
+            user = self.get_claims_user(validated_token)
+            if user is not None:
+                return user
+        user = super().get_user(validated_token)
+        user_cache.set(user_id, user)
+        return user
+
+    def get_claims_user(self, validated_token):
+        if not all(claim in validated_token for claim in CLAIM_FIELDS):
+            return None
+        opts = self.user_model._meta
+        values = {
+            opts.get_field(api_settings.USER_ID_FIELD).attname: validated_token[
+                api_settings.USER_ID_CLAIM
+            ],
+            # tokens are only issued to active users
+            "is_active": True,
+            **{claim: validated_token[claim] for claim in CLAIM_FIELDS},
+        }
+        names = [field.attname for field in opts.concrete_fields]
+        return self.user_model.from_db(
+            None, names, [values.get(name, DEFERRED) for name in names]
+        )
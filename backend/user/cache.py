@@ -0,0 +1,58 @@
+"""
+Per-process cache of the users authenticated by JWT.
+
+A bounded LRU of user instances keyed by id, with a short TTL bounding how
+long another process may serve a stale copy. Saves and deletes of a user
+evict it from the cache of the process that made them.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class UserCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return a private copy of the cached user, or None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        # copies, so that a request changing its user can't leak into others
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        ttl, max_size = settings.AUTH_USER_CACHE_TTL, settings.AUTH_USER_CACHE_SIZE
+        if ttl <= 0 or max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (copy.copy(user), time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache()
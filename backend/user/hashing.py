@@ -0,0 +1,88 @@
+"""
+Password hashing off the request threads, with admission control.
+
+PBKDF2 at several hundred thousand iterations costs a CPU core for a sizeable
+fraction of a second. Every hash and verification (login, registration,
+password change, and the dummy hash Django runs for unknown accounts) goes
+through a small per-process thread pool, which OpenSSL lets run in parallel
+since it releases the GIL while hashing. Past ``PASSWORD_HASH_QUEUE_DEPTH``
+hashes in flight, new ones are refused at once with a 503, so a login storm
+can't occupy every worker and starve the catalog.
+
+The request thread waits for its hash, so a worker never has more hashes in
+flight than request threads: the depth is capped at all of them but one
+(``SERVER_REQUEST_THREADS``), which is left to the other requests.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many password checks in progress, retry shortly."
+    default_code = "password_hashing_busy"
+    # rendered as a Retry-After header
+    wait = 1
+
+
+def get_executor():
+    # Created lazily so that forked server workers each start their own pool.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hashing",
+            )
+    return _executor
+
+
+def queue_depth():
+    """The hashes a worker admits at once."""
+    depth = settings.PASSWORD_HASH_QUEUE_DEPTH
+    if settings.SERVER_REQUEST_THREADS is not None:
+        # a sync worker has a single thread, it still has to log users in
+        depth = min(depth, max(settings.SERVER_REQUEST_THREADS - 1, 1))
+    return depth
+
+
+def run_hash(function, *args):
+    """Run ``function`` on the hashing pool, or raise PasswordHashingBusy."""
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= queue_depth():
+            raise PasswordHashingBusy()
+        _in_flight += 1
+    try:
+        if settings.PASSWORD_HASH_WORKERS <= 0:
+            return function(*args)
+        return get_executor().submit(function, *args).result()
+    finally:
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    ``PBKDF2PasswordHasher`` running on the hashing pool, with its iteration
+    count taken from ``PASSWORD_HASH_ITERATIONS``. Hashes made with another
+    count are upgraded by Django on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        return run_hash(super().encode, password, salt, iterations)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from user.revocation import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete the revoked tokens that have expired since, e.g. from a daily cron."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(
+            self.style.SUCCESS(f"Purged {deleted} expired revoked tokens")
+        )
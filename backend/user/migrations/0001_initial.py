@@ -1,8 +1,9 @@
 # Generated by Django 5.1.7 on 2025-03-17 23:00
 
-import user.models
 from django.db import migrations, models
 
+import user.models
+
 
 class Migration(migrations.Migration):
     initial = True
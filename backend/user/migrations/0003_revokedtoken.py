@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0002_alter_ecommerceuser_is_superuser"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RevokedToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("jti", models.CharField(max_length=255, unique=True)),
+                ("expires_at", models.DateTimeField(db_index=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "revoked token",
+                "verbose_name_plural": "revoked tokens",
+            },
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from user.cache import user_cache
 
 
 class EcommerceUserManager(BaseUserManager):
@@ -55,3 +59,27 @@ class EcommerceUser(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self) -> str:
         return self.get_full_name()
+
+
+class RevokedToken(models.Model):
+    """A token id (``jti``) revoked before its expiry, see user.revocation."""
+
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(
+        EcommerceUser, on_delete=models.CASCADE, blank=True, null=True
+    )
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "revoked token"
+        verbose_name_plural = "revoked tokens"
+
+    def __str__(self) -> str:
+        return self.jti
+
+
+@receiver([post_save, post_delete], sender=EcommerceUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Deactivations, permission and password changes apply on the next request."""
+    user_cache.invalidate(instance.pk)
@@ -0,0 +1,116 @@
+"""
+Token revocation.
+
+Revoked token ids (``jti``) are stored in ``RevokedToken`` until the moment
+the token would have expired anyway; that table is shared by every process.
+Each process mirrors the unexpired ids in a dict and pulls the rows created
+since its last pull at most every ``TOKEN_REVOCATION_SYNC_INTERVAL`` seconds,
+so checking a token is a dict lookup. Revocations made by the process itself
+apply at once, the ones made elsewhere within the sync interval.
+
+Tokens issued at login carry a ``sid`` claim, the id of the refresh token of
+that login, which is copied into every access token refreshed from it:
+revoking the ``sid`` ends the whole session.
+"""
+
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from user.models import RevokedToken
+
+SESSION_CLAIM = "sid"
+# Rows are pulled again for this long, so that revocations committed out of
+# creation order by concurrent transactions are not missed.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class RevocationStore:
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._pulled_until = None
+
+    def revoke(self, jti, expires_at, user=None):
+        RevokedToken.objects.get_or_create(
+            jti=jti, defaults={"expires_at": expires_at, "user": user}
+        )
+        with self._lock:
+            self._revoked[jti] = expires_at.timestamp()
+
+    def is_revoked(self, *jtis):
+        self.sync()
+        return any(jti in self._revoked for jti in jtis if jti)
+
+    def _is_fresh(self):
+        return (
+            self._synced_at is not None
+            and time.monotonic() - self._synced_at
+            < settings.TOKEN_REVOCATION_SYNC_INTERVAL
+        )
+
+    def sync(self, force=False):
+        if not force and self._is_fresh():
+            return
+        with self._lock:
+            if not force and self._is_fresh():
+                # another thread pulled while we waited
+                return
+            now = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=now)
+            if self._pulled_until is not None:
+                rows = rows.filter(created_at__gte=self._pulled_until - SYNC_OVERLAP)
+            for jti, expires_at in rows.values_list("jti", "expires_at"):
+                self._revoked[jti] = expires_at.timestamp()
+            expired = [
+                jti
+                for jti, expires in self._revoked.items()
+                if expires <= now.timestamp()
+            ]
+            for jti in expired:
+                del self._revoked[jti]
+            self._pulled_until = now
+            self._synced_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._synced_at = self._pulled_until = None
+
+
+store = RevocationStore()
+
+
+def token_ids(token):
+    """The ids whose revocation invalidates ``token``."""
+    return token.get(api_settings.JTI_CLAIM), token.get(SESSION_CLAIM)
+
+
+def is_revoked(token):
+    return store.is_revoked(*token_ids(token))
+
+
+def revoke(token, user=None):
+    """Revoke ``token`` and, when it carries one, its whole session."""
+    store.revoke(
+        token[api_settings.JTI_CLAIM],
+        datetime.fromtimestamp(token["exp"], UTC),
+        user,
+    )
+    session = token.get(SESSION_CLAIM)
+    if session and session != token[api_settings.JTI_CLAIM]:
+        # the session ends when its refresh token would expire
+        store.revoke(
+            session, timezone.now() + api_settings.REFRESH_TOKEN_LIFETIME, user
+        )
+
+
+def purge_expired():
+    """Delete the rows of revoked tokens that have expired since."""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -1,12 +1,27 @@
-from rest_framework.reverse import reverse_lazy
-from rest_framework.test import APITestCase, APIClient
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
-from .models import EcommerceUser
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.reverse import reverse_lazy
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from core.testing import use_temporary_caches
+
+from . import hashing, revocation
+from .api.v1.throttles import LoginAccountThrottle, LoginIPThrottle
+from .cache import user_cache
+from .hashing import PooledPBKDF2PasswordHasher
+from .models import EcommerceUser, RevokedToken
 
 
 class EcommerceUserAPITestCase(APITestCase):
     def setUp(self):
+        use_temporary_caches(self)
         self.client = APIClient()
         self.user_data = {
             "first_name": "John",
@@ -139,3 +154,230 @@ class EcommerceUserAPITestCase(APITestCase):
             format="json",
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = EcommerceUser.objects.create_user(
+            email="john.doe@example.com", password="securepassword123"
+        )
+        self.login_url = reverse_lazy("login")
+        response = self.client.post(
+            self.login_url,
+            {"email": "john.doe@example.com", "password": "securepassword123"},
+            format="json",
+        )
+        self.access_token = response.data["access"]
+        self.refresh_token = response.data["refresh"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_authenticated_get_is_query_free_once_cached(self):
+        url = reverse_lazy("user-detail")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data["email"], "john.doe@example.com")
+
+    def test_user_changes_invalidate_cache(self):
+        url = reverse_lazy("user-detail")
+        self.client.get(url)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertTrue(self.client.get(url).data["is_staff"])
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        self.client.get(reverse_lazy("user-detail"))
+        response = self.client.post(
+            reverse_lazy("password_change"),
+            {"old_password": "securepassword123", "new_password": "testpassnew"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(user_cache.get(self.user.pk))
+
+    def test_login_signs_user_claims(self):
+        token = AccessToken(self.access_token)
+        self.assertEqual(token["email"], "john.doe@example.com")
+        self.assertFalse(token["is_staff"])
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post(
+            reverse_lazy("token_refresh"), {"refresh": self.refresh_token}
+        )
+        self.assertTrue(AccessToken(response.data["access"])["is_staff"])
+
+    @override_settings(JWT_TRUST_TOKEN_CLAIMS=True)
+    def test_trusted_claims_skip_user_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse_lazy("product-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            [q for q in queries.captured_queries if "user_ecommerceuser" in q["sql"]]
+        )
+        # profile fields are loaded when a view needs them
+        response = self.client.get(reverse_lazy("user-profile"))
+        self.assertEqual(response.data["email"], "john.doe@example.com")
+
+
+class TokenRevocationTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        revocation.store.clear()
+        self.client = APIClient()
+        self.user = EcommerceUser.objects.create_user(
+            email="john.doe@example.com", password="securepassword123"
+        )
+        response = self.client.post(
+            reverse_lazy("login"),
+            {"email": "john.doe@example.com", "password": "securepassword123"},
+            format="json",
+        )
+        self.access_token = response.data["access"]
+        self.refresh_token = response.data["refresh"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        response = self.client.post(
+            reverse_lazy("logout"), {"token": self.refresh_token}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.get(reverse_lazy("user-detail")).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.client.credentials()
+        response = self.client.post(
+            reverse_lazy("token_refresh"), {"refresh": self.refresh_token}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(
+            reverse_lazy("token_verify"), {"token": self.access_token}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_with_access_token_ends_session(self):
+        refreshed = self.client.post(
+            reverse_lazy("token_refresh"), {"refresh": self.refresh_token}
+        ).data["access"]
+        response = self.client.post(
+            reverse_lazy("logout"), {"token": self.access_token}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refreshed}")
+        self.assertEqual(
+            self.client.get(reverse_lazy("user-detail")).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_logout_rejects_foreign_or_invalid_tokens(self):
+        other = EcommerceUser.objects.create_user(
+            email="jane@example.com", password="securepassword123"
+        )
+        for token in (str(RefreshToken.for_user(other)), "invalid"):
+            response = self.client.post(
+                reverse_lazy("logout"), {"token": token}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revocations_from_other_processes_are_synced(self):
+        token = AccessToken(self.access_token)
+        revocation.store.sync(force=True)
+        RevokedToken.objects.create(
+            jti=token["jti"], expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        # not seen before the next pull
+        self.assertFalse(revocation.is_revoked(token))
+        revocation.store.sync(force=True)
+        self.assertTrue(revocation.is_revoked(token))
+        with self.assertNumQueries(0):
+            revocation.is_revoked(token)
+
+    def test_purge_expired(self):
+        RevokedToken.objects.create(
+            jti="expired", expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        RevokedToken.objects.create(
+            jti="active", expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        self.assertEqual(revocation.purge_expired(), 1)
+        self.assertTrue(RevokedToken.objects.filter(jti="active").exists())
+
+
+class PasswordHashingTestCase(APITestCase):
+    def setUp(self):
+        use_temporary_caches(self)
+        self.client = APIClient()
+        self.user = EcommerceUser.objects.create_user(
+            email="john.doe@example.com", password="securepassword123"
+        )
+        self.login_url = reverse_lazy("login")
+        self.credentials = {
+            "email": "john.doe@example.com",
+            "password": "securepassword123",
+        }
+
+    @override_settings(PASSWORD_HASH_QUEUE_DEPTH=0)
+    def test_overloaded_hashing_is_refused(self):
+        response = self.client.post(self.login_url, self.credentials, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+
+    @override_settings(PASSWORD_HASH_QUEUE_DEPTH=8, SERVER_REQUEST_THREADS=4)
+    def test_one_request_thread_is_left_to_other_requests(self):
+        with mock.patch.object(hashing, "_in_flight", 3):
+            response = self.client.post(self.login_url, self.credentials, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        with mock.patch.object(hashing, "_in_flight", 2):
+            response = self.client.post(self.login_url, self.credentials, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_login_attempts_are_throttled_per_account(self):
+        with mock.patch.object(LoginAccountThrottle, "rate", "2/min", create=True):
+            wrong = {**self.credentials, "password": "wrong"}
+            for _ in range(2):
+                response = self.client.post(self.login_url, wrong, format="json")
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            # another IP, same account
+            response = self.client.post(
+                self.login_url, wrong, format="json", REMOTE_ADDR="10.0.0.2"
+            )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_login_attempts_are_throttled_per_forwarded_ip(self):
+        wrong = {**self.credentials, "password": "wrong"}
+        with (
+            mock.patch.object(LoginIPThrottle, "rate", "1/min", create=True),
+            override_settings(REST_FRAMEWORK={"NUM_PROXIES": 1}),
+        ):
+            statuses = [
+                self.client.post(
+                    self.login_url,
+                    {**wrong, "email": f"user{i}@example.com"},
+                    format="json",
+                    # forged by the client, then appended to by nginx
+                    HTTP_X_FORWARDED_FOR=f"192.0.2.{i}, {client}",
+                ).status_code
+                for i, client in enumerate(["10.0.0.2", "10.0.0.3", "10.0.0.2"])
+            ]
+        self.assertEqual(
+            statuses,
+            [
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+
+    def test_hashes_are_upgraded_at_login(self):
+        with self.settings(PASSWORD_HASH_ITERATIONS=1000):
+            response = self.client.post(self.login_url, self.credentials, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        decoded = PooledPBKDF2PasswordHasher().decode(self.user.password)
+        self.assertEqual(decoded["iterations"], 1000)
@@ -4,6 +4,7 @@ import {useState, useEffect} from "react"
 import Image from "next/image"
 import Link from "next/link"
 import {Badge} from "@/components/ui/badge"
+import {Button} from "@/components/ui/button"
 import {Card, CardContent, CardHeader} from "@/components/ui/card"
 import {Product} from "@/utilities/types";
 import {fetchProducts} from "@/utilities/fetchUtils";
@@ -12,22 +13,41 @@ import {fetchProducts} from "@/utilities/fetchUtils";
 
 export default function ProductList() {
     const [products, setProducts] = useState<Product[]>();
+    // the listing is paged newest first, next is the link of the following page
+    const [next, setNext] = useState<string | null>(null);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
 
     useEffect(() => {
-        fetchProducts().then(response => setProducts(response));
+        fetchProducts().then(page => {
+            setProducts(page.results);
+            setNext(page.next);
+        });
     }, []);
 
+    const loadMore = async () => {
+        if (!next) return;
+        setIsLoadingMore(true);
+        try {
+            const page = await fetchProducts(next);
+            setProducts(previous => [...(previous ?? []), ...page.results]);
+            setNext(page.next);
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     return (
+        <>
         <div className="mt-8 grid grid-cols-1 gap-6 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4">
-            {products?.map((product, index) => (
-                <Card key={index + 1}
+            {products?.map((product) => (
+                <Card key={product.id}
                     className="py-0 group overflow-hidden rounded-xl border border-border/40 bg-card transition-all duration-300 hover:border-primary/20 hover:shadow-lg dark:border-border/20 dark:hover:border-primary/10"
                 >
                     <CardHeader  className="p-0">
                         <div className="relative aspect-square overflow-hidden">
                             <Link href={`/products/${product.id}`}>
                                 <Image
-                                    src={product.image ? product.image : "https://placehold.co/300x300"}
+                                    src={product.image_srcset?.small || product.image || "https://placehold.co/300x300"}
                                     alt={product.name}
                                     width={300}
                                     height={300}
@@ -53,6 +73,14 @@ export default function ProductList() {
                 </Card>
             ))}
         </div>
+        {next && (
+            <div className="mt-8 flex justify-center">
+                <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                    {isLoadingMore ? "Loading..." : "Load more"}
+                </Button>
+            </div>
+        )}
+        </>
     )
 }
 
@@ -2,10 +2,11 @@ import { clsx, type ClassValue } from "clsx";
 import { twMerge } from "tailwind-merge";
 import { toast } from "sonner";
 import { getToken } from "@/utilities/cookie-utils";
-import { Product, Category, Stock } from "@/utilities/types";
+import { Product, Category, Stock, Page } from "@/utilities/types";
 import {
   CATEGORIES_API_BASE_URL,
   CATEGORIES_ERROR_MESSAGES, PRODUCT_API_BASE_URL,
+  PRODUCT_ERROR_MESSAGES,
   STOCK_API_BASE_URL,
   STOCK_ERROR_MESSAGES,
 } from "@/utilities/contstants";
@@ -13,43 +14,54 @@ import {
 // Common headers for JSON-based requests
 const JSON_HEADERS = { "Content-Type": "application/json" };
 
+/**
+ * Fetches a catalog listing page by page, following the `next` links.
+ * @param url - The URL of the first page.
+ * @param errorMessage - The message of the error thrown when a page fails.
+ * @returns Promise resolving to the results of all the pages.
+ * @throws Error if the fetch request of a page fails.
+ */
+export const fetchAllPages = async <T>(url: string, errorMessage: string): Promise<T[]> => {
+  const results: T[] = [];
+  for (let next: string | null = url; next; ) {
+    const response = await fetch(next, {
+      method: "GET",
+      headers: JSON_HEADERS,
+      credentials: "same-origin",
+    });
+    if (!response.ok) throw new Error(errorMessage);
+    const page: Page<T> = await response.json();
+    results.push(...page.results);
+    next = page.next;
+  }
+  return results;
+};
+
 /**
  * Fetches all categories from the API.
  * @returns Promise resolving to an array of Category objects.
  * @throws Error if the fetch request fails.
  */
-export const fetchCategories = async (): Promise<Category[]> => {
-  const response = await fetch(CATEGORIES_API_BASE_URL, {
-    method: "GET",
-    headers: JSON_HEADERS,
-    credentials: "same-origin",
-  });
-  if (!response.ok) throw new Error(CATEGORIES_ERROR_MESSAGES.fetch);
-  return response.json();
-};
+export const fetchCategories = async (): Promise<Category[]> =>
+  fetchAllPages<Category>(CATEGORIES_API_BASE_URL, CATEGORIES_ERROR_MESSAGES.fetch);
 
 /**
  * Fetches all stock items from the API.
  * @returns Promise resolving to an array of Stock objects.
  * @throws Error if the fetch request fails.
  */
-export const fetchStock = async (): Promise<Stock[]> => {
-  const response = await fetch(STOCK_API_BASE_URL, {
-    method: "GET",
-    headers: JSON_HEADERS,
-    credentials: "same-origin",
-  });
-  if (!response.ok) throw new Error(STOCK_ERROR_MESSAGES.fetch);
-  return response.json();
-};
+export const fetchStock = async (): Promise<Stock[]> =>
+  fetchAllPages<Stock>(STOCK_API_BASE_URL, STOCK_ERROR_MESSAGES.fetch);
 
 /**
- * Fetches all products from the API.
- * @returns Promise resolving to an array of Product objects.
+ * Fetches a page of products from the API.
+ * @param url - The page to fetch, the `next` link of the previous one; the
+ * first page by default.
+ * @returns Promise resolving to a page of Product objects.
  * @throws Error if the fetch request fails, with a toast notification.
  */
-export const fetchProducts = async (): Promise<Product[]> => {
-  const response = await fetch(PRODUCT_API_BASE_URL, {
+export const fetchProducts = async (url: string = PRODUCT_API_BASE_URL): Promise<Page<Product>> => {
+  const response = await fetch(url, {
     cache: "no-cache",
   });
   if (!response.ok) {
@@ -59,6 +71,14 @@ export const fetchProducts = async (): Promise<Product[]> => {
   return response.json();
 };
 
+/**
+ * Fetches all products from the API.
+ * @returns Promise resolving to an array of Product objects.
+ * @throws Error if the fetch request fails.
+ */
+export const fetchAllProducts = async (): Promise<Product[]> =>
+  fetchAllPages<Product>(PRODUCT_API_BASE_URL, PRODUCT_ERROR_MESSAGES.fetch);
+
 /**
  * Combines class names using clsx and merges Tailwind classes with twMerge.
  * @param inputs - Array of class values (strings, objects, etc.).
@@ -1,6 +1,6 @@
 import {useEffect, useState} from "react";
 import {Product} from "@/utilities/types";
-import {fetchProducts} from "@/utilities/fetchUtils";
+import {fetchAllProducts} from "@/utilities/fetchUtils";
 import {PRODUCT_ERROR_MESSAGES} from "@/utilities/contstants";
 import {toast} from "sonner";
 
@@ -12,8 +12,8 @@ export const useAdminProductData = () => {
     const loadProducts = async () => {
       try {
         setIsLoading(true);
-        const data = await fetchProducts();
-        setProducts((data as Product[]) || []);
+        const data = await fetchAllProducts();
+        setProducts(data);
       } catch (error) {
         console.error("Error fetching products:", error);
         toast.error(PRODUCT_ERROR_MESSAGES.fetch);
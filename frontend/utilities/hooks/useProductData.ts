@@ -3,6 +3,7 @@
 import { useState, useEffect } from "react";
 import { toast } from "sonner";
 import {CATEGORIES_API_BASE_URL, PRODUCT_API_BASE_URL} from "@/utilities/contstants";
+import {fetchAllPages} from "@/utilities/fetchUtils";
 
 interface ProductFormData {
   name: string;
@@ -30,12 +31,7 @@ export const useProductData = (productId?: string): ProductData => {
 
   const fetchCategories = async () => {
     try {
-      const response = await fetch(CATEGORIES_API_BASE_URL, {
-        headers: { "Content-Type": "application/json" },
-        credentials: "same-origin",
-      });
-      if (!response.ok) throw new Error(`Failed to fetch categories: ${response.statusText}`);
-      return await response.json();
+      return await fetchAllPages<Category>(CATEGORIES_API_BASE_URL, "Failed to fetch categories");
     } catch (error) {
       console.error("Error fetching categories:", error);
       toast.error("Failed to load categories");
@@ -69,11 +65,11 @@ export const useProductData = (productId?: string): ProductData => {
   useEffect(() => {
     const loadData = async () => {
       setIsLoading(true);
-      const fetches = [fetchCategories()];
-      if (productId) fetches.push(fetchProduct(productId));
-
       try {
-        const [catData, prodData] = await Promise.all(fetches);
+        const [catData, prodData] = await Promise.all([
+          fetchCategories(),
+          productId ? fetchProduct(productId) : Promise.resolve(undefined),
+        ]);
         setCategories(catData);
         if (prodData) setProduct(prodData);
       } finally {
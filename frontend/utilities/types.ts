@@ -14,6 +14,8 @@ export interface Product {
     category?: string;
     category_name?: string;
     image: string;
+    // downscaled WebP variants of image: thumb (150px), small (320px), medium (640px)
+    image_srcset?: Record<string, string>;
 }
 
 
@@ -22,6 +24,13 @@ export interface Category {
     name: string
 }
 
+// A keyset page of a catalog listing, newest first
+export interface Page<T> {
+    next: string | null;
+    previous: string | null;
+    results: T[];
+}
+
 export interface Stock {
     id: number
     product_name: string
@@ -0,0 +1,76 @@
+#!/bin/sh
+# Smoke test of nginx.conf and nginx-edge-cache.js, in the nginx image:
+# `make test-nginx`, or `docker compose run --rm nginx-check`. Checks the
+# config, then serves it in front of a stand-in backend (upstream.conf) and
+# checks what the API cache stores, bypasses and purges.
+set -u
+
+API=http://127.0.0.1/api/v1/products
+failures=0
+
+nginx -t || exit 1
+nginx -c /check/upstream.conf || exit 1
+nginx || exit 1
+trap 'nginx -s quit; nginx -c /check/upstream.conf -s quit' EXIT
+
+header() {
+    tr -d '\r' < /tmp/headers | sed -n "s/^$1: //Ip"
+}
+
+# "<X-Cache-Status> <body>" of a GET, the body being unique per backend response
+fetch() {
+    url=$1
+    shift
+    curl -s -D /tmp/headers -o /tmp/body "$@" "$url"
+    printf '%s %s\n' "$(header X-Cache-Status)" "$(cat /tmp/body)"
+}
+
+purge() {
+    curl -s -o /dev/null -w '%{http_code}' --data "$*" http://127.0.0.1:8081/purge
+}
+
+expect() {
+    if [ "$2" = "$3" ]; then
+        echo "ok      $1"
+    else
+        echo "FAILED  $1: got '$2', expected '$3'"
+        failures=$((failures + 1))
+    fi
+}
+
+first=$(fetch "$API/product/42/")
+expect "a first read misses" "${first%% *}" MISS
+expect "clients revalidate" "$(header Cache-Control)" no-cache
+expect "surrogate keys stay internal" "$(header Surrogate-Key)" ""
+expect "a second read hits" "$(fetch "$API/product/42/")" "HIT ${first#* }"
+signed=$(fetch "$API/product/42/" -H "Authorization: Bearer token")
+expect "signed in reads bypass the cache" "${signed%% *}" BYPASS
+pinned=$(fetch "$API/product/42/" -H "Cookie: pin_primary=1")
+expect "pinned reads bypass the cache" "${pinned%% *}" BYPASS
+other=$(fetch "$API/product/43/")
+list=$(fetch "$API/product/?page_size=20")
+expect "lists are cached" "$(fetch "$API/product/?page_size=20")" "HIT ${list#* }"
+search=$(fetch "$API/product/search/?q=phone")
+expect "searches are cached" "$(fetch "$API/product/search/?q=phone")" "HIT ${search#* }"
+
+expect "purging product-42" "$(purge product-42)" 204
+after=$(fetch "$API/product/42/")
+expect "the purged product misses" "${after%% *}" MISS
+expect "the purged product is read again" \
+    "$([ "${after#* }" != "${first#* }" ] && echo yes)" yes
+expect "other products stay cached" "$(fetch "$API/product/43/")" "HIT ${other#* }"
+expect "lists stay cached" "$(fetch "$API/product/?page_size=20")" "HIT ${list#* }"
+
+expect "purging product-list" "$(purge "product-list category-3")" 204
+relisted=$(fetch "$API/product/?page_size=20")
+expect "the purged list misses" "${relisted%% *}" MISS
+expect "the purged search misses" \
+    "$(fetch "$API/product/search/?q=phone" | cut -d' ' -f1)" MISS
+expect "products stay cached" "$(fetch "$API/product/43/")" "HIT ${other#* }"
+expect "purges are posted" "$(curl -s -o /dev/null -w '%{http_code}' http://127.0.0.1:8081/purge)" 405
+
+if [ "$failures" -ne 0 ]; then
+    echo "$failures check(s) failed"
+    exit 1
+fi
+echo "all checks passed"
@@ -0,0 +1,57 @@
+// Surrogate-key purges for the API cache of nginx.conf.
+//
+// Stock nginx can't delete cached responses by tag. Instead every surrogate
+// key has a generation, in memory shared by the workers, and a response is
+// cached under its URL and the generations of its keys: a purge bumps the
+// generations of its keys, which orphans exactly the responses tagged with
+// them. nginx evicts those once inactive.
+//
+// The keys are derived from the URL the way the backend tags the responses
+// (product/edge.py): "product-42" for /api/v1/products/product/42/, else
+// "product-list" for the product lists, searches and facets; likewise for
+// categories and stock, on the async paths too.
+
+const DETAIL = /^\/api\/v1\/products\/(?:async\/)?(product|category|stock)\/([1-9][0-9]*)\/$/;
+const LIST = /^\/api\/v1\/products\/(?:async\/)?(product|category|stock)\//;
+
+function keys(uri) {
+    let match = DETAIL.exec(uri);
+    if (match) {
+        return [match[1] + '-' + match[2]];
+    }
+    match = LIST.exec(uri);
+    return match ? [match[1] + '-list'] : [];
+}
+
+// js_set $edge_generation: the generations of the keys of the request, read
+// when the request arrives, so a response rendered before a purge is stored
+// under the orphaned generation.
+function generation(r) {
+    const generations = ngx.shared.edge_keys;
+    return keys(r.uri).map((key) => {
+        let value = generations.get(key);
+        if (value === undefined) {
+            // a key never purged, or evicted, or nginx restarted (and may
+            // have missed purges): start from a generation no earlier
+            // response used
+            generations.add(key, Date.now());
+            value = generations.get(key);
+        }
+        return value;
+    }).join('.');
+}
+
+// POST /purge with the keys separated by spaces.
+function purge(r) {
+    if (r.method !== 'POST') {
+        r.return(405);
+        return;
+    }
+    const generations = ngx.shared.edge_keys;
+    (r.requestText || '').split(/\s+/).filter((key) => key).forEach((key) => {
+        generations.incr(key, 1, Date.now());
+    });
+    r.return(204);
+}
+
+export default { keys, generation, purge };